@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Array-backed aggregation for income summaries
+Encodes summary dimensions as integer codes and accumulates measures with NumPy
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Tuple, Sequence
+
+
+def encode_dimension(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Factorize a dimension into sorted categories and integer codes (NaN -> -1)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Reuse the existing dictionary, keeping only the categories in use
+        values = values.cat.remove_unused_categories()
+        return values.cat.codes.to_numpy(dtype=np.int64), values.cat.categories
+
+    codes, categories = pd.factorize(values, sort=True)
+    return codes.astype(np.int64, copy=False), pd.Index(categories)
+
+
+def combine_codes(codes: Sequence[np.ndarray], sizes: Sequence[int]) -> np.ndarray:
+    """Combine per-dimension codes into a single integer key per row"""
+    # Shift by one so that missing values (-1) get their own slot
+    shifted = [c + 1 for c in codes]
+    dims = [s + 1 for s in sizes]
+
+    if np.prod(dims, dtype=np.float64) < np.iinfo(np.int64).max:
+        return np.ravel_multi_index(shifted, dims)
+
+    # Too many combinations for a dense key: fall back to row-wise factorization
+    frame = pd.DataFrame({i: c for i, c in enumerate(shifted)})
+    return frame.groupby(list(frame.columns), sort=True).ngroup().to_numpy(dtype=np.int64)
+
+
+def group_codes(frame: pd.DataFrame, dimensions: List[str],
+                categories: Dict[str, Sequence] = None) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Dense group id per row for the distinct combinations of dimensions
+
+    Args:
+        frame: Input rows with dimension columns
+        dimensions: Columns that make up the group key
+        categories: Optional fixed category order per dimension
+
+    Returns:
+        (group id per row, DataFrame with one row per group in key order,
+        dimensions as categoricals)
+    """
+    categories = categories or {}
+    codes, dictionaries = [], []
+    for dim in dimensions:
+        if dim in categories:
+            values = pd.Categorical(frame[dim], categories=categories[dim])
+            dim_codes, dictionary = values.codes.astype(np.int64), pd.Index(values.categories)
+        else:
+            dim_codes, dictionary = encode_dimension(frame[dim])
+        codes.append(dim_codes)
+        dictionaries.append(dictionary)
+
+    sizes = [len(d) for d in dictionaries]
+    combined = combine_codes(codes, sizes)
+
+    # Dense group ids in key order, so the output comes out sorted by dimension codes
+    keys, first_row, group_ids = np.unique(combined, return_index=True, return_inverse=True)
+
+    groups = {}
+    for dim, dim_codes, dictionary in zip(dimensions, codes, dictionaries):
+        groups[dim] = pd.Categorical.from_codes(dim_codes[first_row], categories=dictionary)
+    return group_ids.ravel(), pd.DataFrame(groups)
+
+
+def count_distinct(group_ids: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Number of distinct non-negative integer values per group"""
+    if len(values) == 0:
+        return np.zeros(n_groups, dtype=np.int64)
+    width = int(values.max()) + 1
+    keys = np.sort(group_ids.astype(np.int64) * width + values)
+    first = np.concatenate([[True], keys[1:] != keys[:-1]])
+    return np.bincount(keys[first] // width, minlength=n_groups)
+
+
+def aggregate_by_codes(frame: pd.DataFrame, dimensions: List[str],
+                       measures: List[str],
+                       categories: Dict[str, Sequence] = None,
+                       distinct: Dict[str, str] = None) -> pd.DataFrame:
+    """
+    Sum measures over the distinct combinations of dimensions
+
+    Args:
+        frame: Input rows with dimension and measure columns
+        dimensions: Columns that make up the summary key
+        measures: Numeric columns to sum per key
+        categories: Optional fixed category order per dimension
+        distinct: Optional counts of distinct values, as {output column:
+            integer column}, e.g. {'Payments': 'Payment Row'}
+
+    Returns:
+        DataFrame with one row per observed key, dimensions as categoricals
+    """
+    distinct = distinct or {}
+    if frame.empty:
+        result = pd.DataFrame({dim: pd.Categorical([]) for dim in dimensions})
+        for measure in measures:
+            result[measure] = pd.Series(dtype=np.float64)
+        for measure in distinct:
+            result[measure] = pd.Series(dtype=np.int64)
+        return result
+
+    group_ids, result = group_codes(frame, dimensions, categories)
+    for measure in measures:
+        weights = frame[measure].to_numpy(dtype=np.float64)
+        result[measure] = np.bincount(group_ids, weights=weights, minlength=len(result))
+    for measure, column in distinct.items():
+        result[measure] = count_distinct(group_ids, frame[column].to_numpy(dtype=np.int64),
+                                         len(result))
+
+    return result
+
+
+def take_categorical(values: pd.Series, positions: np.ndarray) -> pd.Categorical:
+    """Gather values by row position as a categorical (position -1 gives NaN)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Keep the full dictionary so codes stay aligned with the source column
+        codes, categories = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, categories = encode_dimension(values)
+    gathered = np.full(len(positions), -1, dtype=np.int64)
+    valid = positions >= 0
+    gathered[valid] = codes[positions[valid]]
+    return pd.Categorical.from_codes(gathered, categories=categories)
+
+
+def grouping_id(dimensions: Sequence[str], by: Sequence[str]) -> int:
+    """
+    SQL GROUPING_ID for a grouping set: bit set for every dimension rolled up
+
+    The first dimension is the most significant bit.
+    """
+    n = len(dimensions)
+    return sum(1 << (n - 1 - i) for i, dim in enumerate(dimensions) if dim not in by)
+
+
+def aggregate_grouping_sets(frame: pd.DataFrame, dimensions: List[str], measures: List[str],
+                            sets: Sequence[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Sum measures over several grouping sets in one result (SQL GROUPING SETS)
+
+    Dimensions are encoded once and every set is accumulated with bincount
+    over the shared codes.
+
+    Args:
+        frame: Input rows with dimension and measure columns
+        dimensions: Columns that may be grouped on
+        measures: Numeric columns to sum
+        sets: Grouping sets; defaults to every subset of dimensions (CUBE)
+
+    Returns:
+        DataFrame with the dimension columns (NaN where rolled up), the
+        measures and a 'Grouping' column holding the grouping_id of each row
+    """
+    if sets is None:
+        n = len(dimensions)
+        sets = [[dim for i, dim in enumerate(dimensions) if mask & (1 << (n - 1 - i))]
+                for mask in range((1 << n) - 1, -1, -1)]
+
+    encoded = [encode_dimension(frame[dim]) for dim in dimensions]
+    codes = dict(zip(dimensions, (c for c, _ in encoded)))
+    sizes = dict(zip(dimensions, (len(d) for _, d in encoded)))
+    weights = {m: frame[m].to_numpy(dtype=np.float64) for m in measures}
+
+    out_codes = {dim: [] for dim in dimensions}
+    out_measures = {m: [] for m in measures}
+    out_grouping = []
+    for group in sets:
+        group = list(group)
+        if group and len(frame):
+            combined = combine_codes([codes[d] for d in group], [sizes[d] for d in group])
+            keys, first_row, group_ids = np.unique(combined, return_index=True, return_inverse=True)
+            group_ids = group_ids.ravel()
+            n_groups = len(keys)
+        else:
+            # Grand total (or an empty frame): a single group
+            first_row = np.zeros(1 if not group else 0, dtype=np.int64)
+            group_ids = np.zeros(len(frame), dtype=np.int64)
+            n_groups = len(first_row)
+
+        for dim in dimensions:
+            out_codes[dim].append(codes[dim][first_row] if dim in group
+                                  else np.full(n_groups, -1, dtype=np.int64))
+        for measure in measures:
+            sums = np.bincount(group_ids, weights=weights[measure], minlength=n_groups)
+            out_measures[measure].append(sums[:n_groups].astype(np.float64, copy=False))
+        out_grouping.append(np.full(n_groups, grouping_id(dimensions, group), dtype=np.int64))
+
+    result = {}
+    for dim, (_, dictionary) in zip(dimensions, encoded):
+        result[dim] = pd.Categorical.from_codes(np.concatenate(out_codes[dim]), categories=dictionary)
+    for measure in measures:
+        result[measure] = np.concatenate(out_measures[measure])
+    result['Grouping'] = np.concatenate(out_grouping)
+    return pd.DataFrame(result)
+
+
+def slice_grouping_set(cube: pd.DataFrame, dimensions: Sequence[str], by: Sequence[str],
+                       measures: List[str]) -> pd.DataFrame:
+    """
+    Rows of one grouping set from aggregate_grouping_sets, indexed by its dimensions
+
+    With no dimensions the single grand-total row is returned.
+    """
+    rows = cube[cube['Grouping'] == grouping_id(dimensions, by)]
+    if not by:
+        return rows[measures].reset_index(drop=True)
+    return rows.set_index(list(by))[measures].sort_index()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Allocation strategies for income summaries
+Decide how much of each payment is credited to each line of its invoice
+"""
+
+import numpy as np
+from typing import Union
+
+from src.income_summary_kernels import proportional_totals
+
+
+class AllocationStrategy:
+    """
+    Base class for payment allocation policies
+
+    Subclasses implement allocate(), which works on flat arrays with one
+    entry per (payment, invoice line) pair.
+
+    Attributes:
+        name: Short name used to select the strategy
+        amount_column: Payment column holding the amount to allocate
+        skip_unmatched: Drop payments whose invoice or customer is unknown
+        skip_other_items: Drop invoice lines that are neither Initial nor Term/Monthly fees
+        skip_zero_invoices: Drop payments against invoices totalling zero
+        decimals: Rounding applied to the summary amounts (None to keep full precision)
+        fused_kernel: Optional function that allocates and sums per summary group
+            in one pass (see income_summary_kernels.proportional_totals)
+    """
+
+    name = None
+    amount_column = 'Amount'
+    skip_unmatched = True
+    skip_other_items = True
+    skip_zero_invoices = True
+    decimals = 2
+    fused_kernel = None
+
+    def allocate(self, amounts: np.ndarray, item_totals: np.ndarray,
+                 invoice_totals: np.ndarray, payment_ids: np.ndarray) -> np.ndarray:
+        """
+        Amount credited to each invoice line
+
+        Args:
+            amounts: Payment amount, repeated for every line of its invoice
+            item_totals: Item Total of the line
+            invoice_totals: Sum of Item Total over the invoice
+            payment_ids: Position of the payment each entry belongs to
+
+        Returns:
+            Allocated amount per entry
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class FullAmountAllocation(AllocationStrategy):
+    """Legacy policy: every invoice line is credited the full amount applied to the invoice"""
+
+    name = 'full'
+    amount_column = 'Amount Applied to Invoice'
+    skip_unmatched = False
+    skip_other_items = False
+    skip_zero_invoices = False
+    decimals = None
+
+    def allocate(self, amounts, item_totals, invoice_totals, payment_ids):
+        return amounts.astype(np.float64, copy=True)
+
+
+class ProportionalAllocation(AllocationStrategy):
+    """Split each payment across invoice lines in proportion to their Item Total"""
+
+    name = 'proportional'
+    fused_kernel = staticmethod(proportional_totals)
+
+    def allocate(self, amounts, item_totals, invoice_totals, payment_ids):
+        return amounts * (item_totals / invoice_totals)
+
+
+class ExactPaiseAllocation(AllocationStrategy):
+    """
+    Proportional split in whole paise that adds up exactly to each payment
+
+    Lines first receive the floor of their proportional share; the remaining
+    paise go to the lines with the largest fractional parts.
+    """
+
+    name = 'exact'
+
+    def allocate(self, amounts, item_totals, invoice_totals, payment_ids):
+        if len(amounts) == 0:
+            return np.zeros(0, dtype=np.float64)
+
+        paise = np.round(amounts * 100)
+        shares = paise * (item_totals / invoice_totals)
+        allocated = np.floor(shares)
+        fractions = shares - allocated
+
+        # Paise left over per payment after flooring; the amount is repeated on
+        # every line, so each payment's paise are taken once
+        n_payments = int(payment_ids.max()) + 1
+        payment_paise = np.zeros(n_payments, dtype=np.float64)
+        payment_paise[payment_ids] = paise
+        leftover = payment_paise - np.bincount(payment_ids, weights=allocated, minlength=n_payments)
+        leftover = np.round(np.nan_to_num(leftover)).astype(np.int64)
+
+        # Rank lines within each payment by descending fractional part
+        order = np.lexsort((-fractions, payment_ids))
+        sorted_ids = payment_ids[order]
+        group_start = np.searchsorted(sorted_ids, sorted_ids, side='left')
+        rank = np.arange(len(order)) - group_start
+        bonus = np.zeros(len(order), dtype=np.float64)
+        bonus[order] = rank < leftover[sorted_ids]
+
+        return (allocated + bonus) / 100
+
+
+ALLOCATION_STRATEGIES = {
+    strategy.name: strategy
+    for strategy in [FullAmountAllocation, ProportionalAllocation, ExactPaiseAllocation]
+}
+
+
+def get_strategy(strategy: Union[str, AllocationStrategy]) -> AllocationStrategy:
+    """Resolve a strategy name ('full', 'proportional', 'exact') or instance"""
+    if isinstance(strategy, AllocationStrategy):
+        return strategy
+    try:
+        return ALLOCATION_STRATEGIES[strategy]()
+    except KeyError:
+        raise ValueError(f"Unknown allocation strategy: {strategy}. "
+                         f"Choose from {', '.join(ALLOCATION_STRATEGIES)}")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Billing audit for income summaries
+Checks every invoice line against the official Rate, School and Grade of its
+fee item in fee_items.csv, and reports the lines that do not agree
+"""
+
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OVER_BILLED = 'Over-billed'
+UNDER_BILLED = 'Under-billed'
+NOT_IN_MASTER = 'Item not in fee master'
+GRADE_MISMATCH = "Item grade differs from student's"
+SCHOOL_MISMATCH = "Item school differs from student's"
+AUDIT_EXCEPTIONS = [OVER_BILLED, UNDER_BILLED, NOT_IN_MASTER, GRADE_MISMATCH, SCHOOL_MISMATCH]
+
+AUDIT_COLUMNS = ['Invoice Date', 'Invoice Number', 'Customer ID', 'Customer Name', 'School', 'Grade',
+                 'Item Name', 'Item School', 'Item Grade', 'Rate', 'Quantity', 'Billed', 'Difference',
+                 'Exception']
+
+# Invoices that bill nothing
+IGNORED_STATUSES = ['Void']
+
+
+def parse_rates(rates: pd.Series) -> np.ndarray:
+    """Rates such as 'INR 25000.00', '₹25,000' or 25000 as floats (NaN when unreadable)"""
+    text = rates.astype(str).str.replace(r'[^\d.\-]', '', regex=True)
+    return pd.to_numeric(text, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def normalize_keys(values: pd.Series) -> pd.Series:
+    """Item names or SKUs compared without case or repeated spaces"""
+    text = values.astype(object).where(values.notna(), '').astype(str)
+    return text.str.strip().str.replace(r'\s+', ' ', regex=True).str.casefold()
+
+
+def base_grades(grades: pd.Series) -> pd.Series:
+    """Grades without their stream ('Grade 11 Commerce' -> 'Grade 11')"""
+    return grades.str.replace(r'^(Grade \d+)\s.*$', r'\1', regex=True)
+
+
+def mismatched(student: pd.Categorical, item: pd.Categorical, normalize=None) -> np.ndarray:
+    """
+    Lines where both values are known and differ
+
+    Only the categories are compared as text: both sides are coded against
+    one vocabulary and the lines compare integer codes.
+    """
+    labels = [pd.Series(np.asarray(values.categories, dtype=object), dtype=object)
+              for values in (student, item)]
+    if normalize is not None:
+        labels = [normalize(values) for values in labels]
+    vocabulary = pd.Index(pd.unique(pd.concat(labels).to_numpy()))
+    codes = []
+    for values, values_labels in zip((student, item), labels):
+        mapping = np.append(vocabulary.get_indexer(values_labels.to_numpy()), -1)
+        # Code -1 (unknown) picks the -1 appended to the mapping
+        codes.append(mapping[values.codes])
+    return (codes[0] >= 0) & (codes[1] >= 0) & (codes[0] != codes[1])
+
+
+class FeeMaster:
+    """
+    Fee items with their parsed Rate, looked up by SKU and by Item Name
+
+    Each distinct item name (or SKU) of the invoice lines is looked up once
+    in a hash index and the positions are gathered back to the lines.
+    """
+
+    def __init__(self, fee_items: pd.DataFrame):
+        self.items = fee_items.reset_index(drop=True)
+        self.rates = parse_rates(self.items['Rate'])
+        unreadable = int(np.isnan(self.rates).sum())
+        if unreadable:
+            logger.warning(f"Could not read the Rate of {unreadable} fee items; their amounts are not checked")
+
+        self.indexes = {}
+        for column in ['SKU', 'Item Name']:
+            if column in self.items.columns:
+                keys = normalize_keys(self.items[column])
+                keep = (keys != '') & ~keys.duplicated(keep='first')
+                if (~keep & (keys != '')).any():
+                    logger.warning(f"Duplicate {column} in the fee items; the first is used")
+                self.indexes[column] = (pd.Index(keys[keep].to_numpy()), np.flatnonzero(keep.to_numpy()))
+
+    def __len__(self):
+        return len(self.items)
+
+    def _lookup(self, column: str, values: pd.Series) -> np.ndarray:
+        if column not in self.indexes:
+            return np.full(len(values), -1)
+        index, rows = self.indexes[column]
+        codes, uniques = pd.factorize(values)
+        found = index.get_indexer(normalize_keys(pd.Series(uniques, dtype=object)))
+        positions = np.where(found >= 0, rows[np.maximum(found, 0)], -1)
+        return np.where(codes >= 0, positions[np.maximum(codes, 0)], -1) if len(uniques) else codes
+
+    def lookup(self, item_names: pd.Series, skus: Optional[pd.Series] = None) -> np.ndarray:
+        """Fee item row of each invoice line (-1 when unknown), by SKU where it has one"""
+        positions = self._lookup('Item Name', item_names)
+        if skus is not None:
+            by_sku = self._lookup('SKU', skus)
+            positions = np.where(by_sku >= 0, by_sku, positions)
+        return positions
+
+
+def audit_frame(lines: pd.DataFrame, item_rows: np.ndarray, master: FeeMaster,
+                students: Dict[str, pd.Categorical], tolerance: float = 0.01,
+                decimals: int = 2) -> pd.DataFrame:
+    """
+    One row per exception found on an invoice line
+
+    Args:
+        lines: Invoice lines with Item Name and Item Total (and Quantity, where exported)
+        item_rows: Fee item row of each line (see FeeMaster.lookup)
+        master: Fee items
+        students: 'School' and 'Grade' of each line's student (NaN when unknown)
+        tolerance: Largest difference from Rate x Quantity that is not reported
+        decimals: Rounding of the amounts
+
+    Returns:
+        DataFrame with AUDIT_COLUMNS, sorted by Invoice Number
+    """
+    found = item_rows >= 0
+    item_rows = np.maximum(item_rows, 0)
+    quantity = (pd.to_numeric(lines['Quantity'], errors='coerce').fillna(1).to_numpy(dtype=np.float64)
+                if 'Quantity' in lines.columns else np.ones(len(lines)))
+    billed = lines['Item Total'].to_numpy(dtype=np.float64)
+    expected = np.where(found, master.rates[item_rows], np.nan) * quantity
+    difference = billed - expected
+
+    # The item's School and Grade per line, as codes into the fee items' values
+    items = master.items
+    item_columns = {}
+    for column in ['School', 'Grade']:
+        values = items[column] if column in items.columns else pd.Series(np.nan, index=items.index)
+        codes, categories = pd.factorize(values)
+        item_columns[column] = pd.Categorical.from_codes(np.where(found, codes[item_rows], -1),
+                                                         categories=categories)
+
+    # NaN differences (unreadable rates, missing totals) are never exceptions
+    checks = {
+        OVER_BILLED: difference > tolerance,
+        UNDER_BILLED: difference < -tolerance,
+        NOT_IN_MASTER: ~found,
+        GRADE_MISMATCH: mismatched(students['Grade'], item_columns['Grade'], base_grades),
+        SCHOOL_MISMATCH: mismatched(students['School'], item_columns['School']),
+    }
+    positions = np.concatenate([np.flatnonzero(mask) for mask in checks.values()])
+    exceptions = np.repeat(np.arange(len(checks)), [int(mask.sum()) for mask in checks.values()])
+
+    def pick(column):
+        """Values of a line column on the reported lines only"""
+        return lines[column].take(positions).to_numpy() if column in lines.columns else None
+
+    report = pd.DataFrame({
+        'Invoice Date': pick('Invoice Date'),
+        'Invoice Number': pick('Invoice Number'),
+        'Customer ID': pick('Customer ID'),
+        'Customer Name': pick('Customer Name'),
+        'School': np.asarray(students['School'].take(positions), dtype=object),
+        'Grade': np.asarray(students['Grade'].take(positions), dtype=object),
+        'Item Name': pick('Item Name'),
+        'Item School': np.asarray(item_columns['School'].take(positions), dtype=object),
+        'Item Grade': np.asarray(item_columns['Grade'].take(positions), dtype=object),
+        'Rate': np.round(expected[positions] / quantity[positions], decimals),
+        'Quantity': quantity[positions],
+        'Billed': np.round(billed[positions], decimals),
+        'Difference': np.round(difference[positions], decimals),
+        'Exception': pd.Categorical.from_codes(exceptions, categories=list(checks)),
+    })
+    return report.sort_values(['Invoice Number', 'Item Name', 'Exception'], kind='stable',
+                              ignore_index=True)[AUDIT_COLUMNS]
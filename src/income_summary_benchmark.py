@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for income summaries
+Times loading and summary generation with the pandas and polars backends on
+synthetic exports at multiples of the bundled data size, and checks that both
+backends produce the same summary (exiting with 1 if the polars summary is
+the slower one). With --kernels, times the proportional allocation kernels
+against the per-line Python loop instead.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.income_summary_aggregation import group_codes, take_categorical
+from src.income_summary_engine import (
+    BACKENDS, FEE_MEASURES, SUMMARY_DIMENSIONS
+)
+from src.income_summary_kernels import (
+    NUMBA_AVAILABLE, _proportional_totals_loop, proportional_totals
+)
+from src.income_summary_polars import POLARS_AVAILABLE
+from src.income_summary_processor_v2 import IncomeSummaryProcessorV2
+from src.income_summary_synthetic import make_synthetic_data, write_synthetic_data
+
+# Roughly the number of students in the bundled exports
+BASE_STUDENTS = 2000
+
+
+def run_backend(base_path: Path, backend: str):
+    """Load and summarize with one backend; returns (load s, summary s, summary)"""
+    processor = IncomeSummaryProcessorV2(base_path, backend=backend)
+    start = time.perf_counter()
+    if not processor.load_data():
+        raise RuntimeError(f"{backend} backend failed to load: {processor.load_error}")
+    loaded = time.perf_counter()
+    summary = processor.generate_summary()
+    done = time.perf_counter()
+    return loaded - start, done - loaded, summary
+
+
+def kernel_inputs(processor: IncomeSummaryProcessorV2) -> tuple:
+    """Arguments of proportional_totals for all regular payments of a loaded processor"""
+    match = processor._match_payments(processor.payments_df)
+    regular, invoice_pos, contact_rows = match['regular'], match['invoice_pos'], match['contact_rows']
+    rows = pd.DataFrame({'Period': regular['Period'].to_numpy()})
+    for column in ['Grade', 'Section', 'School']:
+        rows[column] = take_categorical(processor.contacts_df[column], contact_rows)
+    groups, keys = group_codes(rows, SUMMARY_DIMENSIONS)
+
+    invoices = processor.invoice_index
+    return (invoices.offsets, invoices.item_totals, invoices.fee_codes, invoices.totals,
+            regular['Amount'].to_numpy(dtype=np.float64), invoice_pos, groups,
+            len(keys), len(FEE_MEASURES))
+
+
+def best_time(function, repeat: int = 3) -> float:
+    """Fastest of several timed calls"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark_kernels(scales, loop_limit: int = 10):
+    """Time the allocation kernels and the Python loop on in-memory synthetic data"""
+    kernels = {'numpy': lambda args: proportional_totals(*args, use_numba=False)}
+    if NUMBA_AVAILABLE:
+        kernels['numba'] = lambda args: proportional_totals(*args, use_numba=True)
+    else:
+        print("numba is not installed; timing the NumPy kernel only")
+
+    status = 0
+    print(f"{'Scale':>6} {'Payments':>10} {'Kernel':>14} {'Seconds':>9} {'Speedup':>8}")
+    for scale in scales:
+        processor = IncomeSummaryProcessorV2(Path(__file__).parent.parent)
+        processor.load_frames(**make_synthetic_data(n_students=BASE_STUDENTS * scale, seed=scale))
+        args = kernel_inputs(processor)
+        if 'numba' in kernels:
+            kernels['numba'](args)  # compile outside the timing
+
+        # Whole summaries: expanding payments into lines first, and fused
+        processor.strategy.fused_kernel = None
+        timings = {'summary/expand': best_time(processor._build_summary)}
+        del processor.strategy.fused_kernel
+        timings['summary/fused'] = best_time(processor._build_summary)
+
+        reference = None
+        if scale <= loop_limit:
+            timings['python loop'] = best_time(lambda: _proportional_totals_loop(*args), repeat=1)
+            reference = _proportional_totals_loop(*args)[0]
+        for name, kernel in kernels.items():
+            timings[name] = best_time(lambda: kernel(args))
+            if reference is not None:
+                assert np.array_equal(kernel(args)[0], reference), f"{name} differs from the loop"
+
+        baseline = timings.get('python loop', timings['summary/expand'])
+        for name, seconds in timings.items():
+            print(f"{scale:>5}x {len(args[4]):>10,} {name:>14} {seconds:>9.4f} "
+                  f"{baseline / seconds:>7.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the summary backends and kernels")
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 100],
+                        help=f"Multiples of {BASE_STUDENTS} students (e.g. 10 100 1000)")
+    parser.add_argument('--kernels', action='store_true',
+                        help="Micro-benchmark the allocation kernels instead of the backends")
+    args = parser.parse_args(argv)
+
+    if args.kernels:
+        benchmark_kernels(args.scales)
+        return 0
+
+    backends = [b for b in BACKENDS if b != 'polars' or POLARS_AVAILABLE]
+    if 'polars' not in backends:
+        print("polars is not installed; timing the pandas backend only")
+
+    status = 0
+    print(f"{'Scale':>6} {'Payments':>10} {'Backend':>8} {'Load s':>8} {'Summary s':>10} {'Total s':>8}")
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            base_path = Path(tmp)
+            write_synthetic_data(base_path, n_students=BASE_STUDENTS * scale, seed=scale)
+            payments = sum(1 for _ in open(base_path / 'data' / 'input' / 'student_payment.csv')) - 1
+
+            summaries, summary_times = {}, {}
+            for backend in backends:
+                load_time, summary_times[backend], summaries[backend] = run_backend(base_path, backend)
+                print(f"{scale:>5}x {payments:>10,} {backend:>8} {load_time:>8.2f} "
+                      f"{summary_times[backend]:>10.2f} {load_time + summary_times[backend]:>8.2f}")
+
+            if len(summaries) > 1:
+                pd.testing.assert_frame_equal(summaries['pandas'], summaries['polars'])
+                print(f"{'':>6} summaries identical ({len(summaries['pandas'])} rows)")
+                if summary_times['polars'] > summary_times['pandas']:
+                    print(f"{'':>6} ! the polars summary is slower than pandas")
+                    status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
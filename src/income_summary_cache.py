@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Shared cache of cleaned input frames
+Stores cleaned contacts, invoices, payments and fee items as uncompressed
+Arrow IPC (Feather v2) files that later processes open memory-mapped, so
+parallel workers share page-cache-backed buffers instead of re-parsing CSVs
+"""
+
+import hashlib
+import json
+import logging
+import os
+import types
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional
+    pa = None
+    feather = None
+
+from src.income_summary_loader import expand_sources
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the cache files changes; changes to the cleaning
+# code are picked up through FrameCache's version (see code_version)
+CACHE_VERSION = 2
+
+CACHED_FRAMES = ['contacts_df', 'invoices_df', 'payments_df', 'fee_items_df']
+
+
+def fingerprint_sources(sources: Iterable) -> str:
+    """
+    Fingerprint input files by name, size and modification time
+
+    File-like objects (uploads) are fingerprinted by their content.
+    """
+    digest = hashlib.sha1(f"v{CACHE_VERSION}".encode())
+    for source in sources:
+        if hasattr(source, 'read'):
+            if hasattr(source, 'getvalue'):
+                content = source.getvalue()
+            else:
+                source.seek(0)
+                content = source.read()
+                source.seek(0)
+            digest.update(content if isinstance(content, bytes) else str(content).encode())
+        else:
+            stat = Path(source).stat()
+            digest.update(f"{Path(source).resolve()}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def fingerprint_inputs(*inputs) -> str:
+    """Fingerprint several inputs, each a source or a list of sources (None is skipped)"""
+    return fingerprint_sources(
+        source for group in inputs if group is not None for source in expand_sources(group)
+    )
+
+
+def code_version(*functions) -> str:
+    """
+    Digest of the compiled code of functions, including the functions they define
+
+    Caches tagged with it are ignored once any of the functions changes,
+    with no version to bump by hand. Uses the bytecode, so it also works
+    where the source files are not shipped (e.g. the packaged app).
+    """
+    digest = hashlib.sha1()
+
+    def add(code: types.CodeType):
+        digest.update(code.co_code)
+        digest.update(repr(code.co_names).encode())
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                add(const)
+            elif isinstance(const, frozenset):
+                # Set order depends on the per-process string hash seed
+                digest.update(repr(sorted(map(repr, const))).encode())
+            else:
+                digest.update(repr(const).encode())
+
+    for function in functions:
+        add(function.__code__)
+    return digest.hexdigest()[:12]
+
+
+class FrameCache:
+    """
+    Memory-mapped Feather cache for cleaned input frames
+
+    Only the max_entries most recently used fingerprints are kept; older
+    ones are deleted whenever new inputs are saved. Entries written with
+    another version (of the cleaning code, see code_version) are misses.
+    """
+
+    def __init__(self, cache_dir: Path, max_entries: int = 4, version: str = ''):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.version = version
+
+    @property
+    def available(self) -> bool:
+        """Whether pyarrow is installed"""
+        return pa is not None
+
+    def _manifest_path(self, fingerprint: str) -> Path:
+        return self.cache_dir / f"{fingerprint}.json"
+
+    def _frame_path(self, fingerprint: str, name: str) -> Path:
+        return self.cache_dir / f"{fingerprint}.{name}.arrow"
+
+    def load(self, fingerprint: str) -> Optional[Dict]:
+        """
+        Open cached frames for a fingerprint
+
+        Returns:
+            Dict with the frames and stored metadata, or None on a cache miss
+        """
+        manifest_path = self._manifest_path(fingerprint)
+        if not self.available or not manifest_path.exists():
+            return None
+
+        try:
+            manifest = json.loads(manifest_path.read_text())
+            if (manifest.get('version'), manifest.get('cleaning')) != (CACHE_VERSION, self.version):
+                logger.info(f"Ignoring cached inputs {fingerprint[:12]} written by other code")
+                return None
+            result = {'metadata': manifest.get('metadata', {})}
+            for name in CACHED_FRAMES:
+                if name not in manifest['frames']:
+                    result[name] = None
+                    continue
+                table = feather.read_table(self._frame_path(fingerprint, name), memory_map=True)
+                # split_blocks keeps numeric columns as views on the mapped file
+                # instead of consolidating them into freshly allocated blocks
+                result[name] = table.to_pandas(split_blocks=True)
+            # Mark as recently used, so pruning removes the others first
+            try:
+                os.utime(manifest_path)
+            except OSError:
+                pass
+            logger.info(f"Opened cached inputs {fingerprint[:12]} from {self.cache_dir}")
+            return result
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache {fingerprint[:12]}: {str(e)}")
+            return None
+
+    def save(self, fingerprint: str, frames: Dict[str, pd.DataFrame], metadata: Dict = None):
+        """Write frames uncompressed (so they can be memory-mapped) and then the manifest"""
+        if not self.available:
+            logger.info("pyarrow not installed; skipping input cache")
+            return
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            stored = []
+            for name in CACHED_FRAMES:
+                frame = frames.get(name)
+                if frame is None:
+                    continue
+                path = self._frame_path(fingerprint, name)
+                tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+                feather.write_feather(frame.reset_index(drop=True), tmp_path,
+                                      compression='uncompressed')
+                os.replace(tmp_path, path)
+                stored.append(name)
+
+            # Manifest last, so readers never see a partially written cache
+            manifest = {'version': CACHE_VERSION, 'cleaning': self.version, 'frames': stored,
+                        'metadata': metadata or {}}
+            tmp_manifest = self._manifest_path(fingerprint).with_suffix(f'.{os.getpid()}.tmp')
+            tmp_manifest.write_text(json.dumps(manifest))
+            os.replace(tmp_manifest, self._manifest_path(fingerprint))
+            logger.info(f"Cached cleaned inputs as {fingerprint[:12]} in {self.cache_dir}")
+        except Exception as e:
+            logger.warning(f"Could not write input cache: {str(e)}")
+            return
+        self.prune()
+
+    def prune(self):
+        """Delete all but the max_entries most recently used fingerprints"""
+        manifests = sorted(self.cache_dir.glob('*.json'), key=lambda path: path.stat().st_mtime_ns,
+                           reverse=True)
+        for manifest_path in manifests[self.max_entries:]:
+            fingerprint = manifest_path.stem
+            # Manifest first, so readers never open a fingerprint with missing frames
+            for path in [manifest_path] + sorted(self.cache_dir.glob(f"{fingerprint}.*.arrow")):
+                try:
+                    path.unlink()
+                except OSError as e:  # e.g. still mapped by another process on Windows
+                    logger.warning(f"Could not delete cached {path.name}: {str(e)}")
+            logger.info(f"Pruned cached inputs {fingerprint[:12]} from {self.cache_dir}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Daily cashbook for income summaries
+Receipts per day, school, payment mode and deposit account with running
+totals, answered from a date-sorted index of receipts
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.income_summary_aggregation import aggregate_by_codes
+
+# A receipt is one customer payment, however many invoices it was applied to
+RECEIPT_ID_COLUMN = 'CustomerPayment ID'
+
+# Accounts are kept apart in the running totals; School is the payment's Location Name
+ACCOUNT_COLUMNS = ['School', 'Mode', 'Deposit To']
+CASHBOOK_MEASURES = ['Receipts', 'Amount']
+CASHBOOK_COLUMNS = ['Date'] + ACCOUNT_COLUMNS + CASHBOOK_MEASURES + ['Running Total']
+
+
+class ReceiptDateIndex:
+    """
+    Receipts sorted by Date
+
+    Payment exports repeat a customer payment once per invoice it was applied
+    to, so only its first row is kept. Receipts dated start..end are the
+    contiguous slice lo:hi found by binary search, with their accounts
+    already encoded as categoricals.
+    """
+
+    def __init__(self, payments: pd.DataFrame):
+        if RECEIPT_ID_COLUMN in payments.columns:
+            ids = payments[RECEIPT_ID_COLUMN]
+            first = ids.isna() | ~ids.duplicated(keep='first')
+            rows = np.flatnonzero(first.to_numpy())
+        else:
+            rows = np.arange(len(payments))
+        dates = payments['Date'].to_numpy(dtype='datetime64[ns]')[rows]
+        order = np.argsort(dates, kind='stable')
+        # Undated receipts (NaT) sort last and fall outside every range
+        self.rows = rows[order]
+        self.dates = dates[order]
+
+        sources = {'School': 'Location Name', 'Mode': 'Mode', 'Deposit To': 'Deposit To'}
+        receipts = {'Date': self.dates}
+        for column, source in sources.items():
+            values = (payments[source].take(self.rows).astype(object).to_numpy()
+                      if source in payments.columns else np.full(len(self.rows), None))
+            receipts[column] = pd.Categorical(pd.Series(values).fillna('Unknown'))
+        receipts['Receipts'] = 1.0
+        receipts['Amount'] = np.nan_to_num(
+            pd.to_numeric(payments['Amount'].take(self.rows), errors='coerce').to_numpy(dtype=np.float64))
+        self.receipts = pd.DataFrame(receipts)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def bounds(self, start: Optional[pd.Timestamp] = None,
+               end: Optional[pd.Timestamp] = None) -> tuple:
+        """(lo, hi) of the receipts dated from start to end, both inclusive (None for open)"""
+        dated = len(self.dates) - int(np.isnat(self.dates).sum())
+        lo = 0 if start is None else int(np.searchsorted(self.dates[:dated], np.datetime64(start, 'ns')))
+        hi = dated if end is None else int(np.searchsorted(self.dates[:dated], np.datetime64(end, 'ns'),
+                                                           side='right'))
+        return lo, max(lo, hi)
+
+    def slice(self, start: Optional[pd.Timestamp] = None,
+              end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """Receipts dated from start to end, in date order"""
+        lo, hi = self.bounds(start, end)
+        return self.receipts.iloc[lo:hi]
+
+
+def cashbook_frame(receipts: pd.DataFrame, decimals: int = 2) -> pd.DataFrame:
+    """
+    Receipts and amounts per day and account, with a running total per account
+
+    Args:
+        receipts: Rows of ReceiptDateIndex.receipts, in date order
+        decimals: Rounding of the amounts
+
+    Returns:
+        DataFrame with CASHBOOK_COLUMNS, sorted by Date and then account
+    """
+    # Grouped by account first, so each account's days are contiguous and in order
+    book = aggregate_by_codes(receipts, dimensions=ACCOUNT_COLUMNS + ['Date'],
+                              measures=CASHBOOK_MEASURES)
+    amounts = book['Amount'].to_numpy(dtype=np.float64)
+    totals = np.cumsum(amounts)
+    accounts = np.column_stack([book[column].cat.codes.to_numpy() for column in ACCOUNT_COLUMNS])
+    new_account = np.ones(len(book), dtype=bool)
+    new_account[1:] = (accounts[1:] != accounts[:-1]).any(axis=1)
+    starts = np.flatnonzero(new_account)
+    before = (totals - amounts)[starts]
+    book['Running Total'] = totals - np.repeat(before, np.diff(np.append(starts, len(book))))
+
+    book['Date'] = pd.to_datetime(np.asarray(book['Date'], dtype='datetime64[ns]'))
+    book['Receipts'] = book['Receipts'].astype(np.int64)
+    book[['Amount', 'Running Total']] = book[['Amount', 'Running Total']].round(decimals)
+    book = book.sort_values(['Date'] + ACCOUNT_COLUMNS, ignore_index=True)
+    return book[CASHBOOK_COLUMNS]
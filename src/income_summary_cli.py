@@ -5,21 +5,166 @@ Command-line interface that works on all platforms
 """
 
 import sys
+import argparse
 from pathlib import Path
 from datetime import datetime
 import calendar
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from src.income_summary_engine import BACKENDS
 from src.income_summary_processor_v2 import IncomeSummaryProcessorV2
+from src.income_summary_receivables import AGEING_BUCKETS
+
+
+def parse_args():
+    """Parse optional input locations"""
+    parser = argparse.ArgumentParser(description="Excel Group - Income Summary Generator")
+    help_text = "CSV file, glob pattern or directory of exports (may be repeated)"
+    parser.add_argument('--contacts', action='append', help=help_text)
+    parser.add_argument('--invoices', action='append', help=help_text)
+    parser.add_argument('--payments', action='append', help=help_text)
+    parser.add_argument('--cache-dir', type=Path,
+                        help="Directory for the memory-mapped cache of cleaned inputs")
+    parser.add_argument('--backend', choices=BACKENDS, default='pandas',
+                        help="Execution backend for loading and aggregation (polars is optional)")
+    parser.add_argument('--warehouse', type=Path,
+                        help="Read from this partitioned Parquet warehouse instead of the CSV exports")
+    parser.add_argument('--ingest', action='store_true',
+                        help="Convert the exports into the warehouse (default data/warehouse) and exit")
+    parser.add_argument('--report', choices=['summary', 'collection', 'receivables', 'cashbook', 'audit'],
+                        default='summary',
+                        help="Income summary, fees billed against collected, outstanding "
+                             "balances per student with ageing, daily receipts per school, "
+                             "payment mode and deposit account, or invoice lines that disagree "
+                             "with the fee items")
+    parser.add_argument('--as-of',
+                        help="Receivables: date of the balances and ageing (YYYY-MM-DD, default today). "
+                             "Summary and collection: only count payments entered (Created Time) by "
+                             "this date or time, e.g. the day the books were closed")
+    parser.add_argument('--contact-history', action='append',
+                        help="Earlier contact exports (may be repeated); payments are then attributed "
+                             "to the grade and section a student had on the payment date")
+    parser.add_argument('--group-by', action='append',
+                        help="Also total the summary by these columns (may be repeated): any contact "
+                             "or payment column (e.g. CF.Gender, Mode), Month, Year, Fiscal Year "
+                             "or Fee Type")
+    parser.add_argument('--measures', nargs='+',
+                        help="Measures of the --group-by report: summary measures, Total and Payments "
+                             "(default the summary measures)")
+    parser.add_argument('--from', dest='start',
+                        help="Cashbook: first day (YYYY-MM-DD, default the first receipt)")
+    parser.add_argument('--to', dest='end',
+                        help="Cashbook: last day (YYYY-MM-DD, default the last receipt)")
+    return parser.parse_args()
+
+
+def load_contact_history(processor, exports):
+    """Load earlier contact exports, reporting success or the error"""
+    if not processor.load_contact_history(exports):
+        print(f"Failed to load the contact history: {processor.load_error}")
+        return False
+    print(f"✓ Attributing payments from {len(processor.contact_exports)} earlier contact exports")
+    return True
+
+
+def show_collection_rates(processor, school=None, **filters):
+    """Generate, save and print fees billed against fees collected"""
+    report = processor.generate_collection_rates(school=school, **filters)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = processor.save_summary(report, f"collection_rates_{timestamp}.csv")
+    
+    print(f"\n✓ Billed vs collected for {len(report)} grade, section and month cells")
+    print(f"✓ Output saved to: {output_path}")
+    if not report.empty:
+        totals = report.groupby('Fee Type', observed=True)[['Billed', 'Collected']].sum()
+        totals['Collection Rate (%)'] = (totals['Collected'] / totals['Billed'] * 100).round(2)
+        print("\nBy fee type:")
+        print(totals.to_string())
+
+
+def show_receivables(processor, as_of=None):
+    """Generate, save and print the receivables and ageing report"""
+    report = processor.generate_receivables(as_of=as_of)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = processor.save_summary(report, f"receivables_{timestamp}.csv")
+    
+    print(f"\n✓ Receivables as of {as_of or 'today'} for {len(report)} students")
+    print(f"✓ Output saved to: {output_path}")
+    if not report.empty:
+        columns = ['Opening Balance'] + AGEING_BUCKETS + ['Outstanding']
+        totals = report.groupby('School', observed=True)[columns].sum()
+        print("\nOutstanding by school:")
+        print(totals.to_string(float_format=lambda value: f"₹{value:,.2f}"))
+
+
+def show_cashbook(processor, start=None, end=None):
+    """Generate, save and print the daily cashbook"""
+    report = processor.generate_cashbook(start=start, end=end)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = processor.save_summary(report, f"cashbook_{timestamp}.csv")
+    
+    print(f"\n✓ Cashbook from {start or 'the first receipt'} to {end or 'the last receipt'}: "
+          f"{report['Receipts'].sum()} receipts on {report['Date'].nunique()} days")
+    print(f"✓ Output saved to: {output_path}")
+    if not report.empty:
+        totals = report.groupby(['School', 'Mode', 'Deposit To'], observed=True)[
+            ['Receipts', 'Amount']].sum()
+        print("\nReceipts by school, mode and account:")
+        print(totals.to_string(float_format=lambda value: f"₹{value:,.2f}"))
+
+
+def show_billing_audit(processor):
+    """Generate, save and print the invoice lines that disagree with the fee items"""
+    report = processor.generate_billing_audit()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = processor.save_summary(report, f"billing_audit_{timestamp}.csv")
+    
+    print(f"\n✓ {len(report)} billing exceptions on {report['Invoice Number'].nunique()} invoices")
+    print(f"✓ Output saved to: {output_path}")
+    if not report.empty:
+        totals = report.groupby('Exception', observed=True).agg(
+            Lines=('Invoice Number', 'size'), Billed=('Billed', 'sum'))
+        print("\nBy exception:")
+        print(totals.to_string(float_format=lambda value: f"₹{value:,.2f}"))
+
+
+def show_grouped(processor, dimensions, measures=None, **filters):
+    """Generate, save and print the summary totalled by any dimensions"""
+    report = processor.summary_by(dimensions, measures, **filters)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = processor.save_summary(report, f"summary_by_{timestamp}.csv")
+    
+    print(f"\n✓ Summary by {', '.join(dimensions)}: {len(report)} rows")
+    print(f"✓ Output saved to: {output_path}")
+    if not report.empty:
+        print(report.head(30).to_string(index=False))
+        if len(report) > 30:
+            print(f"... {len(report) - 30} more in the output file")
+
+
+def show_drill_down(processor, summary_df, cell, **filters):
+    """Print the students and receipts behind one summary row"""
+    row = summary_df.loc[cell]
+    details = processor.drill_down(cell, **filters)
+    print(f"\n{row['School']} / {row['Grade']} / {row['Section']} / {row['Month']}: "
+          f"{len(details)} payments from {details['Contact ID'].nunique()} students")
+    columns = ['Measure', 'Allocated', 'Date', 'Payment Number', 'Contact ID', 'Display Name']
+    columns = [col for col in columns if col in details.columns]
+    print(details[columns].head(20).to_string(index=False))
+    if len(details) > 20:
+        print(f"... {len(details) - 20} more in the lineage file")
 
 
 def main():
+    args = parse_args()
+    custom_inputs = any([args.contacts, args.invoices, args.payments])
+    
     print("=" * 60)
     print("Excel Group - Income Summary Generator")
     print("=" * 60)
     
-    processor = IncomeSummaryProcessorV2()
+    processor = IncomeSummaryProcessorV2(cache_dir=args.cache_dir, backend=args.backend)
     
     # Check if default files exist
     data_path = Path.cwd() / 'data'
@@ -29,7 +174,21 @@ def main():
         (data_path / 'input' / 'student_payment.csv').exists()
     ])
     
-    if default_files_exist:
+    if args.ingest:
+        print("\nConverting exports to the Parquet warehouse...")
+        if not processor.load_data(contacts=args.contacts, invoices=args.invoices,
+                                   payments=args.payments):
+            print("Failed to load data files")
+            return
+        manifest_path = processor.ingest_warehouse(args.warehouse)
+        print(f"✓ Warehouse written to: {manifest_path.parent}")
+        return
+    
+    if args.warehouse:
+        print(f"\n✓ Reading from the warehouse in {args.warehouse}")
+    elif custom_inputs:
+        print("\n✓ Using input files from the command line")
+    elif default_files_exist:
         print("\n✓ Found data files in default location")
         use_default = input("Use default data files? (y/n): ").lower() == 'y'
         
@@ -45,10 +204,35 @@ def main():
         print("  - student_payment.csv")
         return
     
-    # Load data
-    print("\nLoading data files...")
-    if not processor.load_data():
-        print("Failed to load data files")
+    if args.report in ('receivables', 'cashbook', 'audit'):
+        loaded = (processor.load_warehouse(args.warehouse) if args.warehouse else
+                  processor.load_data(contacts=args.contacts, invoices=args.invoices,
+                                      payments=args.payments))
+        if not loaded:
+            print(f"Failed to load data: {processor.load_error}")
+            return
+        if args.contact_history and not load_contact_history(processor, args.contact_history):
+            return
+        if args.report == 'cashbook':
+            show_cashbook(processor, args.start, args.end)
+        elif args.report == 'audit':
+            try:
+                show_billing_audit(processor)
+            except ValueError as e:
+                print(f"Cannot audit the invoices: {e}")
+        else:
+            show_receivables(processor, args.as_of)
+        input("\nPress Enter to exit...")
+        return
+    
+    # Load data (warehouse partitions are read once the filters are known)
+    if not args.warehouse:
+        print("\nLoading data files...")
+        if not processor.load_data(contacts=args.contacts, invoices=args.invoices,
+                                   payments=args.payments):
+            print("Failed to load data files")
+            return
+    if args.contact_history and not load_contact_history(processor, args.contact_history):
         return
     
     # Get filter options
@@ -79,6 +263,16 @@ def main():
         except ValueError:
             print("Invalid year, using all years")
     
+    # Academic year selection (April - March)
+    print(f"\nSelect Academic Year, e.g. {current_year} for {current_year}-{(current_year + 1) % 100:02d}")
+    fiscal_year_input = input("Academic year (press Enter for all): ").strip()
+    fiscal_year_filter = None
+    if fiscal_year_input:
+        try:
+            fiscal_year_filter = int(fiscal_year_input)
+        except ValueError:
+            print("Invalid academic year, using all academic years")
+    
     # School selection
     print("\nSelect School:")
     print("0. All Schools")
@@ -98,22 +292,44 @@ def main():
     # Generate summary
     print("\n" + "-" * 40)
     print(f"Generating summary for {month_filter or 'all months'} {year_filter or ''}")
+    if fiscal_year_filter:
+        print(f"Academic year: {fiscal_year_filter}-{(fiscal_year_filter + 1) % 100:02d}")
     if school_name != 'All Schools':
         print(f"School: {school_name}")
+    if args.as_of:
+        print(f"As recorded by: {args.as_of}")
     print("-" * 40)
     
-    summary_df = processor.generate_summary(month=month_filter, year=year_filter)
+    if args.warehouse and not processor.load_warehouse(
+            args.warehouse, school=school_map.get(school_choice), month=month_filter,
+            year=year_filter, fiscal_year=fiscal_year_filter):
+        print(f"Failed to read the warehouse: {processor.load_error}")
+        return
     
-    # Apply school filter if needed
-    if school_choice in school_map and not summary_df.empty:
-        summary_df = summary_df[summary_df['School'] == school_map[school_choice]]
+    filters = dict(month=month_filter, year=year_filter, fiscal_year=fiscal_year_filter,
+                   school=school_map.get(school_choice), as_of=args.as_of)
+    if args.group_by:
+        try:
+            show_grouped(processor, args.group_by, args.measures, **filters)
+        except ValueError as e:
+            print(f"Cannot group the summary: {e}")
+            return
+    summary_df = processor.generate_summary(**filters)
     
-    # Save output
+    if args.report == 'collection':
+        show_collection_rates(processor, **filters)
+        input("\nPress Enter to exit...")
+        return
+    
+    # Save output, with the payments behind every row next to it
     output_path = processor.save_summary(summary_df)
+    lineage_path = processor.save_summary(processor.drill_down(**filters),
+                                          f"{output_path.stem}_lineage.csv")
     
     # Display results
     print(f"\n✓ Summary generated successfully!")
     print(f"✓ Output saved to: {output_path}")
+    print(f"✓ Payments behind each row (Cell = row number from 0) saved to: {lineage_path}")
     
     if not summary_df.empty:
         print(f"\nSummary Statistics:")
@@ -126,6 +342,34 @@ def main():
     else:
         print("\nNo data found for the selected filters.")
     
+    # Payments left out of the summary, and how the totals reconcile
+    validation = processor.validate(month=month_filter, year=year_filter,
+                                    fiscal_year=fiscal_year_filter, as_of=args.as_of)
+    issues, reconciliation = validation['issues'], validation['reconciliation']
+    if school_name != 'All Schools':
+        reconciliation = reconciliation[reconciliation['School'] == school_name]
+    if not issues.empty:
+        issues_path = processor.save_issues(issues)
+        print(f"\n⚠️  {len(issues)} payments with issues "
+              f"(₹{reconciliation['Dropped'].sum():,.2f} left out of the summary):")
+        for issue, count in issues['Issue'].value_counts().items():
+            print(f"  - {issue}: {count}")
+        print(f"  Details saved to: {issues_path}")
+    difference = reconciliation['Difference'].abs().sum()
+    if difference > 0.05 * max(len(reconciliation), 1):
+        print(f"\n⚠️  Summary differs from the payments by ₹{difference:,.2f} beyond "
+              f"dropped payments and other items")
+    
+    # Trace rows back to their students and receipts
+    while not summary_df.empty:
+        choice = input(f"\nRow to drill down into (0-{len(summary_df) - 1}, Enter to finish): ").strip()
+        if not choice:
+            break
+        if not choice.isdigit() or int(choice) >= len(summary_df):
+            print("Invalid row number")
+            continue
+        show_drill_down(processor, summary_df, int(choice), **filters)
+    
     input("\nPress Enter to exit...")
 
 
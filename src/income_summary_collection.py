@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Billed-vs-collected comparison for income summaries
+Puts the fees invoiced for each School, Grade, Section, Month and fee type
+next to the fees collected for the same cells
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.income_summary_aggregation import aggregate_by_codes
+from src.income_summary_periods import period_labels
+
+COLLECTION_DIMENSIONS = ['School', 'Grade', 'Section', 'Period', 'Fee Type']
+COLLECTION_COLUMNS = ['School', 'Grade', 'Section', 'Month', 'Fee Type',
+                      'Billed', 'Collected', 'Collection Rate (%)']
+
+
+def fee_collections(summary: pd.DataFrame, fee_measures: List[str]) -> pd.DataFrame:
+    """
+    Collected fees in long form, one row per summary row and fee type
+
+    Args:
+        summary: Summary rows with Grade, Section, School, Period and the fee measures
+        fee_measures: Measure columns to unpivot, which become the Fee Type
+
+    Returns:
+        DataFrame with COLLECTION_DIMENSIONS and Collected
+    """
+    n_rows = len(summary)
+    collected = pd.DataFrame({
+        column: np.tile(summary[column].to_numpy(), len(fee_measures))
+        for column in ['School', 'Grade', 'Section', 'Period']
+    })
+    collected['Fee Type'] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(fee_measures)), n_rows), categories=fee_measures)
+    collected['Collected'] = np.concatenate(
+        [summary[measure].to_numpy(dtype=np.float64) for measure in fee_measures])
+    return collected
+
+
+def collection_rates(billed: pd.DataFrame, collected: pd.DataFrame, fee_measures: List[str],
+                     decimals: int = 2) -> pd.DataFrame:
+    """
+    Outer join of billed and collected fees on COLLECTION_DIMENSIONS
+
+    The rate is Collected / Billed in percent, and NaN for cells where
+    nothing was billed (e.g. fees collected for an earlier month's invoice).
+
+    Args:
+        billed: Rows with COLLECTION_DIMENSIONS and Billed
+        collected: Rows with COLLECTION_DIMENSIONS and Collected
+        fee_measures: Fee types, in report order
+        decimals: Rounding of the amounts and the rate
+
+    Returns:
+        DataFrame with COLLECTION_COLUMNS and Period, sorted like the summary
+    """
+    # Outer join as one aggregation over the stacked rows
+    rows = pd.concat([billed.assign(Collected=0.0), collected.assign(Billed=0.0)],
+                     ignore_index=True)
+    report = aggregate_by_codes(rows, dimensions=COLLECTION_DIMENSIONS,
+                                measures=['Billed', 'Collected'],
+                                categories={'Fee Type': fee_measures})
+    # Cells that only collected other items' or zero amounts add nothing
+    report = report[((report['Billed'] != 0) | (report['Collected'] != 0)).to_numpy()]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(report['Billed'] != 0, report['Collected'] / report['Billed'] * 100, np.nan)
+    report['Collection Rate (%)'] = rate
+    measures = ['Billed', 'Collected', 'Collection Rate (%)']
+    report[measures] = report[measures].round(decimals)
+
+    report['Period'] = report['Period'].astype(np.int32)
+    report = report.sort_values(['School', 'Grade', 'Section', 'Period', 'Fee Type'],
+                                ignore_index=True)
+    report['Month'] = period_labels(report['Period'])
+    return report[COLLECTION_COLUMNS + ['Period']]
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Configurable group-by dimensions for income summaries
+Resolves a dimension name to where its values come from (the payment
+period, the allocated invoice line, the student's contact or the payment)
+and encodes it as a categorical over the summary rows, so any column can be
+grouped on by gathering integer codes rather than with its own code path
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.income_summary_aggregation import encode_dimension
+from src.income_summary_periods import DEFAULT_FISCAL_YEAR_START, fiscal_year_of, period_labels
+
+# Derived from the payment's Period
+PERIOD_DIMENSIONS = ['Month', 'Year', 'Fiscal Year']
+
+# Columns of the summary rows themselves (Fee Type only once expanded into invoice lines)
+ROW_DIMENSIONS = ['Period', 'Fee Type']
+
+# Measures computed from the summary rows besides the amounts themselves
+TOTAL_MEASURE = 'Total'
+PAYMENTS_MEASURE = 'Payments'
+
+# Where a dimension's values come from, in order of precedence
+DIMENSION_SOURCES = ['period', 'row', 'contact', 'payment']
+
+
+def dimension_source(name: str, contact_columns: Sequence[str],
+                     payment_columns: Sequence[str]) -> str:
+    """
+    Source of a dimension: 'period', 'row', 'contact' or 'payment'
+
+    Contact columns win over payment columns of the same name (e.g.
+    Location Name), since the summary is about the students.
+
+    Raises:
+        ValueError: If no source has the column
+    """
+    if name in PERIOD_DIMENSIONS:
+        return 'period'
+    if name in ROW_DIMENSIONS:
+        return 'row'
+    if name in contact_columns:
+        return 'contact'
+    if name in payment_columns:
+        return 'payment'
+    raise ValueError(f"Cannot group by {name}; choose a contact or payment column or one of "
+                     f"{', '.join(PERIOD_DIMENSIONS + ROW_DIMENSIONS)}")
+
+
+def period_dimension(periods: np.ndarray, name: str,
+                     fiscal_year_start: int = DEFAULT_FISCAL_YEAR_START) -> pd.Categorical:
+    """
+    Month, Year or Fiscal Year of integer YYYYMM periods, ordered chronologically
+
+    Only the distinct periods are labelled; the rows gather the codes.
+    Missing periods (0) give NaN.
+    """
+    codes, periods_seen = encode_dimension(pd.Series(np.asarray(periods)))
+    periods_seen = periods_seen.to_numpy(dtype=np.int64)
+    if name == 'Month':
+        labels = period_labels(pd.Series(periods_seen)).astype(object).to_numpy()
+    elif name == 'Year':
+        labels = (periods_seen // 100).astype(object)
+    elif name == 'Fiscal Year':
+        years = fiscal_year_of(periods_seen, fiscal_year_start)
+        labels = np.array([f"{year}-{(year + 1) % 100:02d}" for year in years], dtype=object)
+    else:
+        raise ValueError(f"Unknown period dimension: {name}")
+    labels = np.array(labels, dtype=object)
+    labels[periods_seen <= 0] = None
+
+    # Periods are sorted, so labels in order of appearance are chronological
+    label_codes, categories = pd.factorize(pd.Series(labels, dtype=object), sort=False)
+    gathered = np.where(codes >= 0, label_codes[np.maximum(codes, 0)], -1) if len(label_codes) \
+        else codes
+    return pd.Categorical.from_codes(gathered, categories=categories, ordered=True)
+
+
+def validate_measures(measures: Sequence[str], amount_measures: List[str]) -> List[str]:
+    """Requested measures, checked against the amounts and the derived measures"""
+    available = amount_measures + [TOTAL_MEASURE, PAYMENTS_MEASURE]
+    unknown = [measure for measure in measures if measure not in available]
+    if unknown:
+        raise ValueError(f"Unknown measures: {', '.join(unknown)}; choose from {', '.join(available)}")
+    return list(measures)
@@ -0,0 +1,1750 @@
+#!/usr/bin/env python3
+"""
+Income Summary Engine for Excel Group of Schools
+Shared load, clean, filter and aggregation pipeline behind both processors;
+the payment allocation policy is a pluggable strategy
+"""
+
+import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import logging
+from typing import Dict, List, Optional, Union
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.income_summary_aggregation import (
+    aggregate_by_codes, aggregate_grouping_sets, group_codes, slice_grouping_set,
+    take_categorical
+)
+from src.income_summary_allocation import AllocationStrategy, get_strategy
+from src.income_summary_cache import CACHED_FRAMES, FrameCache, code_version, fingerprint_inputs
+from src.income_summary_audit import IGNORED_STATUSES, FeeMaster, audit_frame
+from src.income_summary_cashbook import ReceiptDateIndex, cashbook_frame
+from src.income_summary_collection import (
+    COLLECTION_DIMENSIONS, collection_rates, fee_collections
+)
+from src.income_summary_dimensions import (
+    PAYMENTS_MEASURE, TOTAL_MEASURE, dimension_source, period_dimension, validate_measures
+)
+from src.income_summary_history import HISTORY_COLUMNS, ContactHistory, contact_versions
+from src.income_summary_kernels import expand_offsets
+from src.income_summary_lineage import LineageIndex, cell_ids, drill_down_frame, lineage_frame
+from src.income_summary_loader import (
+    PAYMENT_ID_COLUMNS, convert_dates, drop_overlapping_ids, expand_sources, read_csv_sources,
+    read_input
+)
+from src import income_summary_polars as polars_backend
+from src.income_summary_periods import (
+    DEFAULT_FISCAL_YEAR_START, period_codes, period_labels, period_mask
+)
+from src.income_summary_receivables import (
+    ageing_codes, receivables_by_contact, receivables_frame
+)
+from src.income_summary_results import SummaryCache
+from src.income_summary_search import (
+    INVOICE_ACTIVITY_COLUMNS, PAYMENT_ACTIVITY_COLUMNS, StudentSearchIndex, student_matches
+)
+from src.income_summary_validation import (
+    ISSUE_COLUMNS, OPENING_CUSTOMER_NOT_FOUND, classify_payments, issue_rows, log_issues, reconcile
+)
+from src.income_summary_warehouse import read_warehouse, write_warehouse
+
+logger = logging.getLogger(__name__)
+
+OPENING_BALANCE = 'Customer opening balance'
+
+SUMMARY_DIMENSIONS = ['Grade', 'Section', 'School', 'Period']
+SUMMARY_MEASURES = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+SUMMARY_COLUMNS = ['Grade', 'Section', 'School', 'Opening Balance', 'Initial Fee',
+                   'Month', 'Term / Monthly Fee']
+
+# Fee types credited by invoice lines, in the order of InvoiceIndex.fee_codes
+FEE_MEASURES = ['Initial Fee', 'Term / Monthly Fee']
+
+# Dimensions of the precomputed rollup cube (every combination, with subtotals)
+CUBE_DIMENSIONS = ['School', 'Grade', 'Section', 'Month']
+
+# Contact columns stored as categoricals
+CATEGORICAL_CONTACT_COLUMNS = ['School', 'Grade', 'Section']
+
+# Execution backends for loading and summary aggregation
+BACKENDS = ['pandas', 'polars']
+
+
+def categorize_fee_items(item_names: pd.Series) -> pd.Series:
+    """Map invoice item names to summary fee types (None for other items)"""
+    names = item_names.astype(str).str.lower()
+    is_initial = names.str.contains('initial academic fee', regex=False)
+    is_term = (names.str.contains('term', regex=False) |
+               names.str.contains('monthly fee', regex=False))
+    return pd.Series(
+        np.select([is_initial, is_term], ['Initial Fee', 'Term / Monthly Fee'], default=None),
+        index=item_names.index
+    )
+
+
+class InvoiceIndex:
+    """
+    Invoice lines grouped by invoice number in a CSR layout
+
+    Lines of invoice i are lines[offsets[i]:offsets[i + 1]], in export order,
+    so payments are joined to their lines with array arithmetic instead of a merge.
+    """
+
+    def __init__(self, invoices_df: pd.DataFrame):
+        invoices_df = invoices_df[invoices_df['Invoice Number'].notna()]
+        codes, numbers = pd.factorize(invoices_df['Invoice Number'])
+        order = np.argsort(codes, kind='stable')
+
+        self.numbers = pd.Index(numbers)
+        self.lines = invoices_df.iloc[order].reset_index(drop=True)
+        self.invoice_of_line = codes[order]
+
+        counts = np.bincount(codes, minlength=len(numbers))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        # Per-line values used by every summary
+        self.item_totals = self.lines['Item Total'].to_numpy(dtype=np.float64)
+        self.fee_types = categorize_fee_items(self.lines['Item Name']).to_numpy()
+        self.fee_codes = np.select([self.fee_types == fee for fee in FEE_MEASURES],
+                                   np.arange(len(FEE_MEASURES)), default=-1)
+
+        # Per-invoice values: the first line identifies the customer
+        self.totals = np.bincount(self.invoice_of_line,
+                                  weights=np.nan_to_num(self.item_totals),
+                                  minlength=len(numbers))
+        self.fee_totals = np.bincount(self.invoice_of_line,
+                                      weights=np.nan_to_num(self.item_totals) * (self.fee_codes >= 0),
+                                      minlength=len(numbers))
+        self.customers = self.lines['Customer ID'].to_numpy()[self.offsets[:-1]]
+        self.dates = (self.lines['Invoice Date'].to_numpy()[self.offsets[:-1]]
+                      if 'Invoice Date' in self.lines.columns
+                      else np.full(len(numbers), np.datetime64('NaT')))
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def lookup(self, invoice_numbers: pd.Series) -> np.ndarray:
+        """Invoice position for each number (-1 when unknown)"""
+        return self.numbers.get_indexer(invoice_numbers)
+
+    def expand(self, invoice_positions: np.ndarray):
+        """
+        Pair every entry with each line of its invoice
+
+        Returns:
+            (entry position, line position) arrays
+        """
+        return expand_offsets(self.offsets, invoice_positions)
+
+
+class ContactIndex:
+    """Hash index from Contact ID to the first matching contact row"""
+
+    def __init__(self, contacts_df: pd.DataFrame):
+        ids = contacts_df['Contact ID']
+        first = ids.notna() & ~ids.duplicated(keep='first')
+        self.rows = np.flatnonzero(first.to_numpy())
+        self.ids = pd.Index(ids[first].to_numpy())
+
+    def lookup(self, contact_ids: pd.Series) -> np.ndarray:
+        """Contact row for each ID (-1 when unknown)"""
+        positions = self.ids.get_indexer(contact_ids)
+        return np.where(positions >= 0, self.rows[positions], -1)
+
+
+class PaymentPeriodIndex:
+    """
+    Payment rows grouped by Period in a CSR layout
+
+    Rows of periods[i] are order[offsets[i]:offsets[i + 1]], so a selective
+    period filter reads only its rows instead of scanning every payment.
+    """
+
+    def __init__(self, periods: np.ndarray):
+        periods = np.asarray(periods)
+        self.order = np.argsort(periods, kind='stable')
+        self.periods, counts = np.unique(periods, return_counts=True)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def count(self, periods: np.ndarray) -> int:
+        """Number of rows in the given periods"""
+        positions = np.flatnonzero(np.isin(self.periods, periods))
+        return int((self.offsets[positions + 1] - self.offsets[positions]).sum())
+
+    def rows(self, periods: np.ndarray) -> np.ndarray:
+        """Row positions in the given periods, in row order"""
+        positions = np.flatnonzero(np.isin(self.periods, periods))
+        if len(positions) == 0:
+            return np.zeros(0, dtype=np.int64)
+        starts, ends = self.offsets[positions], self.offsets[positions + 1]
+        return np.sort(np.concatenate([self.order[a:b] for a, b in zip(starts, ends)]))
+
+
+class PaymentCreatedIndex:
+    """
+    Payment rows sorted by Created Time
+
+    Rows created by a cutoff are order[:searchsorted(times, cutoff)], so an
+    as-of snapshot is a prefix of one sorted array instead of a comparison
+    against every payment. Rows without a Created Time sort last and are
+    never included.
+    """
+
+    def __init__(self, created: np.ndarray):
+        created = np.asarray(created, dtype='datetime64[ns]')
+        times = np.where(np.isnat(created), np.iinfo(np.int64).max, created.view(np.int64))
+        self.order = np.argsort(times, kind='stable')
+        self.times = times[self.order]
+        # Position of each row in the sorted order
+        self.ranks = np.empty(len(self.order), dtype=np.int64)
+        self.ranks[self.order] = np.arange(len(self.order))
+
+    def count(self, cutoff: pd.Timestamp) -> int:
+        """Number of rows created at or before the cutoff"""
+        return int(np.searchsorted(self.times, pd.Timestamp(cutoff).value, side='right'))
+
+    def rows(self, cutoff: pd.Timestamp) -> np.ndarray:
+        """Row positions created at or before the cutoff, in row order"""
+        return np.sort(self.order[:self.count(cutoff)])
+
+    def created_by(self, rows: np.ndarray, cutoff: pd.Timestamp) -> np.ndarray:
+        """The given row positions that were created at or before the cutoff"""
+        return rows[self.ranks[rows] < self.count(cutoff)]
+
+
+class IncomeSummaryEngine:
+    """Shared income summary pipeline with a pluggable allocation strategy"""
+
+    def __init__(self, base_path: Path = None, strategy: Union[str, AllocationStrategy] = 'proportional',
+                 fiscal_year_start: int = DEFAULT_FISCAL_YEAR_START, cache_dir: Optional[Path] = None,
+                 summary_cache_size: int = 32, backend: str = 'pandas'):
+        """
+        Initialize the engine
+
+        Args:
+            base_path: Base directory path, defaults to current directory
+            strategy: Allocation strategy name ('full', 'proportional', 'exact') or instance
+            fiscal_year_start: First month of the academic/fiscal year
+            cache_dir: Optional directory for the memory-mapped input cache and
+                the on-disk tier of the summary cache
+            summary_cache_size: Number of generated summaries kept in memory
+            backend: 'pandas', or 'polars' for multi-threaded loading and
+                aggregation (needs polars; proportional allocation only)
+        """
+        self.base_path = base_path or Path.cwd()
+        self.data_path = self.base_path / 'data'
+        self.strategy = get_strategy(strategy)
+        self.fiscal_year_start = fiscal_year_start
+
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}. Choose from {', '.join(BACKENDS)}")
+        if backend == 'polars':
+            polars_backend.require_polars()
+            if self.strategy.name != 'proportional':
+                raise ValueError("The polars backend only supports proportional allocation")
+        self.backend = backend
+
+        # Optional memory-mapped cache of cleaned inputs shared across processes
+        self.cache = FrameCache(cache_dir, version=CLEANING_VERSION) if cache_dir else None
+        self.data_fingerprint = None
+
+        # Generated summaries and views derived from them, by fingerprint and filters
+        self.summary_cache = SummaryCache(summary_cache_size,
+                                          Path(cache_dir) / 'summaries' if cache_dir else None)
+
+        # Initialize dataframes
+        self.contacts_df = None
+        self.invoices_df = None
+        self.payments_df = None
+        self.fee_items_df = None
+        self.duplicate_report = {}
+        self.load_error = None
+
+        # Earlier contact exports, for attributing payments as of their date
+        self.contact_exports = []
+        self.history_fingerprint = None
+
+        # Indexes built from the cleaned data on first use
+        self._invoice_index = None
+        self._contact_index = None
+        self._period_index = None
+        self._created_index = None
+        self._receipt_index = None
+        self._fee_master = None
+        self._payment_links = None
+        self._student_index = None
+        self._contact_history = None
+        self._polars_frames = None
+        self._dimension_cache = {}
+
+        # Create logs directory if it doesn't exist
+        (self.base_path / 'logs').mkdir(exist_ok=True)
+
+    def load_data(self, contacts=None, invoices=None, payments=None, fee_items=None) -> bool:
+        """
+        Load all required CSV files
+
+        Each input may be a path, a glob pattern (data/input/payments/*.csv),
+        a directory of CSVs, a file-like object or a list of these; it
+        defaults to the standard file under data/. The inputs are parsed
+        concurrently, and multiple exports of the same input are merged,
+        keeping records from the latest export when they overlap. With a
+        cache_dir, cleaned inputs are reused from the memory-mapped cache
+        while the sources are unchanged.
+        """
+        try:
+            logger.info("Loading data files...")
+            input_path = self.data_path / 'input'
+            sources = {
+                'contacts': contacts or input_path / 'student_contacts.csv',
+                'invoices': invoices or input_path / 'student_invoices.csv',
+                'payments': payments or input_path / 'student_payment.csv',
+            }
+
+            # Fee items reference is optional unless given explicitly
+            fee_items_path = self.data_path / 'reference' / 'fee_items.csv'
+            if not fee_items and fee_items_path.exists():
+                fee_items = fee_items_path
+            if fee_items:
+                sources['fee_items'] = fee_items
+
+            fingerprint = fingerprint_inputs(*sources.values())
+            if fingerprint == self.data_fingerprint and self.payments_df is not None:
+                logger.info("Input files unchanged; keeping the loaded data")
+                return True
+            if self.load_cached(fingerprint):
+                return True
+            if self.backend == 'polars':
+                self._load_polars(sources, fingerprint)
+                return True
+
+            # The C parser releases the GIL, so the inputs are parsed side by side
+            with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+                futures = {kind: pool.submit(read_input, kind, source)
+                           for kind, source in sources.items()}
+                frames = {f"{kind}_df": future.result() for kind, future in futures.items()}
+
+            self.load_frames(**frames, fingerprint=fingerprint)
+            return True
+
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error(f"Error loading data: {str(e)}")
+            return False
+
+    def load_frames(self, contacts_df: pd.DataFrame, invoices_df: pd.DataFrame,
+                    payments_df: pd.DataFrame, fee_items_df: Optional[pd.DataFrame] = None,
+                    fingerprint: Optional[str] = None):
+        """
+        Use inputs that were already parsed with read_input
+
+        Cleans the frames. With the fingerprint of their sources (see
+        fingerprint_inputs), they are also stored in the input cache and
+        their summaries can be reused from the disk tier of the summary cache.
+        """
+        self.data_fingerprint = fingerprint
+        self.contacts_df = contacts_df
+        self.invoices_df = invoices_df
+        self.payments_df = payments_df
+        self.fee_items_df = fee_items_df
+        logger.info(f"Loaded {len(contacts_df)} student contacts, {len(invoices_df)} invoice "
+                    f"records and {len(payments_df)} payment records")
+        if fee_items_df is not None:
+            logger.info(f"Loaded {len(fee_items_df)} fee items")
+
+        # Clean and prepare data
+        self._clean_data()
+
+        if self.cache is not None and self.data_fingerprint is not None:
+            self.cache.save(
+                self.data_fingerprint,
+                {name: getattr(self, name) for name in CACHED_FRAMES},
+                metadata={'duplicate_report': self.duplicate_report}
+            )
+
+    def load_cached(self, fingerprint: str) -> bool:
+        """Open cleaned inputs from the cache for a fingerprint of the sources"""
+        if self.cache is None:
+            return False
+
+        cached = self.cache.load(fingerprint)
+        if cached is None:
+            return False
+
+        self.data_fingerprint = fingerprint
+        for name in CACHED_FRAMES:
+            setattr(self, name, cached[name])
+        self.duplicate_report = cached['metadata'].get('duplicate_report', {})
+        self._reset_indexes()
+        logger.info(f"Loaded {len(self.contacts_df)} contacts, {len(self.invoices_df)} invoice "
+                    f"records and {len(self.payments_df)} payments from cache")
+        return True
+
+    def load_contact_history(self, exports) -> bool:
+        """
+        Attribute payments to the Grade, Section and School in force on their date
+
+        Earlier contact exports are combined with the loaded contacts into
+        versions valid from each contact's Last Modified Time (see
+        contact_versions). Summaries then place every payment, and billed
+        fees every invoice line, in the class the student was in on its date
+        instead of the one in the latest export. The history is kept across
+        reloads of the other inputs.
+
+        Args:
+            exports: Path, glob pattern, directory, file-like object or a
+                list of them, one contact export per file
+        """
+        try:
+            files = expand_sources(exports)
+            if not files:
+                raise FileNotFoundError("No contact exports given")
+
+            # Each export is read on its own, since read_input keeps only the latest version
+            with ThreadPoolExecutor(max_workers=len(files)) as pool:
+                frames = list(pool.map(lambda source: read_input('contacts', source), files))
+            self.load_history_frames(frames, fingerprint=fingerprint_inputs(files))
+            return True
+
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error(f"Error loading contact history: {str(e)}")
+            return False
+
+    def load_history_frames(self, frames: List[pd.DataFrame], fingerprint: Optional[str] = None):
+        """
+        Use contact exports that were already parsed with read_input as the history
+
+        With the fingerprint of their sources, summaries attributed with
+        the history can be reused from the disk tier of the summary cache.
+        """
+        if self.backend == 'polars':
+            raise ValueError("Contact history needs the pandas backend")
+        self.contact_exports = [
+            frame[[col for col in ['Contact ID', 'Last Modified Time', 'Location Name'] + HISTORY_COLUMNS
+                   if col in frame.columns]]
+            for frame in frames
+        ]
+        self.history_fingerprint = fingerprint
+        self._contact_history = None
+        self.summary_cache.clear_memory()
+        logger.info(f"Loaded {sum(len(frame) for frame in frames)} contact history records "
+                    f"from {len(frames)} exports")
+
+    def load_warehouse(self, warehouse_dir: Optional[Path] = None, school: Optional[str] = None,
+                       month: Optional[str] = None, year: Optional[int] = None,
+                       fiscal_year: Optional[int] = None) -> bool:
+        """
+        Load inputs from the partitioned Parquet warehouse (see ingest_warehouse)
+
+        Only the partitions for the school and period filters are read, so
+        summaries of the loaded data equal the full summaries with the same
+        filters; load without filters for reports that span them.
+
+        Args:
+            warehouse_dir: Warehouse directory, defaults to data/warehouse
+            school, month, year, fiscal_year: Filters used to prune partitions
+        """
+        try:
+            warehouse_dir = Path(warehouse_dir) if warehouse_dir else self.data_path / 'warehouse'
+            loaded = read_warehouse(warehouse_dir, school=school, month=month, year=year,
+                                    fiscal_year=fiscal_year,
+                                    fiscal_year_start=self.fiscal_year_start)
+            if loaded['fingerprint'] == self.data_fingerprint and self.payments_df is not None:
+                logger.info("Warehouse partitions unchanged; keeping the loaded data")
+                return True
+            if not self.load_cached(loaded['fingerprint']):
+                self.load_frames(**loaded['frames'], fingerprint=loaded['fingerprint'])
+            # Duplicates were dropped when the exports were ingested
+            self.duplicate_report = loaded['manifest']['metadata'].get('duplicate_report', {})
+            return True
+
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error(f"Error loading warehouse: {str(e)}")
+            return False
+
+    def ingest_warehouse(self, warehouse_dir: Optional[Path] = None) -> Path:
+        """
+        Write the loaded inputs to a Hive-partitioned Parquet warehouse
+
+        Contacts are partitioned by school, invoices and payments by school,
+        year and month. Invoices and payments go to the school of the student
+        they are attributed to in summaries (payers for opening balances and
+        payments against unknown invoices), so a school's partitions hold
+        everything its reports need.
+
+        Args:
+            warehouse_dir: Warehouse directory, defaults to data/warehouse
+
+        Returns:
+            Path of the warehouse manifest
+        """
+        warehouse_dir = Path(warehouse_dir) if warehouse_dir else self.data_path / 'warehouse'
+        invoices, links = self.invoice_index, self.payment_links
+        schools = self.contacts_df['School']
+
+        def school_of(contact_rows):
+            return pd.Series(take_categorical(schools, contact_rows)).astype(object).fillna('Unknown').to_numpy()
+
+        # Invoice lines: the customer of the invoice's first line
+        line_invoices = invoices.lookup(self.invoices_df['Invoice Number'])
+        line_contacts = np.full(len(line_invoices), -1)
+        known = line_invoices >= 0
+        line_contacts[known] = links['invoice_contacts'][line_invoices[known]]
+
+        # Payments: the invoice's customer, else the payer
+        has_invoice = links['invoice_pos'] >= 0
+        payment_contacts = np.where(has_invoice, links['contact_rows'], links['payer_rows'])
+
+        frames = {'contacts': self.contacts_df, 'invoices': self.invoices_df,
+                  'payments': self.payments_df, 'fee_items': self.fee_items_df}
+        partition_schools = {
+            'contacts': schools.astype(object).fillna('Unknown').to_numpy(),
+            'invoices': school_of(line_contacts),
+            'payments': school_of(payment_contacts),
+        }
+        metadata = {'source_fingerprint': self.data_fingerprint,
+                    'duplicate_report': self.duplicate_report}
+        return write_warehouse(warehouse_dir, frames, partition_schools, metadata)
+
+    def _load_polars(self, sources: dict, fingerprint: Optional[str] = None):
+        """Read and clean the inputs with Polars, keeping pandas copies for reports"""
+        frames = {kind: polars_backend.read_input(kind, source) for kind, source in sources.items()}
+        cleaned = polars_backend.clean_frames(frames)
+
+        self.data_fingerprint = fingerprint
+        for name, frame in polars_backend.to_pandas_frames(cleaned['frames']).items():
+            setattr(self, name, frame)
+        self.duplicate_report = cleaned['duplicate_report']
+        logger.info(f"Loaded {len(self.contacts_df)} student contacts, {len(self.invoices_df)} invoice "
+                    f"records and {len(self.payments_df)} payment records with polars")
+
+        self._optimize_dtypes()
+        self._reset_indexes()
+        self._polars_frames = cleaned['frames']
+
+        if self.cache is not None and self.data_fingerprint is not None:
+            self.cache.save(
+                self.data_fingerprint,
+                {name: getattr(self, name) for name in CACHED_FRAMES},
+                metadata={'duplicate_report': self.duplicate_report}
+            )
+
+    def _clean_data(self):
+        """Clean and prepare data for processing"""
+        # Ensure numeric columns are properly typed
+        for column in ['Amount', 'Amount Applied to Invoice']:
+            if column in self.payments_df.columns:
+                self.payments_df[column] = pd.to_numeric(self.payments_df[column], errors='coerce')
+        if 'Item Total' in self.invoices_df.columns:
+            self.invoices_df['Item Total'] = pd.to_numeric(self.invoices_df['Item Total'], errors='coerce')
+
+        # Integer year-month used for filtering, grouping and sorting
+        self.payments_df['Period'] = period_codes(self.payments_df['Date'])
+
+        # Remove any duplicate entries
+        self._drop_duplicate_payments()
+        self.payments_df = self.payments_df.reset_index(drop=True)
+
+        # Ensure consistent naming for school field
+        if 'Location Name' in self.contacts_df.columns and 'School' not in self.contacts_df.columns:
+            self.contacts_df['School'] = self.contacts_df['Location Name']
+        if 'School' in self.contacts_df.columns:
+            self.contacts_df['School'] = self.contacts_df['School'].astype(object).fillna('Unknown')
+
+        self._optimize_dtypes()
+        self._reset_indexes()
+
+    def _optimize_dtypes(self):
+        """Store low-cardinality contact columns as categoricals"""
+        for column in CATEGORICAL_CONTACT_COLUMNS:
+            if column in self.contacts_df.columns:
+                self.contacts_df[column] = self.contacts_df[column].astype('category')
+
+    def _drop_duplicate_payments(self):
+        """Drop repeated payments keyed on their ZOHO payment IDs"""
+        payments = self.payments_df
+        id_columns = [col for col in PAYMENT_ID_COLUMNS if col in payments.columns]
+        self.duplicate_report = {}
+
+        if id_columns:
+            # One precomputed 64-bit hash per row instead of comparing every column
+            has_ids = payments[id_columns].notna().all(axis=1).to_numpy()
+            id_hashes = pd.util.hash_pandas_object(payments[id_columns], index=False).to_numpy()
+            # Keep the last occurrence, i.e. the row from the most recent export
+            duplicate_ids = has_ids & pd.Series(id_hashes).duplicated(keep='last').to_numpy()
+            self.duplicate_report['same payment IDs'] = int(duplicate_ids.sum())
+        else:
+            has_ids = np.zeros(len(payments), dtype=bool)
+            duplicate_ids = has_ids
+
+        # Rows without payment IDs fall back to whole-row comparison
+        without_ids = payments[~has_ids]
+        duplicate_rows = np.zeros(len(payments), dtype=bool)
+        if not without_ids.empty:
+            duplicate_rows[~has_ids] = without_ids.duplicated().to_numpy()
+            self.duplicate_report['identical rows'] = int(duplicate_rows.sum())
+
+        dropped = duplicate_ids | duplicate_rows
+        if dropped.any():
+            reasons = ', '.join(f"{count} with {reason}"
+                                for reason, count in self.duplicate_report.items() if count)
+            logger.info(f"Dropped {int(dropped.sum())} duplicate payment rows ({reasons})")
+            self.payments_df = payments[~dropped]
+
+    def _reset_indexes(self):
+        """Drop indexes and summaries built from previously loaded data"""
+        self._invoice_index = None
+        self._contact_index = None
+        self._period_index = None
+        self._created_index = None
+        self._receipt_index = None
+        self._fee_master = None
+        self._payment_links = None
+        self._student_index = None
+        self._contact_history = None
+        self._polars_frames = None
+        self._dimension_cache = {}
+        self.summary_cache.clear_memory()
+
+    @property
+    def invoice_index(self) -> InvoiceIndex:
+        """Invoice lines indexed by invoice number"""
+        if self._invoice_index is None:
+            self._invoice_index = InvoiceIndex(self.invoices_df)
+        return self._invoice_index
+
+    @property
+    def contact_index(self) -> ContactIndex:
+        """Contacts indexed by Contact ID"""
+        if self._contact_index is None:
+            self._contact_index = ContactIndex(self.contacts_df)
+        return self._contact_index
+
+    @property
+    def period_index(self) -> PaymentPeriodIndex:
+        """Payments indexed by Period"""
+        if self._period_index is None:
+            self._period_index = PaymentPeriodIndex(self.payments_df['Period'].to_numpy())
+        return self._period_index
+
+    @property
+    def created_index(self) -> PaymentCreatedIndex:
+        """Payments indexed by Created Time"""
+        if self._created_index is None:
+            if 'Created Time' not in self.payments_df.columns:
+                raise ValueError("Payments have no Created Time column for as-of summaries")
+            created = pd.to_datetime(self.payments_df['Created Time'], errors='coerce')
+            self._created_index = PaymentCreatedIndex(created.to_numpy())
+        return self._created_index
+
+    @property
+    def receipt_index(self) -> ReceiptDateIndex:
+        """Receipts (customer payments) indexed by Date"""
+        if self._receipt_index is None:
+            self._receipt_index = ReceiptDateIndex(self.payments_df)
+        return self._receipt_index
+
+    @property
+    def fee_master(self) -> FeeMaster:
+        """Fee items indexed by SKU and Item Name, with their parsed Rate"""
+        if self._fee_master is None:
+            if self.fee_items_df is None or self.fee_items_df.empty:
+                raise ValueError("No fee items loaded; the billing audit needs fee_items.csv")
+            self._fee_master = FeeMaster(self.fee_items_df)
+        return self._fee_master
+
+    @property
+    def payment_links(self) -> Dict[str, np.ndarray]:
+        """
+        Index lookups of every payment row, shared by all reports
+
+        Dict with the 'invoice_pos' of each payment, the contact row of its
+        invoice's customer ('contact_rows') and of its payer ('payer_rows'),
+        -1 when unknown, and the contact row of every invoice ('invoice_contacts').
+        """
+        if self._payment_links is None:
+            payments, invoices = self.payments_df, self.invoice_index
+            invoice_contacts = self.contact_index.lookup(pd.Series(invoices.customers))
+            invoice_pos = invoices.lookup(payments['Invoice Number'])
+            invoice_pos[(payments['Invoice Number'] == OPENING_BALANCE).to_numpy()] = -1
+            contact_rows = np.full(len(invoice_pos), -1)
+            contact_rows[invoice_pos >= 0] = invoice_contacts[invoice_pos[invoice_pos >= 0]]
+            self._payment_links = {
+                'invoice_pos': invoice_pos,
+                'contact_rows': contact_rows,
+                'payer_rows': self.contact_index.lookup(payments['CustomerID']),
+                'invoice_contacts': invoice_contacts,
+            }
+        return self._payment_links
+
+    @property
+    def student_index(self) -> StudentSearchIndex:
+        """Trigram index over contact names, admission numbers and phone numbers"""
+        if self._student_index is None:
+            self._student_index = StudentSearchIndex(self.contacts_df, self.contact_index.rows)
+        return self._student_index
+
+    @property
+    def contact_history(self) -> Optional[ContactHistory]:
+        """Versions of every contact from the earlier exports and the loaded contacts, if any"""
+        if self._contact_history is None and self.contact_exports:
+            versions = contact_versions(self.contact_exports + [self.contacts_df])
+            self._contact_history = ContactHistory(
+                versions, self.contact_index.lookup(versions['Contact ID']), len(self.contacts_df))
+            logger.info(f"Indexed {len(self._contact_history)} versions of "
+                        f"{len(self.contact_index.rows)} contacts")
+        return self._contact_history
+
+    def _contact_attributes(self, contact_rows: np.ndarray, dates: np.ndarray,
+                            columns: List[str] = HISTORY_COLUMNS) -> Dict[str, pd.Categorical]:
+        """
+        Grade, Section and School (or some of them) of each contact row (NaN for -1)
+
+        Taken as of each date from the contact history when one is loaded,
+        otherwise from the loaded contacts.
+        """
+        history = self.contact_history
+        if history is None:
+            return {column: take_categorical(self.contacts_df[column], contact_rows)
+                    for column in columns}
+        return history.attributes(contact_rows, dates, columns)
+
+    def _dimension_columns(self, rows: pd.DataFrame,
+                           dimensions: List[str]) -> Dict[str, Union[pd.Categorical, np.ndarray]]:
+        """
+        Values of each dimension for rows with Payment Row, Contact Row and Period
+
+        Period-derived dimensions are labelled once per distinct period,
+        contact and payment columns are gathered as categorical codes by
+        row position, and Grade, Section and School follow the contact
+        history when one is loaded (see dimension_source).
+        """
+        columns, contact_columns = {}, []
+        for dim in dimensions:
+            source = dimension_source(dim, self.contacts_df.columns, self.payments_df.columns)
+            if source == 'period':
+                columns[dim] = period_dimension(rows['Period'].to_numpy(), dim, self.fiscal_year_start)
+            elif source == 'row':
+                columns[dim] = rows[dim].to_numpy()
+            elif source == 'contact':
+                contact_columns.append(dim)
+            else:
+                columns[dim] = take_categorical(self._categorical_column('payments_df', dim),
+                                                rows['Payment Row'].to_numpy())
+
+        contact_rows = rows['Contact Row'].to_numpy()
+        dated = [dim for dim in contact_columns if dim in HISTORY_COLUMNS]
+        if dated:
+            dates = self.payments_df['Date'].to_numpy()[rows['Payment Row'].to_numpy()]
+            columns.update(self._contact_attributes(contact_rows, dates, dated))
+        for dim in contact_columns:
+            if dim not in dated:
+                columns[dim] = take_categorical(self._categorical_column('contacts_df', dim),
+                                                contact_rows)
+        return {dim: columns[dim] for dim in dimensions}
+
+    def _categorical_column(self, frame: str, column: str) -> pd.Series:
+        """A contacts_df or payments_df column as a categorical, encoded once per load"""
+        key = (frame, column)
+        if key not in self._dimension_cache:
+            values = getattr(self, frame)[column]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+            self._dimension_cache[key] = values
+        return self._dimension_cache[key]
+
+    @property
+    def polars_frames(self) -> dict:
+        """Cleaned inputs as Polars frames, for the polars backend"""
+        if self._polars_frames is None:
+            self._polars_frames = polars_backend.from_pandas_frames(
+                self.contacts_df, self.invoices_df, self.payments_df)
+        return self._polars_frames
+
+    def _filter_period(self, payments: pd.DataFrame, month: Optional[str] = None,
+                       year: Optional[int] = None, fiscal_year: Optional[int] = None) -> pd.DataFrame:
+        """Apply the month/year/fiscal year filters as an integer range scan"""
+        if 'Period' not in payments.columns:
+            payments = payments.assign(Period=period_codes(payments['Date']))
+        return payments[period_mask(payments['Period'], month, year, fiscal_year,
+                                    self.fiscal_year_start)]
+
+    def _select_payments(self, month: Optional[str] = None, year: Optional[int] = None,
+                         fiscal_year: Optional[int] = None,
+                         as_of: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Payment rows for the period filters and as-of cutoff
+
+        With a cutoff, the smaller of the Created Time prefix and the rows of
+        the selected periods is read and checked against the other index, so
+        neither side scans every payment.
+        """
+        if as_of is None:
+            return self._filter_period(self.payments_df, month, year, fiscal_year)
+
+        created, periods = self.created_index, self.period_index
+        selected = periods.periods[period_mask(periods.periods, month, year, fiscal_year,
+                                               self.fiscal_year_start)]
+        if periods.count(selected) <= created.count(as_of):
+            rows = created.created_by(periods.rows(selected), as_of)
+        else:
+            rows = created.rows(as_of)
+            rows = rows[np.isin(self.payments_df['Period'].to_numpy()[rows], selected)]
+        return self.payments_df.take(rows)
+
+    def _summary_rows(self, month: Optional[str] = None, year: Optional[int] = None,
+                      fiscal_year: Optional[int] = None,
+                      payments: Optional[pd.DataFrame] = None,
+                      match: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        One row per opening balance payment and per allocated invoice line
+
+        Args:
+            month, year, fiscal_year: Period filters
+            payments: Already selected payment rows (the filters are then ignored)
+            match: Result of _match_payments for the selected payments
+
+        Returns:
+            DataFrame with the payment row, contact row (-1 if unknown), Period,
+            Fee Type and the three summary measures
+        """
+        strategy = self.strategy
+        if match is None:
+            if payments is None:
+                payments = self._filter_period(self.payments_df, month, year, fiscal_year)
+            match = self._match_payments(payments)
+
+        # Opening balances: attributed to the paying contact
+        opening = match['opening']
+        opening_rows = pd.DataFrame({
+            'Payment Row': opening.index.to_numpy(),
+            'Contact Row': match['opening_contacts'],
+            'Period': opening['Period'].to_numpy(),
+            'Fee Type': 'Opening Balance',
+            'Opening Balance': opening['Amount'].to_numpy(dtype=np.float64),
+            'Initial Fee': 0.0,
+            'Term / Monthly Fee': 0.0
+        })
+
+        # Regular payments, with the invoice and customer found through the indexes
+        regular, invoice_pos, contact_rows = match['regular'], match['invoice_pos'], match['contact_rows']
+        has_invoice = invoice_pos >= 0
+        invoices = self.invoice_index
+        amounts = regular[strategy.amount_column].to_numpy(dtype=np.float64)
+
+        # Pair each payment with the lines of its invoice and allocate
+        entries, lines = invoices.expand(invoice_pos[has_invoice])
+        matched = np.flatnonzero(has_invoice)[entries]
+        allocated = strategy.allocate(amounts[matched], invoices.item_totals[lines],
+                                      invoices.totals[invoice_pos[matched]], matched)
+        fee_types = invoices.fee_types[lines]
+
+        # Payments without an invoice keep an empty row unless the strategy skips them
+        unmatched = np.flatnonzero(~has_invoice)
+        rows = np.concatenate([matched, unmatched])
+        fee_types = np.concatenate([fee_types, np.full(len(unmatched), None)])
+        allocated = np.concatenate([allocated, np.zeros(len(unmatched))])
+
+        fee_rows = pd.DataFrame({
+            'Payment Row': regular.index.to_numpy()[rows],
+            'Contact Row': contact_rows[rows],
+            'Period': regular['Period'].to_numpy()[rows],
+            'Fee Type': fee_types,
+            'Opening Balance': 0.0,
+            'Initial Fee': np.where(fee_types == 'Initial Fee', allocated, 0.0),
+            'Term / Monthly Fee': np.where(fee_types == 'Term / Monthly Fee', allocated, 0.0)
+        })
+        if strategy.skip_other_items:
+            fee_rows = fee_rows[fee_rows['Fee Type'].notna()]
+
+        return pd.concat([opening_rows, fee_rows], ignore_index=True)
+
+    def _match_payments(self, payments: pd.DataFrame) -> Dict:
+        """
+        Look up the invoice and contact of every selected payment
+
+        The lookups are anti-joins against the invoice and contact indexes,
+        taken from payment_links by row position: payments they cannot place
+        are classified as issues, and dropped when the strategy skips them.
+
+        Returns:
+            Dict with the 'opening' payments and their 'opening_contacts',
+            the kept 'regular' payments with 'invoice_pos' and 'contact_rows'
+            (-1 when unknown), the 'dropped' payments with their payers'
+            'dropped_contacts' and the 'issues' rows
+        """
+        strategy = self.strategy
+        invoices = self.invoice_index
+        links = self.payment_links
+        rows = payments.index.to_numpy()
+        is_opening = (payments['Invoice Number'] == OPENING_BALANCE).to_numpy()
+        opening, regular = payments[is_opening], payments[~is_opening]
+        opening_contacts = links['payer_rows'][rows[is_opening]]
+
+        invoice_pos = links['invoice_pos'][rows[~is_opening]]
+        has_invoice = invoice_pos >= 0
+        contact_rows = links['contact_rows'][rows[~is_opening]]
+
+        keep = np.ones(len(regular), dtype=bool)
+        if strategy.skip_unmatched:
+            keep &= has_invoice & (contact_rows >= 0)
+        if strategy.skip_zero_invoices:
+            keep &= ~has_invoice | (invoices.totals[np.maximum(invoice_pos, 0)] != 0)
+
+        # Opening balances of unknown customers are kept, but reported
+        opening_issues = np.where(opening_contacts < 0, OPENING_CUSTOMER_NOT_FOUND, None)
+        issues = pd.concat([
+            issue_rows(opening, opening_issues, np.zeros(len(opening), dtype=bool)),
+            issue_rows(regular, classify_payments(invoice_pos, contact_rows, invoices.totals), ~keep)
+        ]).sort_values('Payment Row', ignore_index=True)
+        if not issues.empty:
+            log_issues(issues)
+
+        return {
+            'opening': opening,
+            'opening_contacts': opening_contacts,
+            'regular': regular[keep],
+            'invoice_pos': invoice_pos[keep],
+            'contact_rows': contact_rows[keep],
+            'dropped': regular[~keep],
+            'dropped_contacts': links['payer_rows'][rows[~is_opening][~keep]],
+            'issues': issues,
+        }
+
+    def _summary_key(self, month: Optional[str], year: Optional[int],
+                     fiscal_year: Optional[int], as_of: Optional[pd.Timestamp] = None) -> tuple:
+        """Summary cache key: data fingerprint, allocation strategy and filters"""
+        strategy = self.strategy.name or repr(self.strategy)
+        key = (self._attribution_fingerprint(), strategy, self.fiscal_year_start, month, year,
+               fiscal_year)
+        return key if as_of is None else key + (f"as of {as_of.isoformat()}",)
+
+    @staticmethod
+    def _created_cutoff(as_of: Optional[Union[str, datetime]]) -> Optional[pd.Timestamp]:
+        """Created Time cutoff for as_of; a date (midnight) includes that whole day"""
+        if as_of is None:
+            return None
+        cutoff = pd.Timestamp(as_of)
+        if cutoff == cutoff.normalize():
+            cutoff += pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
+        return cutoff
+
+    def _attribution_fingerprint(self) -> Optional[str]:
+        """Data fingerprint, combined with the contact history's when one is loaded"""
+        if not self.contact_exports:
+            return self.data_fingerprint
+        if self.data_fingerprint is None or self.history_fingerprint is None:
+            return None
+        return f"{self.data_fingerprint}+{self.history_fingerprint}"
+
+    def generate_summary(self, month: Optional[str] = None, year: Optional[int] = None,
+                         fiscal_year: Optional[int] = None, school: Optional[str] = None,
+                         as_of: Optional[Union[str, datetime]] = None) -> pd.DataFrame:
+        """
+        Generate the income summary report
+
+        Summaries are memoized per data fingerprint, strategy, period
+        filters and as-of time; the school filter is applied to the cached
+        summary.
+
+        Args:
+            month: Optional month filter
+            year: Optional year filter
+            fiscal_year: Optional fiscal year filter
+            school: Optional school filter
+            as_of: Optional cutoff on the payments' Created Time, e.g. the day
+                the books were closed; payments entered later (including
+                backdated ones) are left out. A date includes that whole day.
+
+        Returns:
+            DataFrame matching the template structure
+        """
+        as_of = self._created_cutoff(as_of)
+        key = self._summary_key(month, year, fiscal_year, as_of)
+        summary_df = self.summary_cache.get(key)
+        if summary_df is None:
+            summary_df = self._build_summary(month, year, fiscal_year, as_of)
+            self.summary_cache.put(key, summary_df)
+        else:
+            logger.info(f"Using cached summary for {month or 'all months'} {year or ''}")
+
+        if school:
+            return summary_df[summary_df['School'] == school].reset_index(drop=True)
+        return summary_df.copy()
+
+    def summary_cube(self, month: Optional[str] = None, year: Optional[int] = None,
+                     fiscal_year: Optional[int] = None, school: Optional[str] = None,
+                     as_of: Optional[Union[str, datetime]] = None) -> pd.DataFrame:
+        """
+        Rollup cube of the summary: totals for every combination of School,
+        Grade, Section and Month, including subtotals and the grand total
+
+        Built in one pass from the cached summary for the same filters, and
+        cached too. The 'Grouping' column is the SQL GROUPING_ID of each row
+        (see slice_grouping_set to pick one grouping).
+
+        Args:
+            month, year, fiscal_year, school, as_of: Filters as for generate_summary
+
+        Returns:
+            DataFrame with the cube dimensions (NaN where rolled up), the
+            summary measures and Grouping
+        """
+        as_of = self._created_cutoff(as_of)
+        key = self._summary_key(month, year, fiscal_year, as_of) + (school, 'cube')
+        cube = self.summary_cache.get(key)
+        if cube is None:
+            summary_df = self.generate_summary(month, year, fiscal_year, school, as_of)
+            cube = aggregate_grouping_sets(summary_df, CUBE_DIMENSIONS, SUMMARY_MEASURES)
+            self.summary_cache.put(key, cube)
+        return cube
+
+    def summary_rollup(self, by: Union[str, list], month: Optional[str] = None,
+                       year: Optional[int] = None, fiscal_year: Optional[int] = None,
+                       school: Optional[str] = None,
+                       as_of: Optional[Union[str, datetime]] = None) -> pd.DataFrame:
+        """
+        Summary measures totalled by one or more summary columns
+
+        Sliced from the rollup cube for the same filters.
+
+        Args:
+            by: Column or columns to group by, e.g. 'School' or ['School', 'Grade']
+            month, year, fiscal_year, school, as_of: Filters as for generate_summary
+
+        Returns:
+            DataFrame indexed by the group columns
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        if not set(by) <= set(CUBE_DIMENSIONS):
+            raise ValueError(f"Can only roll up by {', '.join(CUBE_DIMENSIONS)}")
+        cube = self.summary_cube(month, year, fiscal_year, school, as_of)
+        return slice_grouping_set(cube, CUBE_DIMENSIONS, by, SUMMARY_MEASURES)
+
+    def summary_by(self, dimensions: Union[str, List[str]], measures: Optional[List[str]] = None,
+                   month: Optional[str] = None, year: Optional[int] = None,
+                   fiscal_year: Optional[int] = None, school: Optional[str] = None,
+                   as_of: Optional[Union[str, datetime]] = None) -> pd.DataFrame:
+        """
+        Summary measures grouped by any dimensions
+
+        A dimension can be any contact column (e.g. 'CF.Gender', 'Location
+        Name'), any payment column (e.g. 'Mode', 'Deposit To'), 'Month',
+        'Year' or 'Fiscal Year' of the payment, or the 'Fee Type' of the
+        invoice line. Each is encoded as categorical codes and all are
+        aggregated in one pass; without Fee Type the strategy's fused kernel
+        is used as for the default summary. Results are cached like it, and
+        computed with pandas on either backend.
+
+        Args:
+            dimensions: Column or columns to group by, in output order
+            measures: Any of the summary measures, 'Total' (their sum) and
+                'Payments' (number of payments); defaults to the summary measures
+            month, year, fiscal_year, school, as_of: Filters as for generate_summary
+
+        Returns:
+            DataFrame with the dimensions (as categoricals, sorted) and the measures
+
+        Raises:
+            ValueError: For an unknown dimension or measure
+        """
+        dimensions = list(dict.fromkeys([dimensions] if isinstance(dimensions, str) else dimensions))
+        measures = validate_measures(measures or SUMMARY_MEASURES, SUMMARY_MEASURES)
+        for dim in dimensions:
+            dimension_source(dim, self.contacts_df.columns, self.payments_df.columns)
+
+        as_of = self._created_cutoff(as_of)
+        key = self._summary_key(month, year, fiscal_year, as_of) + (
+            school, 'by', tuple(dimensions), tuple(measures))
+        result = self.summary_cache.get(key)
+        if result is None:
+            result = self._build_grouped(dimensions, measures, month, year, fiscal_year, school, as_of)
+            self.summary_cache.put(key, result)
+        return result.copy()
+
+    def _build_grouped(self, dimensions: List[str], measures: List[str], month: Optional[str],
+                       year: Optional[int], fiscal_year: Optional[int], school: Optional[str],
+                       as_of: Optional[pd.Timestamp]) -> pd.DataFrame:
+        """Aggregate the summary measures by dimensions for summary_by"""
+        logger.info(f"Summarizing by {', '.join(dimensions) or '(total)'}")
+        payments = self._select_payments(month, year, fiscal_year, as_of)
+        match = self._match_payments(payments)
+
+        # The school filter is one more (leading) dimension, dropped afterwards
+        # Without dimensions, the total of the per-period groups
+        group_by = ((['School'] if school and 'School' not in dimensions else []) +
+                    (dimensions or ['Period']))
+        count_payments = PAYMENTS_MEASURE in measures
+        if self._uses_fused_kernel() and 'Fee Type' not in group_by:
+            grouped = self._aggregate_fused(match, group_by, count_payments)
+        else:
+            rows = self._summary_rows(match=match)
+            for column, values in self._dimension_columns(rows, group_by).items():
+                rows[column] = values
+            grouped = aggregate_by_codes(
+                rows, dimensions=group_by, measures=SUMMARY_MEASURES,
+                distinct={PAYMENTS_MEASURE: 'Payment Row'} if count_payments else None)
+
+        if school:
+            grouped = grouped[(grouped['School'] == school).to_numpy()]
+            if 'School' not in dimensions:
+                grouped = grouped.drop(columns='School')
+        grouped[TOTAL_MEASURE] = grouped[SUMMARY_MEASURES].sum(axis=1)
+        decimals = self.strategy.decimals
+        if decimals is not None:
+            amounts = [measure for measure in SUMMARY_MEASURES + [TOTAL_MEASURE] if measure in measures]
+            grouped[amounts] = grouped[amounts].round(decimals)
+        if not dimensions:
+            return pd.DataFrame({measure: [grouped[measure].sum()] for measure in measures})
+        # Category order (chronological for periods), unknown values last
+        return grouped.sort_values(dimensions, kind='stable', ignore_index=True)[dimensions + measures]
+
+    def _build_summary(self, month: Optional[str] = None, year: Optional[int] = None,
+                       fiscal_year: Optional[int] = None,
+                       as_of: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Aggregate the summary rows for the period filters and as-of cutoff
+
+        The payment lookups are shared with validation: the issues and the
+        reconciliation for the same filters are cached alongside (see validate).
+        The polars backend matches payments on its own, so its issues and
+        reconciliation, like the comparison with the fees billed and the
+        payments behind every row on either backend (see
+        generate_collection_rates and summary_lineage), are only built when
+        first asked for. As-of summaries are aggregated with pandas on either
+        backend.
+        """
+        logger.info(f"Generating summary for {month or 'all months'} {year or ''}"
+                    f"{f' (FY {fiscal_year})' if fiscal_year else ''}"
+                    f"{f' as of {as_of}' if as_of is not None else ''}")
+
+        match = None
+        if self.backend == 'polars' and as_of is None:
+            # Already rounded and sorted
+            summary_df = polars_backend.proportional_summary(
+                self.polars_frames, month, year, fiscal_year, self.fiscal_year_start,
+                self.strategy.decimals)
+        else:
+            match = self._match_payments(self._select_payments(month, year, fiscal_year, as_of))
+            if self._uses_fused_kernel():
+                summary_df = self._aggregate_fused(match)
+            else:
+                rows = self._summary_rows(match=match)
+
+                # Attach student info from the contact rows
+                for column, values in self._dimension_columns(rows, SUMMARY_DIMENSIONS).items():
+                    rows[column] = values
+
+                # Aggregate on integer-coded keys
+                summary_df = aggregate_by_codes(rows, dimensions=SUMMARY_DIMENSIONS,
+                                                measures=SUMMARY_MEASURES)
+
+            if self.strategy.decimals is not None:
+                for measure in SUMMARY_MEASURES:
+                    summary_df[measure] = summary_df[measure].round(self.strategy.decimals)
+
+        # Sort by School, Grade, Section and then chronologically
+        summary_df['Period'] = summary_df['Period'].astype(np.int32)
+        summary_df = summary_df.sort_values(['School', 'Grade', 'Section', 'Period'],
+                                            ignore_index=True)
+
+        key = self._summary_key(month, year, fiscal_year, as_of)
+        self.summary_cache.put(key + ('periods',), summary_df[['Period']])
+        if match is not None:
+            self.summary_cache.put(key + ('issues',), match['issues'])
+            self.summary_cache.put(key + ('reconciliation',), self._reconcile(match, summary_df))
+
+        summary_df['Month'] = period_labels(summary_df['Period'])
+        summary_df = summary_df[SUMMARY_COLUMNS]
+
+        logger.info(f"Generated summary with {len(summary_df)} rows")
+
+        return summary_df
+
+    def _uses_fused_kernel(self) -> bool:
+        """Whether the strategy can allocate and aggregate in one kernel pass"""
+        strategy = self.strategy
+        return (strategy.fused_kernel is not None and strategy.skip_unmatched and
+                strategy.skip_other_items)
+
+    def _aggregate_fused(self, match: Dict, dimensions: List[str] = SUMMARY_DIMENSIONS,
+                         count_payments: bool = False) -> pd.DataFrame:
+        """
+        Summary measures per group without expanding payments into invoice lines
+
+        Payments are assigned their group first; the strategy's kernel then
+        allocates each payment over its invoice lines and adds the shares
+        straight into the group totals. Any dimension that is fixed per
+        payment can be grouped on (not Fee Type).
+
+        Args:
+            match: Result of _match_payments
+            dimensions: Group key (see _dimension_columns)
+            count_payments: Add the number of payments per group as PAYMENTS_MEASURE
+        """
+        opening, regular = match['opening'], match['regular']
+        distinct = {PAYMENTS_MEASURE: 'Payment Row'} if count_payments else None
+
+        # One row per payment: opening balances first, then regular payments
+        rows = pd.DataFrame({
+            'Payment Row': np.concatenate([opening.index.to_numpy(), regular.index.to_numpy()]),
+            'Contact Row': np.concatenate([match['opening_contacts'], match['contact_rows']]),
+            'Period': np.concatenate([opening['Period'].to_numpy(), regular['Period'].to_numpy()])
+        })
+        for column, values in self._dimension_columns(rows, dimensions).items():
+            rows[column] = values
+        if rows.empty:
+            return aggregate_by_codes(rows, dimensions=dimensions, measures=SUMMARY_MEASURES,
+                                      distinct=distinct)
+
+        groups, summary_df = group_codes(rows, dimensions)
+        n_groups, n_opening = len(summary_df), len(opening)
+        opening_groups = groups[:n_opening]
+        # Cast since bincount of no weights returns integers
+        summary_df['Opening Balance'] = np.bincount(
+            opening_groups, weights=opening['Amount'].to_numpy(dtype=np.float64),
+            minlength=n_groups).astype(np.float64)
+
+        invoices = self.invoice_index
+        totals, lines = self.strategy.fused_kernel(
+            invoices.offsets, invoices.item_totals, invoices.fee_codes, invoices.totals,
+            regular[self.strategy.amount_column].to_numpy(dtype=np.float64), match['invoice_pos'],
+            groups[n_opening:], n_groups, len(FEE_MEASURES))
+        for code, measure in enumerate(FEE_MEASURES):
+            summary_df[measure] = totals[:, code]
+
+        if count_payments:
+            # Payments with at least one fee line, each counted once in its group
+            fee_lines = np.concatenate([[0], np.cumsum(invoices.fee_codes >= 0)])
+            fee_lines = fee_lines[invoices.offsets[1:]] - fee_lines[invoices.offsets[:-1]]
+            paying = fee_lines[np.maximum(match['invoice_pos'], 0)] > 0
+            summary_df[PAYMENTS_MEASURE] = (
+                np.bincount(opening_groups, minlength=n_groups) +
+                np.bincount(groups[n_opening:][paying], minlength=n_groups))
+
+        # Groups whose payments only paid for other items do not appear
+        observed = (np.bincount(opening_groups, minlength=n_groups) > 0) | (lines > 0)
+        summary_df = summary_df[observed].reset_index(drop=True)
+        for column in dimensions:
+            if isinstance(summary_df[column].dtype, pd.CategoricalDtype):
+                summary_df[column] = summary_df[column].cat.remove_unused_categories()
+        return summary_df[dimensions + SUMMARY_MEASURES + list(distinct or [])]
+
+    def _lineage(self, match: Dict, summary_df: pd.DataFrame,
+                 rows: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Amount each payment in match contributed to each row of summary_df (with Period)
+
+        With the fused kernel every regular payment is its own group, which
+        gives its allocation per fee without expanding invoice lines;
+        otherwise the allocated lines in rows (from _summary_rows) are
+        summed per payment and measure.
+        """
+        n_measures = len(SUMMARY_MEASURES)
+        if self._uses_fused_kernel():
+            opening, regular = match['opening'], match['regular']
+            n_fees, n_opening, n_regular = len(FEE_MEASURES), len(opening), len(regular)
+            invoices = self.invoice_index
+            by_payment, _ = self.strategy.fused_kernel(
+                invoices.offsets, invoices.item_totals, invoices.fee_codes, invoices.totals,
+                regular[self.strategy.amount_column].to_numpy(dtype=np.float64), match['invoice_pos'],
+                np.arange(n_regular), n_regular, n_fees)
+            payment_rows = np.concatenate([opening.index.to_numpy(), regular.index.to_numpy()])
+            contact_rows = np.concatenate([match['opening_contacts'], match['contact_rows']])
+            periods = np.concatenate([opening['Period'].to_numpy(), regular['Period'].to_numpy()])
+            # Opening balances have one entry, regular payments one per fee measure,
+            # which follow Opening Balance in SUMMARY_MEASURES
+            entry_payments = np.concatenate([np.arange(n_opening),
+                                             n_opening + np.repeat(np.arange(n_regular), n_fees)])
+            measure_codes = np.concatenate([np.zeros(n_opening, dtype=np.int64),
+                                            np.tile(np.arange(1, n_fees + 1), n_regular)])
+            allocated = np.concatenate([opening['Amount'].to_numpy(dtype=np.float64),
+                                        by_payment.ravel()])
+        else:
+            if rows is None:
+                rows = self._summary_rows(match=match)
+            # One entry per payment and measure, summed over the lines of each payment
+            payment_rows, first, line_payments = np.unique(
+                rows['Payment Row'].to_numpy(), return_index=True, return_inverse=True)
+            n_payments = len(payment_rows)
+            values = rows[SUMMARY_MEASURES].to_numpy(dtype=np.float64)
+            allocated = np.column_stack([
+                np.bincount(line_payments.ravel(), weights=values[:, code], minlength=n_payments)
+                for code in range(n_measures)
+            ]).ravel()
+            contact_rows = rows['Contact Row'].to_numpy()[first]
+            periods = rows['Period'].to_numpy()[first]
+            entry_payments = np.repeat(np.arange(n_payments), n_measures)
+            measure_codes = np.tile(np.arange(n_measures), n_payments)
+
+        # Every entry of a payment falls in the summary row of that payment
+        payments = pd.DataFrame({'Period': periods})
+        dates = self.payments_df['Date'].to_numpy()[payment_rows]
+        for column, values in self._contact_attributes(contact_rows, dates).items():
+            payments[column] = values
+        cells = cell_ids(summary_df, payments, SUMMARY_DIMENSIONS)
+        return lineage_frame(cells[entry_payments], payment_rows[entry_payments],
+                             contact_rows[entry_payments], measure_codes, allocated,
+                             SUMMARY_MEASURES)
+
+    def _reconcile(self, match: Dict, summary_df: pd.DataFrame) -> pd.DataFrame:
+        """Reconciliation of the raw payments in match against summary_df (with Period)"""
+        strategy = self.strategy
+        opening, regular, dropped = match['opening'], match['regular'], match['dropped']
+        invoices = self.invoice_index
+
+        # Share of each kept payment that went to items outside the summary
+        invoice_pos = match['invoice_pos']
+        amounts = regular[strategy.amount_column].to_numpy(dtype=np.float64)
+        credited = invoice_pos >= 0
+        positions = np.maximum(invoice_pos, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            other_share = np.where(credited & (invoices.totals[positions] != 0),
+                                   1 - invoices.fee_totals[positions] / invoices.totals[positions], 0.0)
+        other_items = amounts * other_share if strategy.skip_other_items else np.zeros(len(amounts))
+
+        dropped_amounts = dropped[strategy.amount_column].to_numpy(dtype=np.float64)
+        contact_rows = np.concatenate([
+            match['opening_contacts'], match['contact_rows'], match['dropped_contacts']
+        ])
+        n_opening, n_regular = len(opening), len(regular)
+        dates = np.concatenate([opening['Date'].to_numpy(), regular['Date'].to_numpy(),
+                                dropped['Date'].to_numpy()])
+        payments = pd.DataFrame({
+            'School': self._contact_attributes(contact_rows, dates, ['School'])['School'],
+            'Period': np.concatenate([opening['Period'].to_numpy(), regular['Period'].to_numpy(),
+                                      dropped['Period'].to_numpy()]),
+            'Payments': np.concatenate([opening['Amount'].to_numpy(dtype=np.float64), amounts,
+                                        dropped_amounts]),
+            # Kept payments without an invoice are not credited to any fee
+            'Dropped': np.concatenate([np.zeros(n_opening), np.where(credited, 0.0, amounts),
+                                       dropped_amounts]),
+            'Other Items': np.concatenate([np.zeros(n_opening), other_items,
+                                           np.zeros(len(dropped))]),
+        })
+        return reconcile(payments, summary_df, SUMMARY_MEASURES, decimals=strategy.decimals or 2)
+
+    def generate_receivables(self, as_of: Optional[Union[str, datetime]] = None,
+                             school: Optional[str] = None) -> pd.DataFrame:
+        """
+        Outstanding balance per student, aged by Invoice Date
+
+        Each invoice contributes its total less the amounts applied to it,
+        in the bucket of its age on the as-of date; the contact Opening
+        Balance less opening balance payments is added on top. Invoices and
+        payments dated after as_of are left out. Built from the invoice and
+        contact indexes with one bincount per measure, and cached.
+
+        Args:
+            as_of: Date the balances and ages are taken on, defaults to today
+            school: Optional school filter
+
+        Returns:
+            DataFrame with one row per student (see RECEIVABLES_COLUMNS)
+        """
+        as_of = pd.Timestamp(as_of or datetime.now()).normalize()
+        key = (self.data_fingerprint, 'receivables', as_of.date().isoformat())
+        report = self.summary_cache.get(key)
+        if report is None:
+            report = self._build_receivables(as_of)
+            self.summary_cache.put(key, report)
+
+        if school:
+            return report[report['School'] == school].reset_index(drop=True)
+        return report.copy()
+
+    def generate_cashbook(self, start: Optional[Union[str, datetime]] = None,
+                          end: Optional[Union[str, datetime]] = None,
+                          school: Optional[str] = None) -> pd.DataFrame:
+        """
+        Daily cashbook: receipts per day, school, payment Mode and Deposit To account
+
+        Each customer payment counts once, with its full Amount, in the
+        school of its Location Name. Running totals are per school, mode and
+        account from the start of the range. The date range is a binary
+        search on the receipt index, so any range costs only its own receipts.
+
+        Args:
+            start: First day, defaults to the earliest receipt
+            end: Last day (inclusive), defaults to the latest receipt
+            school: Optional school filter
+
+        Returns:
+            DataFrame with CASHBOOK_COLUMNS
+        """
+        start = pd.Timestamp(start).normalize() if start is not None else None
+        end = pd.Timestamp(end).normalize() if end is not None else None
+        receipts = self.receipt_index.slice(start, end)
+        if school:
+            receipts = receipts[(receipts['School'] == school).to_numpy()]
+        logger.info(f"Generating cashbook from {start.date() if start else 'the first receipt'} "
+                    f"to {end.date() if end else 'the last receipt'}: {len(receipts)} receipts")
+        return cashbook_frame(receipts, decimals=self.strategy.decimals or 2)
+
+    def generate_billing_audit(self, fiscal_year: Optional[int] = None, school: Optional[str] = None,
+                               tolerance: float = 0.01) -> pd.DataFrame:
+        """
+        Invoice lines that do not agree with the fee items
+
+        Every invoice line is joined to its fee item by SKU (where exported)
+        or Item Name, and reported when it bills more or less than Rate x
+        Quantity, when its item is not in the fee items, or when the item's
+        grade or school differs from the student's (as of the Invoice Date
+        when a contact history is loaded). Streams such as 'Grade 11
+        Commerce' count as their grade. Void invoices are left out. Cached.
+
+        Args:
+            fiscal_year: Optional fiscal year of the Invoice Date
+            school: Optional filter on the student's school
+            tolerance: Largest difference from the rate that is not reported
+
+        Returns:
+            DataFrame with one row per exception (see AUDIT_COLUMNS)
+
+        Raises:
+            ValueError: If no fee items are loaded
+        """
+        key = (self._attribution_fingerprint(), 'billing audit', self.fiscal_year_start, fiscal_year,
+               tolerance)
+        report = self.summary_cache.get(key)
+        if report is None:
+            report = self._build_billing_audit(fiscal_year, tolerance)
+            self.summary_cache.put(key, report)
+
+        if school:
+            return report[report['School'] == school].reset_index(drop=True)
+        return report.copy()
+
+    def _build_billing_audit(self, fiscal_year: Optional[int], tolerance: float) -> pd.DataFrame:
+        """Billing exceptions of the invoice lines in the fiscal year"""
+        master, invoices = self.fee_master, self.invoice_index
+        lines = invoices.lines
+        keep = np.ones(len(lines), dtype=bool)
+        if 'Invoice Status' in lines.columns:
+            keep &= ~lines['Invoice Status'].isin(IGNORED_STATUSES).to_numpy()
+        if fiscal_year:
+            periods = period_codes(pd.to_datetime(lines['Invoice Date'], errors='coerce'))
+            keep &= period_mask(periods, fiscal_year=fiscal_year, fiscal_year_start=self.fiscal_year_start)
+        selected = np.flatnonzero(keep)
+        lines = lines.iloc[selected].reset_index(drop=True)
+        logger.info(f"Auditing {len(lines)} invoice lines against {len(master)} fee items")
+
+        item_rows = master.lookup(lines['Item Name'], lines['SKU'] if 'SKU' in lines.columns else None)
+        contact_rows = self.payment_links['invoice_contacts'][invoices.invoice_of_line[selected]]
+        students = self._contact_attributes(contact_rows, invoices.dates[invoices.invoice_of_line[selected]],
+                                            ['School', 'Grade'])
+        report = audit_frame(lines, item_rows, master, students, tolerance,
+                             decimals=self.strategy.decimals or 2)
+        logger.info(f"Found {len(report)} billing exceptions")
+        return report
+
+    def _build_receivables(self, as_of: pd.Timestamp) -> pd.DataFrame:
+        """Receivables and ageing of every student on the as-of date"""
+        logger.info(f"Generating receivables as of {as_of.date()}")
+        invoices, contacts, links = self.invoice_index, self.contacts_df, self.payment_links
+        payments = self.payments_df
+        applied = np.nan_to_num(payments['Amount Applied to Invoice'].to_numpy(dtype=np.float64))
+        by_as_of = (payments['Date'] <= as_of).to_numpy()
+
+        # Amounts applied to each invoice, and to each contact's opening balance
+        invoice_pos = links['invoice_pos']
+        paid = by_as_of & (invoice_pos >= 0)
+        invoice_paid = np.bincount(invoice_pos[paid], weights=applied[paid],
+                                   minlength=len(invoices))
+        payer_rows = links['payer_rows']
+        opening = (by_as_of & (payments['Invoice Number'] == OPENING_BALANCE).to_numpy() &
+                   (payer_rows >= 0))
+        opening_paid = np.bincount(payer_rows[opening], weights=applied[opening],
+                                   minlength=len(contacts))
+
+        # Customer of each invoice raised by the as-of date
+        invoice_contacts = links['invoice_contacts'].copy()
+        invoice_contacts[~(invoices.dates <= as_of.to_datetime64())] = -1
+        if 'Opening Balance' in contacts.columns:
+            opening_balances = pd.to_numeric(contacts['Opening Balance'], errors='coerce')
+            opening_balances = opening_balances.fillna(0).to_numpy(dtype=np.float64)
+        else:
+            opening_balances = np.zeros(len(contacts))
+
+        measures = receivables_by_contact(
+            invoice_contacts, invoices.totals, invoice_paid, ageing_codes(invoices.dates, as_of),
+            opening_balances, opening_paid)
+        report = receivables_frame(contacts, self.contact_index.rows, measures,
+                                   decimals=self.strategy.decimals or 2)
+        logger.info(f"Generated receivables for {len(report)} students")
+        return report
+
+    def _billed_by_group(self) -> pd.DataFrame:
+        """
+        Fees invoiced per School, Grade, Section, invoice month and fee type
+
+        Aggregated once per data set from the invoice index; summaries for
+        any filter then select their months from it.
+        """
+        key = (self._attribution_fingerprint(), 'billed')
+        billed = self.summary_cache.get(key)
+        if billed is not None:
+            return billed
+
+        invoices = self.invoice_index
+        contact_rows = self.payment_links['invoice_contacts'][invoices.invoice_of_line]
+        lines = np.flatnonzero((invoices.fee_codes >= 0) & (contact_rows >= 0))
+        rows = pd.DataFrame({
+            'Period': period_codes(invoices.lines['Invoice Date']).to_numpy()[lines],
+            'Fee Type': pd.Categorical.from_codes(invoices.fee_codes[lines], categories=FEE_MEASURES),
+            'Billed': np.nan_to_num(invoices.item_totals[lines]),
+        })
+        dates = invoices.lines['Invoice Date'].to_numpy()[lines]
+        for column, values in self._contact_attributes(contact_rows[lines], dates).items():
+            rows[column] = values
+        billed = aggregate_by_codes(rows, dimensions=COLLECTION_DIMENSIONS, measures=['Billed'],
+                                    categories={'Fee Type': FEE_MEASURES})
+        self.summary_cache.put(key, billed)
+        return billed
+
+    def _summary_part(self, part: str, month: Optional[str], year: Optional[int],
+                      fiscal_year: Optional[int], as_of: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Frame cached next to the summary, rebuilding it if evicted
+
+        Parts that _build_summary did not produce (the collection rates, the
+        lineage, and the validation on the polars backend) are built here
+        on first use.
+        """
+        key = self._summary_key(month, year, fiscal_year, as_of)
+        frame = self.summary_cache.get(key + (part,))
+        if frame is not None:
+            return frame
+
+        summary_df = self._summary_with_periods(month, year, fiscal_year, as_of)
+        frame = self.summary_cache.get(key + (part,))
+        if frame is None:
+            if part == 'collection':
+                billed = self._billed_by_group()
+                billed = billed[period_mask(billed['Period'], month, year, fiscal_year,
+                                            self.fiscal_year_start)]
+                frame = collection_rates(billed, fee_collections(summary_df, FEE_MEASURES),
+                                         FEE_MEASURES, decimals=self.strategy.decimals or 2)
+                self.summary_cache.put(key + (part,), frame)
+                return frame
+
+            match = self._match_payments(self._select_payments(month, year, fiscal_year, as_of))
+            if part == 'lineage':
+                parts = {'lineage': self._lineage(match, summary_df)}
+            else:
+                parts = {'issues': match['issues'], 'reconciliation': self._reconcile(match, summary_df)}
+            for name, value in parts.items():
+                self.summary_cache.put(key + (name,), value)
+            frame = parts[part]
+        return frame
+
+    def _summary_with_periods(self, month: Optional[str], year: Optional[int],
+                              fiscal_year: Optional[int],
+                              as_of: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """Cached summary with the integer Period of each row, rebuilding it if evicted"""
+        key = self._summary_key(month, year, fiscal_year, as_of)
+        summary_df, periods = self.summary_cache.get(key), self.summary_cache.get(key + ('periods',))
+        if summary_df is None or periods is None:
+            summary_df = self._build_summary(month, year, fiscal_year, as_of)
+            self.summary_cache.put(key, summary_df)
+            periods = self.summary_cache.get(key + ('periods',))
+        return summary_df.assign(Period=periods['Period'].to_numpy())
+
+    def generate_collection_rates(self, month: Optional[str] = None, year: Optional[int] = None,
+                                  fiscal_year: Optional[int] = None, school: Optional[str] = None,
+                                  as_of: Optional[Union[str, datetime]] = None) -> pd.DataFrame:
+        """
+        Fees billed against fees collected per School, Grade, Section, Month and fee type
+
+        Billed fees are the invoice lines dated in each month; collected
+        fees are the summary's Initial Fee and Term / Monthly Fee for the
+        payments made in it. Built from the summary for the same filters the
+        first time it is asked for, and cached with it.
+
+        Args:
+            month, year, fiscal_year, school, as_of: Filters as for generate_summary
+
+        Returns:
+            DataFrame with Billed, Collected and Collection Rate (%) per cell
+        """
+        report = self._summary_part('collection', month, year, fiscal_year,
+                                    self._created_cutoff(as_of)).drop(columns='Period')
+        if school:
+            return report[report['School'] == school].reset_index(drop=True)
+        return report.copy()
+
+    def summary_lineage(self, month: Optional[str] = None, year: Optional[int] = None,
+                        fiscal_year: Optional[int] = None, school: Optional[str] = None,
+                        as_of: Optional[Union[str, datetime]] = None) -> LineageIndex:
+        """
+        Payments behind every summary row, as a CSR index from row to payments
+
+        Traced the first time it is asked for and cached with the summary.
+        Cell i is row i of generate_summary for the same filters.
+
+        Args:
+            month, year, fiscal_year, school, as_of: Filters as for generate_summary
+
+        Returns:
+            LineageIndex with the payment rows, contact rows, measures and
+            allocated amounts of each cell
+        """
+        as_of = self._created_cutoff(as_of)
+        lineage = self._summary_part('lineage', month, year, fiscal_year, as_of)
+        summary_df = self._summary_with_periods(month, year, fiscal_year, as_of)
+        index = LineageIndex(lineage, len(summary_df))
+        if school:
+            index = index.select(np.flatnonzero((summary_df['School'] == school).to_numpy()))
+        return index
+
+    def drill_down(self, cell: Optional[int] = None, measure: Optional[str] = None,
+                   month: Optional[str] = None, year: Optional[int] = None,
+                   fiscal_year: Optional[int] = None, school: Optional[str] = None,
+                   as_of: Optional[Union[str, datetime]] = None) -> pd.DataFrame:
+        """
+        Students and receipts that make up a summary row
+
+        Args:
+            cell: Row of generate_summary for the same filters (None for every row)
+            measure: Optional summary measure, e.g. 'Initial Fee'
+            month, year, fiscal_year, school, as_of: Filters as for generate_summary
+
+        Returns:
+            DataFrame with one row per contributing payment and measure: the
+            Cell, Measure and Allocated amount, the payment's Date, Payment
+            Number, Invoice Number and Amount, and the student's Contact ID
+            and Display Name
+        """
+        lineage = self.summary_lineage(month, year, fiscal_year, school, as_of)
+        return drill_down_frame(lineage, lineage.entries(cell, measure), self.payments_df,
+                                self.contacts_df)
+
+    def search_students(self, query: str, limit: Optional[int] = 20) -> pd.DataFrame:
+        """
+        Students whose name, admission number or phone number contains the query
+
+        Answered from the trigram index built once per load (see student_index).
+
+        Args:
+            query: Part of a name, admission or enrollment number, or phone number
+            limit: Maximum number of students (None for all)
+
+        Returns:
+            DataFrame with the Contact ID, name, School, Grade and Section of each match
+        """
+        return student_matches(self.contacts_df, self.student_index.search(query, limit))
+
+    def student_activity(self, contact_id: str) -> Dict[str, pd.DataFrame]:
+        """
+        Invoices, payments and fee allocations of one student
+
+        Payments are those against the student's invoices or paid by the
+        student (e.g. opening balances). Allocations split them by fee type
+        as the summary does.
+
+        Args:
+            contact_id: Contact ID of the student
+
+        Returns:
+            Dict with 'invoices' (invoice lines), 'payments' and 'allocations'
+            (Allocated per payment and Fee Type)
+        """
+        contact_row = self.contact_index.lookup(pd.Series([str(contact_id)]))[0]
+        if contact_row < 0:
+            raise ValueError(f"Unknown Contact ID {contact_id}")
+        links, invoices = self.payment_links, self.invoice_index
+
+        # Only the columns shown or needed for allocation are gathered
+        _, lines = invoices.expand(np.flatnonzero(links['invoice_contacts'] == contact_row))
+        invoice_lines = invoices.lines[[col for col in INVOICE_ACTIVITY_COLUMNS
+                                        if col in invoices.lines.columns]].iloc[lines]
+        payment_rows = np.flatnonzero((links['contact_rows'] == contact_row) |
+                                      (links['payer_rows'] == contact_row))
+        columns = set(PAYMENT_ACTIVITY_COLUMNS + ISSUE_COLUMNS + ['Period', self.strategy.amount_column])
+        payments = self.payments_df[[col for col in self.payments_df.columns
+                                     if col in columns]].iloc[payment_rows]
+
+        rows = self._summary_rows(payments=payments)
+        rows['Allocated'] = rows[SUMMARY_MEASURES].sum(axis=1)
+        allocations = (rows[rows['Allocated'] != 0]
+                       .groupby(['Payment Row', 'Fee Type'], as_index=False, sort=False)['Allocated']
+                       .sum())
+        payment_rows = allocations['Payment Row'].to_numpy()
+        for column in ['Date', 'Payment Number', 'Invoice Number']:
+            if column in payments.columns:
+                allocations[column] = self.payments_df[column].take(payment_rows).to_numpy()
+        allocations['Allocated'] = allocations['Allocated'].round(self.strategy.decimals or 2)
+
+        return {
+            'invoices': invoice_lines.reset_index(drop=True),
+            'payments': payments[[col for col in PAYMENT_ACTIVITY_COLUMNS
+                                  if col in payments.columns]].reset_index(drop=True),
+            'allocations': allocations[[col for col in ['Date', 'Payment Number', 'Invoice Number',
+                                                        'Fee Type', 'Allocated']
+                                        if col in allocations.columns]],
+        }
+
+    def validate(self, month: Optional[str] = None, year: Optional[int] = None,
+                 fiscal_year: Optional[int] = None,
+                 as_of: Optional[Union[str, datetime]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Payment issues and the reconciliation of the summary for the filters
+
+        Both are produced while building the summary and cached with it, so
+        validating a summary that was already generated costs nothing. On the
+        polars backend they are traced on the first call instead.
+
+        Args:
+            month, year, fiscal_year, as_of: Filters as for generate_summary
+
+        Returns:
+            Dict with 'issues' (one row per payment with an issue, with
+            Dropped telling whether it was left out) and 'reconciliation'
+            (raw payments against summary totals per School and Month)
+        """
+        as_of = self._created_cutoff(as_of)
+        return {part: self._summary_part(part, month, year, fiscal_year, as_of).copy()
+                for part in ['issues', 'reconciliation']}
+
+    def save_issues(self, issues_df: pd.DataFrame, filename: str = None) -> Path:
+        """Save payment issues (from validate) to CSV for review"""
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"payment_issues_{timestamp}.csv"
+        return self.save_summary(issues_df, filename)
+
+    def save_summary(self, summary_df: pd.DataFrame, filename: str = None) -> Path:
+        """Save summary to CSV file"""
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"income_summary_{timestamp}.csv"
+
+        output_path = self.data_path / 'output' / filename
+        output_path.parent.mkdir(exist_ok=True)
+
+        # Save with proper formatting
+        summary_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+        logger.info(f"Summary saved to {output_path}")
+
+        return output_path
+
+    def generate_monthly_report(self, month: str, year: int) -> pd.DataFrame:
+        """Generate report for a specific month"""
+        logger.info(f"Generating report for {month} {year}")
+        return self.generate_summary(month=month, year=year)
+
+
+# Cleaned inputs are only reused from the cache by the code that cleaned them
+CLEANING_VERSION = code_version(
+    read_input, read_csv_sources, drop_overlapping_ids, convert_dates, period_codes,
+    IncomeSummaryEngine._clean_data, IncomeSummaryEngine._drop_duplicate_payments,
+    IncomeSummaryEngine._optimize_dtypes, IncomeSummaryEngine._load_polars,
+    polars_backend.read_input, polars_backend.clean_frames
+)
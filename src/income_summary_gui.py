@@ -173,21 +173,30 @@ class IncomeSummaryGUI:
             
     def browse_file(self, file_type):
         """Browse for input files"""
-        filename = filedialog.askopenfilename(
-            title=f"Select {file_type} file",
+        if file_type == 'contacts':
+            filename = filedialog.askopenfilename(
+                title=f"Select {file_type} file",
+                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            )
+            if filename:
+                self.contacts_path = Path(filename)
+                self.contacts_var.set(filename)
+            return
+        
+        # Invoices and payments may be split across several date-range exports
+        filenames = filedialog.askopenfilenames(
+            title=f"Select {file_type} file(s)",
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
         
-        if filename:
-            if file_type == 'contacts':
-                self.contacts_path = Path(filename)
-                self.contacts_var.set(filename)
-            elif file_type == 'invoices':
-                self.invoices_path = Path(filename)
-                self.invoices_var.set(filename)
+        if filenames:
+            paths = [Path(f) for f in filenames]
+            if file_type == 'invoices':
+                self.invoices_path = paths
+                self.invoices_var.set('; '.join(filenames))
             elif file_type == 'payments':
-                self.payments_path = Path(filename)
-                self.payments_var.set(filename)
+                self.payments_path = paths
+                self.payments_var.set('; '.join(filenames))
                 
     def browse_output_dir(self):
         """Browse for output directory"""
@@ -224,35 +233,16 @@ class IncomeSummaryGUI:
             # Copy files to expected locations if different
             self.log_message("Preparing data files...")
             
-            # Create a new processor with custom paths
-            processor = IncomeSummaryProcessorV2()
+            # Reuse the processor so unchanged files are not reloaded and
+            # repeated filter combinations come from its summary cache
+            processor = self.processor
             
-            # Override the default paths
-            processor.contacts_df = None
-            processor.invoices_df = None
-            processor.payments_df = None
-            
-            # Load data with custom paths
-            import pandas as pd
-            self.log_message("Loading student contacts...")
-            processor.contacts_df = pd.read_csv(self.contacts_path, encoding='utf-8-sig', 
-                                              dtype={'Contact ID': str, 'Customer ID': str})
-            
-            self.log_message("Loading invoices...")
-            processor.invoices_df = pd.read_csv(self.invoices_path, encoding='utf-8-sig',
-                                              dtype={'Customer ID': str, 'Invoice Number': str},
-                                              low_memory=False)
-            
-            self.log_message("Loading payments...")
-            processor.payments_df = pd.read_csv(self.payments_path, encoding='utf-8-sig',
-                                              dtype={'CustomerID': str, 'Invoice Number': str})
-            
-            # Convert dates
-            processor.payments_df['Date'] = pd.to_datetime(processor.payments_df['Date'])
-            processor.invoices_df['Invoice Date'] = pd.to_datetime(processor.invoices_df['Invoice Date'])
-            
-            # Clean data
-            processor._clean_data()
+            # Load data with custom paths (multiple exports are merged)
+            self.log_message("Loading contacts, invoices and payments...")
+            if not processor.load_data(contacts=self.contacts_path,
+                                       invoices=self.invoices_path,
+                                       payments=self.payments_path):
+                raise RuntimeError(processor.load_error)
             
             # Get filter values
             month = self.month_var.get()
@@ -266,11 +256,9 @@ class IncomeSummaryGUI:
             self.log_message(f"Generating summary for {month} {year}...")
             
             # Generate summary
-            summary_df = processor.generate_summary(month=month_filter, year=year_filter)
-            
-            # Apply school filter if needed
-            if school != 'All Schools' and not summary_df.empty:
-                summary_df = summary_df[summary_df['School'] == school]
+            school_filter = None if school == 'All Schools' else school
+            summary_df = processor.generate_summary(month=month_filter, year=year_filter,
+                                                    school=school_filter)
             
             # Save output
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Contact history for income summaries
+Keeps every Grade, Section and School a student had across successive
+contact exports, so payments are attributed to the class the student was in
+on the payment date rather than the one in the latest export
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Contact columns that are tracked over time and attributed as of a date
+HISTORY_COLUMNS = ['Grade', 'Section', 'School']
+
+VALID_COLUMNS = ['Valid From', 'Valid To']
+
+
+def contact_versions(exports: Sequence[pd.DataFrame],
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Versions of every contact's tracked columns, with the time each was valid
+
+    A version starts at the Last Modified Time of the first export showing
+    it and ends where the next version starts (NaT for the current one).
+    Exports repeating an unchanged contact add no version.
+
+    Args:
+        exports: Contact exports, in any order
+        columns: Tracked columns, defaults to HISTORY_COLUMNS
+
+    Returns:
+        DataFrame with Contact ID, Valid From, Valid To and the tracked
+        columns (as categoricals), sorted by Contact ID and Valid From
+    """
+    columns = columns or HISTORY_COLUMNS
+    frames = []
+    for export in exports:
+        # Same fallback as the engine's cleaning for exports without School
+        if 'School' in columns and 'School' not in export.columns and 'Location Name' in export.columns:
+            export = export.assign(School=export['Location Name'])
+        if 'Last Modified Time' not in export.columns:
+            raise ValueError("Contact exports need a Last Modified Time column for the history")
+        frame = pd.DataFrame({
+            'Contact ID': export['Contact ID'].astype(object).to_numpy(),
+            'Valid From': pd.to_datetime(export['Last Modified Time'], errors='coerce').to_numpy(),
+        })
+        for column in columns:
+            frame[column] = (export[column].astype(object).to_numpy() if column in export.columns
+                             else None)
+        frames.append(frame)
+
+    versions = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['Contact ID', 'Valid From'] + columns)
+    versions = versions[versions['Contact ID'].notna()]
+    if 'School' in columns:
+        versions['School'] = versions['School'].fillna('Unknown')
+    # Undated rows are the oldest; the last export wins between equal times
+    versions = versions.sort_values(['Contact ID', 'Valid From'], kind='stable', na_position='first')
+    versions = versions[~versions.duplicated(['Contact ID', 'Valid From'], keep='last')]
+
+    # A version only starts where a tracked column changes
+    ids = versions['Contact ID'].to_numpy()
+    new_contact = np.concatenate([[True], ids[1:] != ids[:-1]]) if len(ids) else np.zeros(0, dtype=bool)
+    values = versions[columns].astype(object).where(versions[columns].notna(), None).to_numpy()
+    changed = new_contact
+    if len(ids):
+        changed[1:] |= (values[1:] != values[:-1]).any(axis=1)
+    versions = versions[changed].reset_index(drop=True)
+
+    ids = versions['Contact ID'].to_numpy()
+    next_start = versions['Valid From'].shift(-1)
+    same_contact = np.append(ids[1:] == ids[:-1], False) if len(ids) else np.zeros(0, dtype=bool)
+    versions['Valid To'] = next_start.where(same_contact)
+    for column in columns:
+        versions[column] = versions[column].astype('category')
+    return versions[['Contact ID'] + VALID_COLUMNS + columns]
+
+
+class ContactHistory:
+    """
+    Contact versions grouped by contact row in a CSR layout
+
+    Versions of contact row r are positions offsets[r]:offsets[r + 1] of the
+    version arrays, ordered by Valid From. Attributing payments is an as-of
+    join by contact (merge_asof by Contact ID) without sorting the payments:
+    each payment starts at its contact's first version and moves forward
+    while the next version had started by its date.
+    """
+
+    def __init__(self, versions: pd.DataFrame, version_rows: np.ndarray, n_contacts: int):
+        """
+        Args:
+            versions: Output of contact_versions
+            version_rows: Contact row of every version (-1 for contacts no longer exported)
+            n_contacts: Number of contact rows
+        """
+        known = np.flatnonzero(version_rows >= 0)
+        # Undated versions (NaT) have the smallest time, so they come first
+        starts = versions['Valid From'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        order = known[np.lexsort((starts[known], version_rows[known]))]
+        self.rows = version_rows[order]
+        self.starts = starts[order]
+        self.versions = versions.iloc[order].reset_index(drop=True)
+        self.offsets = np.searchsorted(self.rows, np.arange(n_contacts + 1))
+
+    def __len__(self):
+        return len(self.versions)
+
+    def positions(self, contact_rows: np.ndarray, dates: np.ndarray) -> np.ndarray:
+        """
+        Version in force for each contact row on each date (-1 for unknown contacts)
+
+        Dates before a contact's first version take that first version.
+        """
+        contact_rows = np.asarray(contact_rows, dtype=np.int64)
+        times = np.asarray(dates, dtype='datetime64[ns]').view(np.int64)
+        rows = np.maximum(contact_rows, 0)
+        first = self.offsets[rows]
+        counts = np.where(contact_rows >= 0, self.offsets[rows + 1] - first, 0)
+        positions = np.where(counts > 0, first, -1)
+
+        # A contact has a version per change, so few steps are needed and
+        # each only touches the payments whose contact has more versions
+        active = np.flatnonzero(counts > 1)
+        step = 1
+        while len(active):
+            candidate = first[active] + step
+            started = self.starts[candidate] <= times[active]
+            active, candidate = active[started], candidate[started]
+            positions[active] = candidate
+            step += 1
+            active = active[counts[active] > step]
+        return positions
+
+    def attributes(self, contact_rows: np.ndarray, dates: np.ndarray,
+                   columns: Optional[List[str]] = None) -> Dict[str, pd.Categorical]:
+        """Tracked columns in force for each contact row on each date (NaN when unknown)"""
+        positions = self.positions(contact_rows, dates)
+        valid = positions >= 0
+        attributes = {}
+        for column in columns or HISTORY_COLUMNS:
+            values = self.versions[column]
+            codes = np.full(len(positions), -1, dtype=np.int64)
+            codes[valid] = values.cat.codes.to_numpy()[positions[valid]]
+            attributes[column] = pd.Categorical.from_codes(codes, categories=values.cat.categories)
+        return attributes
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Allocation kernels for income summaries
+Allocate payments across their invoice lines and accumulate the results per
+summary group in a single pass over CSR invoice arrays. Compiled with numba
+when it is installed, with a NumPy implementation otherwise.
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional
+    njit = None
+
+NUMBA_AVAILABLE = njit is not None
+
+
+def expand_offsets(offsets: np.ndarray, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pair every entry with each element of its CSR segment
+
+    Args:
+        offsets: Segment i spans offsets[i]:offsets[i + 1]
+        positions: Segment of each entry
+
+    Returns:
+        (entry position, element position) arrays
+    """
+    starts = offsets[positions]
+    counts = offsets[positions + 1] - starts
+    entries = np.repeat(np.arange(len(positions)), counts)
+    first_of_entry = np.repeat(np.cumsum(counts) - counts, counts)
+    elements = np.repeat(starts, counts) + (np.arange(counts.sum()) - first_of_entry)
+    return entries, elements
+
+
+def _proportional_totals_numpy(offsets, item_totals, item_categories, invoice_totals,
+                               amounts, payment_invoices, payment_groups, n_groups, n_categories):
+    entries, lines = expand_offsets(offsets, payment_invoices)
+    categories = item_categories[lines]
+    keep = categories >= 0
+    entries, lines, categories = entries[keep], lines[keep], categories[keep]
+
+    allocated = amounts[entries] * (item_totals[lines] / invoice_totals[payment_invoices[entries]])
+    groups = payment_groups[entries]
+    totals = np.bincount(groups * n_categories + categories, weights=allocated,
+                         minlength=n_groups * n_categories)
+    counts = np.bincount(groups, minlength=n_groups)
+    return totals.astype(np.float64).reshape(n_groups, n_categories), counts
+
+
+def _proportional_totals_loop(offsets, item_totals, item_categories, invoice_totals,
+                              amounts, payment_invoices, payment_groups, n_groups, n_categories):
+    totals = np.zeros((n_groups, n_categories), dtype=np.float64)
+    counts = np.zeros(n_groups, dtype=np.int64)
+    for p in range(len(amounts)):
+        invoice = payment_invoices[p]
+        group = payment_groups[p]
+        for line in range(offsets[invoice], offsets[invoice + 1]):
+            category = item_categories[line]
+            if category < 0:
+                continue
+            totals[group, category] += amounts[p] * (item_totals[line] / invoice_totals[invoice])
+            counts[group] += 1
+    return totals, counts
+
+
+# No fastmath: results must match the NumPy path to the last bit
+_proportional_totals_compiled = (njit(cache=True, nogil=True)(_proportional_totals_loop)
+                                 if NUMBA_AVAILABLE else None)
+
+
+def proportional_totals(offsets: np.ndarray, item_totals: np.ndarray, item_categories: np.ndarray,
+                        invoice_totals: np.ndarray, amounts: np.ndarray,
+                        payment_invoices: np.ndarray, payment_groups: np.ndarray,
+                        n_groups: int, n_categories: int,
+                        use_numba: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split payments across invoice lines by Item Total and sum per group
+
+    Lines are visited in payment order and then line order, so the sums are
+    accumulated in the same order as allocating line by line and grouping.
+
+    Args:
+        offsets: CSR offsets of the invoice lines (see InvoiceIndex)
+        item_totals: Item Total per line
+        item_categories: Measure code per line (-1 for lines that are skipped)
+        invoice_totals: Sum of Item Total per invoice
+        amounts: Amount of each payment
+        payment_invoices: Invoice position of each payment
+        payment_groups: Summary group of each payment
+        n_groups: Number of summary groups
+        n_categories: Number of measure codes
+        use_numba: Force (True) or avoid (False) the compiled kernel;
+            defaults to numba when available
+
+    Returns:
+        (totals per group and measure code, allocated lines per group)
+    """
+    if use_numba is None:
+        use_numba = NUMBA_AVAILABLE
+    if use_numba and not NUMBA_AVAILABLE:
+        raise ImportError("The compiled kernel needs numba: pip install numba")
+
+    kernel = _proportional_totals_compiled if use_numba else _proportional_totals_numpy
+    return kernel(np.ascontiguousarray(offsets, dtype=np.int64),
+                  np.ascontiguousarray(item_totals, dtype=np.float64),
+                  np.ascontiguousarray(item_categories, dtype=np.int64),
+                  np.ascontiguousarray(invoice_totals, dtype=np.float64),
+                  np.ascontiguousarray(amounts, dtype=np.float64),
+                  np.ascontiguousarray(payment_invoices, dtype=np.int64),
+                  np.ascontiguousarray(payment_groups, dtype=np.int64),
+                  int(n_groups), int(n_categories))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Lineage of income summary cells
+Records which payments make up every summary cell, and how much of each
+payment was allocated to it, so a cell can be traced back to its students
+and receipts without recomputing the summary
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.income_summary_aggregation import combine_codes
+
+LINEAGE_COLUMNS = ['Cell', 'Payment Row', 'Contact Row', 'Measure', 'Allocated']
+
+# Payment and student columns shown for each contributing payment
+DRILL_DOWN_PAYMENT_COLUMNS = ['Date', 'Payment Number', 'Invoice Number', 'Amount']
+DRILL_DOWN_CONTACT_COLUMNS = ['Contact ID', 'Display Name']
+
+
+def cell_ids(summary: pd.DataFrame, entries: pd.DataFrame, dimensions: List[str]) -> np.ndarray:
+    """
+    Summary row of each entry, matched on the dimensions (-1 when none)
+
+    Both frames are encoded against one dictionary per dimension (the
+    categories of entries, or the summary's values), and the combined keys
+    are looked up in a table of summary rows instead of being sorted.
+    """
+    n_summary = len(summary)
+    summary_codes, entry_codes, sizes = [], [], []
+    unmatched = np.zeros(len(entries), dtype=bool)
+    for dim in dimensions:
+        values = entries[dim]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            dictionary, codes = values.cat.categories, values.cat.codes.to_numpy(dtype=np.int64)
+        else:
+            dictionary = pd.Index(pd.unique(summary[dim].dropna()))
+            codes = dictionary.get_indexer(values)
+        # Values the dictionary lacks must not fall into the missing-value slot
+        unmatched |= (codes < 0) & values.notna().to_numpy()
+        summary_codes.append(pd.Categorical(summary[dim], categories=dictionary).codes.astype(np.int64))
+        entry_codes.append(codes)
+        sizes.append(len(dictionary))
+
+    keys = combine_codes([np.concatenate(pair) for pair in zip(summary_codes, entry_codes)], sizes)
+    table = np.full(int(keys.max()) + 1 if len(keys) else 0, -1, dtype=np.int64)
+    table[keys[:n_summary]] = np.arange(n_summary)
+    return np.where(unmatched, -1, table[keys[n_summary:]])
+
+
+def lineage_frame(cells: np.ndarray, payment_rows: np.ndarray, contact_rows: np.ndarray,
+                  measure_codes: np.ndarray, allocated: np.ndarray,
+                  measures: Sequence[str]) -> pd.DataFrame:
+    """
+    Contributions grouped by cell, in their original order within a cell
+
+    Entries outside every cell or with nothing allocated are left out.
+
+    Args:
+        cells: Summary row of each contribution (-1 when none)
+        payment_rows: Payment row it comes from
+        contact_rows: Contact row it was attributed to
+        measure_codes: Position of its measure in measures
+        allocated: Amount allocated to the cell
+        measures: Summary measures
+
+    Returns:
+        DataFrame with LINEAGE_COLUMNS
+    """
+    keep = np.flatnonzero((cells >= 0) & (allocated != 0))
+    order = keep[np.argsort(cells[keep], kind='stable')]
+    return pd.DataFrame({
+        'Cell': cells[order].astype(np.int64),
+        'Payment Row': payment_rows[order].astype(np.int64),
+        'Contact Row': contact_rows[order].astype(np.int64),
+        'Measure': pd.Categorical.from_codes(measure_codes[order], categories=list(measures)),
+        'Allocated': allocated[order].astype(np.float64),
+    })
+
+
+class LineageIndex:
+    """
+    Contributions of payments to summary cells in a CSR layout
+
+    Contributions to cell i are entries offsets[i]:offsets[i + 1] of the
+    payment_rows, contact_rows, measure_codes and allocated arrays.
+    """
+
+    def __init__(self, lineage: pd.DataFrame, n_cells: int):
+        cells = lineage['Cell'].to_numpy(dtype=np.int64)
+        self.offsets = np.searchsorted(cells, np.arange(n_cells + 1))
+        self.payment_rows = lineage['Payment Row'].to_numpy(dtype=np.int64)
+        self.contact_rows = lineage['Contact Row'].to_numpy(dtype=np.int64)
+        self.measures = list(lineage['Measure'].cat.categories)
+        self.measure_codes = lineage['Measure'].cat.codes.to_numpy(dtype=np.int64)
+        self.allocated = lineage['Allocated'].to_numpy(dtype=np.float64)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def entries(self, cell: Optional[int] = None, measure: Optional[str] = None) -> np.ndarray:
+        """Entry positions of one cell (all cells when None), optionally of one measure"""
+        if cell is None:
+            positions = np.arange(self.offsets[-1])
+        else:
+            if not 0 <= cell < len(self):
+                raise IndexError(f"Summary has no row {cell}")
+            positions = np.arange(self.offsets[cell], self.offsets[cell + 1])
+        if measure is not None:
+            if measure not in self.measures:
+                raise ValueError(f"Unknown measure {measure!r}; use one of {', '.join(self.measures)}")
+            positions = positions[self.measure_codes[positions] == self.measures.index(measure)]
+        return positions
+
+    def cells(self, positions: np.ndarray) -> np.ndarray:
+        """Cell of each entry position"""
+        return np.searchsorted(self.offsets, positions, side='right') - 1
+
+    def to_frame(self, positions: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Entries as a DataFrame with LINEAGE_COLUMNS"""
+        if positions is None:
+            positions = np.arange(self.offsets[-1])
+        return pd.DataFrame({
+            'Cell': self.cells(positions),
+            'Payment Row': self.payment_rows[positions],
+            'Contact Row': self.contact_rows[positions],
+            'Measure': pd.Categorical.from_codes(self.measure_codes[positions],
+                                                 categories=self.measures),
+            'Allocated': self.allocated[positions],
+        })
+
+    def select(self, cells: np.ndarray) -> 'LineageIndex':
+        """Index of the given cells only, renumbered 0..len(cells) - 1 in that order"""
+        cells = np.asarray(cells, dtype=np.int64)
+        counts = self.offsets[cells + 1] - self.offsets[cells]
+        positions = np.concatenate([np.zeros(0, dtype=np.int64)] +
+                                   [np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+        frame = self.to_frame(positions)
+        frame['Cell'] = np.repeat(np.arange(len(cells)), counts)
+        return LineageIndex(frame, len(cells))
+
+
+def drill_down_frame(lineage: LineageIndex, positions: np.ndarray, payments: pd.DataFrame,
+                     contacts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Contributing payments with their receipt and student details
+
+    Args:
+        lineage: Lineage of the summary
+        positions: Entries to show (see LineageIndex.entries)
+        payments: Payment rows the lineage refers to
+        contacts: Contact rows the lineage refers to
+
+    Returns:
+        DataFrame with Cell, Measure, Allocated, the payment columns, the
+        student columns and Payment Row
+    """
+    details = lineage.to_frame(positions)
+    payment_rows, contact_rows = details.pop('Payment Row'), details.pop('Contact Row').to_numpy()
+    for column in DRILL_DOWN_PAYMENT_COLUMNS:
+        if column in payments.columns:
+            details[column] = payments[column].take(payment_rows.to_numpy()).to_numpy()
+
+    name_column = 'Display Name' if 'Display Name' in contacts.columns else 'Contact Name'
+    known = contact_rows >= 0
+    for column, source in zip(DRILL_DOWN_CONTACT_COLUMNS, ['Contact ID', name_column]):
+        values = np.full(len(details), None, dtype=object)
+        values[known] = contacts[source].take(contact_rows[known]).to_numpy()
+        details[column] = values
+    details['Payment Row'] = payment_rows
+    return details
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Input loading for income summaries
+Reads one or more ZOHO Books CSV exports per input type (files, globs or
+directories), in parallel threads, and merges overlapping exports by ID
+"""
+
+import glob
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Identify one application of a customer payment to an invoice
+PAYMENT_ID_COLUMNS = ['InvoicePayment ID', 'CustomerPayment ID']
+
+# Columns identifying the same record across overlapping exports
+OVERLAP_KEYS = {
+    'contacts': ['Contact ID'],
+    'invoices': ['Invoice Number'],
+    'payments': PAYMENT_ID_COLUMNS,
+}
+
+# Load with proper data types to avoid warnings and lossy float IDs
+DTYPE_SPEC = {
+    'Customer ID': str,
+    'Contact ID': str,
+    'CustomerID': str,
+    'Invoice Number': str,
+    'InvoicePayment ID': str,
+    'CustomerPayment ID': str
+}
+
+# read_csv options and date columns for each input type
+READ_OPTIONS = {
+    'contacts': {'dtype': DTYPE_SPEC},
+    'invoices': {'dtype': DTYPE_SPEC, 'low_memory': False},
+    'payments': {'dtype': DTYPE_SPEC},
+    'fee_items': {},
+}
+DATE_COLUMNS = {
+    'invoices': ['Invoice Date'],
+    'payments': ['Date'],
+}
+
+Source = Union[str, Path, object]
+
+
+def expand_sources(sources: Union[Source, Sequence[Source]]) -> List[Source]:
+    """
+    Expand files, glob patterns and directories into a list of CSV sources
+
+    File-like objects (e.g. uploaded files) are passed through unchanged.
+    Files are returned in name order, which is taken as export order.
+    """
+    if sources is None:
+        return []
+    if isinstance(sources, (str, Path)) or hasattr(sources, 'read'):
+        sources = [sources]
+
+    expanded = []
+    for source in sources:
+        if hasattr(source, 'read'):
+            expanded.append(source)
+            continue
+
+        path = Path(source)
+        if path.is_dir():
+            matches = sorted(path.glob('*.csv'))
+        elif glob.has_magic(str(source)):
+            matches = sorted(Path(p) for p in glob.glob(str(source)))
+        else:
+            matches = [path]
+
+        if not matches:
+            raise FileNotFoundError(f"No CSV files found for {source}")
+        expanded.extend(matches)
+
+    return expanded
+
+
+def drop_overlapping_ids(frame: pd.DataFrame, id_columns: List[str],
+                         source_index: np.ndarray) -> pd.DataFrame:
+    """
+    Keep each ID only from the latest export that contains it
+
+    Args:
+        frame: Concatenated rows from several exports
+        id_columns: Columns identifying a record
+        source_index: Position of each row's export in load order
+
+    Returns:
+        DataFrame without the rows superseded by a later export
+    """
+    id_columns = [col for col in id_columns if col in frame.columns]
+    if not id_columns:
+        return frame
+
+    id_hashes = pd.util.hash_pandas_object(frame[id_columns], index=False).to_numpy()
+    latest_source = pd.Series(source_index).groupby(id_hashes).transform('max').to_numpy()
+    has_ids = frame[id_columns].notna().all(axis=1).to_numpy()
+    keep = ~has_ids | (source_index == latest_source)
+
+    dropped = int((~keep).sum())
+    if dropped:
+        logger.info(f"Dropped {dropped} rows repeated in overlapping exports "
+                    f"(by {' / '.join(id_columns)})")
+    return frame[keep].reset_index(drop=True)
+
+
+def read_csv_sources(sources: Union[Source, Sequence[Source]],
+                     id_columns: Optional[List[str]] = None,
+                     max_workers: Optional[int] = None, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    Read and concatenate CSV exports
+
+    Args:
+        sources: Path, glob pattern, directory, file-like object or a list of them
+        id_columns: Columns used to remove rows repeated across exports
+        max_workers: Thread count for parallel parsing
+        **read_csv_kwargs: Passed to pd.read_csv
+
+    Returns:
+        Combined DataFrame
+    """
+    files = expand_sources(sources)
+    if not files:
+        raise FileNotFoundError("No input files given")
+
+    read_csv_kwargs.setdefault('encoding', 'utf-8-sig')
+
+    def read(source):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return pd.read_csv(source, **read_csv_kwargs)
+
+    if len(files) == 1:
+        return read(files[0])
+
+    # The C parser releases the GIL, so threads parse files concurrently
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = list(pool.map(read, files))
+
+    return combine_frames(frames, id_columns)
+
+
+def combine_frames(frames: List[pd.DataFrame], id_columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Concatenate frames parsed from separate exports, in export order
+
+    Args:
+        frames: One DataFrame per export
+        id_columns: Columns used to remove rows repeated across exports
+
+    Returns:
+        Combined DataFrame
+    """
+    if len(frames) == 1:
+        return frames[0]
+
+    source_index = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
+    combined = pd.concat(frames, ignore_index=True)
+    logger.info(f"Combined {len(frames)} files into {len(combined)} rows")
+
+    if id_columns:
+        combined = drop_overlapping_ids(combined, id_columns, source_index)
+    return combined
+
+
+def convert_dates(kind: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """Parse the date columns of an input type in place"""
+    for column in DATE_COLUMNS.get(kind, []):
+        if column in frame.columns:
+            frame[column] = pd.to_datetime(frame[column])
+    return frame
+
+
+def read_input(kind: str, sources: Union[Source, Sequence[Source]],
+               max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read one input type ('contacts', 'invoices', 'payments' or 'fee_items')
+
+    Applies the dtypes, overlap keys and date parsing for that input.
+    """
+    frame = read_csv_sources(sources, id_columns=OVERLAP_KEYS.get(kind),
+                             max_workers=max_workers, **READ_OPTIONS[kind])
+    return convert_dates(kind, frame)
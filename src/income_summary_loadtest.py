@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Load test for the income summary HTTP service
+Starts the service in-process on the bundled data (or synthetic exports when
+the bundle is incomplete) and reports requests per second
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.request import urlopen
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.income_summary_server import ReportService, make_server
+from src.income_summary_synthetic import write_synthetic_data
+
+DEFAULT_QUERIES = [
+    '/summary',
+    '/summary?month=June&year=2025',
+    '/summary?fiscal_year=2025',
+    '/summary?school=Excel+Central+School',
+    '/summary?month=April&format=csv',
+]
+
+
+def has_bundled_data(base_path: Path) -> bool:
+    """Whether all three input exports are present under base_path/data/input"""
+    input_path = base_path / 'data' / 'input'
+    return all((input_path / name).exists() for name in
+               ['student_contacts.csv', 'student_invoices.csv', 'student_payment.csv'])
+
+
+def run_load(url: str, queries, requests: int, concurrency: int):
+    """Issue requests round-robin over queries and return (elapsed, latencies, errors)"""
+    def fetch(i):
+        start = time.perf_counter()
+        try:
+            with urlopen(url + queries[i % len(queries)]) as response:
+                response.read()
+                ok = response.status == 200
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    return elapsed, latencies, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the income summary HTTP service")
+    parser.add_argument('--base-path', type=Path, default=Path.cwd())
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--students', type=int, default=2000,
+                        help="Synthetic students when the bundled data is incomplete")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Disable the result cache to measure cold summaries")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_path = args.base_path
+        if not has_bundled_data(base_path):
+            print(f"Bundled data incomplete; generating {args.students} synthetic students")
+            base_path = Path(tmp)
+            write_synthetic_data(base_path, n_students=args.students)
+
+        service = ReportService(base_path, cache_size=0 if args.no_cache else 128,
+                                reload_interval=0)
+        load_start = time.perf_counter()
+        if not service.load():
+            print(f"Failed to load data: {service.load_error}")
+            return 1
+        print(f"Loaded {len(service.processor.payments_df)} payments in "
+              f"{time.perf_counter() - load_start:.2f}s")
+
+        server = make_server(service, port=0)
+        url = f"http://127.0.0.1:{server.server_port}"
+        Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            elapsed, latencies, errors = run_load(url, DEFAULT_QUERIES, args.requests,
+                                                  args.concurrency)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    print(f"\n{args.requests} requests, concurrency {args.concurrency}"
+          f"{' (result cache off)' if args.no_cache else ''}")
+    print(f"  Requests/sec: {args.requests / elapsed:,.1f}")
+    print(f"  Latency p50:  {latencies[len(latencies) // 2] * 1000:.1f} ms")
+    print(f"  Latency p99:  {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+    print(f"  Errors:       {errors}")
+    print(f"  Cache hits:   {service.results.hits}, misses: {service.results.misses}")
+    return 0 if errors == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Period helpers for income summaries
+Periods are stored as integer year-months (YYYYMM) so that filtering,
+grouping and sorting work on plain integers instead of month-name strings
+"""
+
+import calendar
+import pandas as pd
+import numpy as np
+from typing import Optional, Union
+
+# Academic/fiscal year starts in April (April - March)
+DEFAULT_FISCAL_YEAR_START = 4
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+
+
+def period_codes(dates: pd.Series) -> pd.Series:
+    """Convert dates to integer YYYYMM periods (0 for missing dates)"""
+    periods = dates.dt.year * 100 + dates.dt.month
+    return periods.fillna(0).astype(np.int32)
+
+
+def month_number(month: Union[str, int]) -> int:
+    """Resolve a month name (e.g. 'June') or number to 1-12"""
+    if isinstance(month, (int, np.integer)):
+        number = int(month)
+    else:
+        text = str(month).strip()
+        number = int(text) if text.isdigit() else MONTH_NAMES.index(text.capitalize()) + 1
+    if not 1 <= number <= 12:
+        raise ValueError(f"Invalid month: {month}")
+    return number
+
+
+def fiscal_year_of(periods: np.ndarray, fiscal_year_start: int = DEFAULT_FISCAL_YEAR_START) -> np.ndarray:
+    """Fiscal year (named after its starting calendar year) for each period"""
+    periods = np.asarray(periods)
+    years, months = periods // 100, periods % 100
+    return np.where(months >= fiscal_year_start, years, years - 1)
+
+
+def fiscal_year_range(fiscal_year: int, fiscal_year_start: int = DEFAULT_FISCAL_YEAR_START):
+    """First and last period of a fiscal year"""
+    first = fiscal_year * 100 + fiscal_year_start
+    if fiscal_year_start == 1:
+        last = fiscal_year * 100 + 12
+    else:
+        last = (fiscal_year + 1) * 100 + fiscal_year_start - 1
+    return first, last
+
+
+def period_mask(periods: pd.Series, month: Optional[Union[str, int]] = None,
+                year: Optional[int] = None, fiscal_year: Optional[int] = None,
+                fiscal_year_start: int = DEFAULT_FISCAL_YEAR_START) -> np.ndarray:
+    """
+    Boolean mask selecting periods that match the filters
+
+    Args:
+        periods: Integer YYYYMM periods
+        month: Optional calendar month (name or number)
+        year: Optional calendar year
+        fiscal_year: Optional fiscal year, e.g. 2025 for April 2025 - March 2026
+        fiscal_year_start: First month of the fiscal year
+
+    Returns:
+        NumPy boolean array
+    """
+    values = np.asarray(periods)
+    mask = np.ones(len(values), dtype=bool)
+
+    if year:
+        mask &= (values >= year * 100 + 1) & (values <= year * 100 + 12)
+    if fiscal_year:
+        first, last = fiscal_year_range(fiscal_year, fiscal_year_start)
+        mask &= (values >= first) & (values <= last)
+    if month:
+        mask &= (values % 100) == month_number(month)
+
+    return mask
+
+
+def period_labels(periods: pd.Series) -> pd.Series:
+    """
+    Month labels for periods, ordered chronologically
+
+    Plain month names are used when every name maps to a single period.
+    Once any month name repeats, the year is appended to every label, not
+    only the repeated ones (e.g. 'May 2024', 'June 2024', 'June 2025'), so
+    all labels of one summary read the same way.
+    """
+    unique_periods = np.sort(pd.unique(periods[periods > 0]))
+    names = [MONTH_NAMES[p % 100 - 1] for p in unique_periods]
+    if len(set(names)) != len(names):
+        names = [f"{name} {p // 100}" for name, p in zip(names, unique_periods)]
+
+    labels = pd.Categorical(
+        periods.map(dict(zip(unique_periods, names))),
+        categories=names,
+        ordered=True
+    )
+    return pd.Series(labels, index=periods.index)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Polars execution backend for income summaries
+Multi-threaded load, clean, opening-balance and proportional-allocation
+stages that produce the same summary as the pandas engine
+"""
+
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import polars as pl
+except ImportError:  # polars is optional
+    pl = None
+
+from src.income_summary_loader import (
+    DATE_COLUMNS, OVERLAP_KEYS, PAYMENT_ID_COLUMNS, expand_sources
+)
+from src.income_summary_periods import period_mask
+
+logger = logging.getLogger(__name__)
+
+OPENING_BALANCE = 'Customer opening balance'
+
+# Columns read as text so long IDs are never parsed as numbers
+ID_COLUMNS = ['Customer ID', 'Contact ID', 'CustomerID', 'Invoice Number',
+              'InvoicePayment ID', 'CustomerPayment ID']
+NUMERIC_COLUMNS = {
+    'invoices': ['Item Total'],
+    'payments': ['Amount', 'Amount Applied to Invoice'],
+}
+
+POLARS_AVAILABLE = pl is not None
+
+
+def require_polars():
+    """Raise a helpful error when polars is not installed"""
+    if pl is None:
+        raise ImportError("The polars backend needs polars: pip install polars")
+
+
+def _read_one(source) -> 'pl.DataFrame':
+    if hasattr(source, 'read'):
+        source.seek(0)
+        content = source.getvalue() if hasattr(source, 'getvalue') else source.read()
+        source = content if isinstance(content, bytes) else str(content).encode()
+    frame = pl.read_csv(source, infer_schema_length=10000,
+                        schema_overrides={col: pl.Utf8 for col in ID_COLUMNS})
+    # Strip a UTF-8 byte order mark from the first header
+    first = frame.columns[0] if frame.columns else None
+    if first and first.startswith('﻿'):
+        frame = frame.rename({first: first.lstrip('﻿')})
+    return frame
+
+
+def read_input(kind: str, sources) -> 'pl.DataFrame':
+    """
+    Read one input type with Polars, merging overlapping exports
+
+    Mirrors income_summary_loader.read_input: rows from the latest export
+    win when the same ID appears in several exports.
+    """
+    require_polars()
+    files = expand_sources(sources)
+    if not files:
+        raise FileNotFoundError("No input files given")
+
+    frames = [_read_one(f).with_columns(pl.lit(i, dtype=pl.Int32).alias('__source'))
+              for i, f in enumerate(files)]
+    frame = pl.concat(frames, how='diagonal_relaxed') if len(frames) > 1 else frames[0]
+
+    id_columns = [col for col in OVERLAP_KEYS.get(kind, []) if col in frame.columns]
+    if len(frames) > 1 and id_columns:
+        has_ids = pl.all_horizontal([pl.col(c).is_not_null() for c in id_columns])
+        latest = pl.col('__source').max().over(id_columns)
+        frame = frame.filter(~has_ids | (pl.col('__source') == latest))
+    frame = frame.drop('__source')
+
+    for column in NUMERIC_COLUMNS.get(kind, []):
+        if column in frame.columns:
+            frame = frame.with_columns(pl.col(column).cast(pl.Float64, strict=False))
+    for column in DATE_COLUMNS.get(kind, []):
+        if column in frame.columns and frame.schema[column] == pl.Utf8:
+            frame = frame.with_columns(pl.col(column).str.to_datetime(strict=False))
+    return frame
+
+
+def clean_frames(frames: Dict[str, 'pl.DataFrame']) -> Dict:
+    """
+    Clean the inputs like IncomeSummaryEngine._clean_data
+
+    Returns:
+        Dict with the cleaned frames and the duplicate report
+    """
+    contacts, payments = frames['contacts'], frames['payments']
+
+    payments = payments.with_columns(
+        (pl.col('Date').dt.year() * 100 + pl.col('Date').dt.month())
+        .fill_null(0).cast(pl.Int32).alias('Period')
+    )
+
+    # Drop repeated payments: keep the last row per payment ID pair, and the
+    # first of identical rows among rows without IDs
+    columns = payments.columns
+    payments = payments.with_row_index('__row')
+    id_columns = [col for col in PAYMENT_ID_COLUMNS if col in columns]
+    report = {}
+    if id_columns:
+        has_ids = pl.all_horizontal([pl.col(c).is_not_null() for c in id_columns])
+        with_ids = payments.filter(has_ids)
+        without_ids = payments.filter(~has_ids)
+        kept_ids = with_ids.unique(subset=id_columns, keep='last', maintain_order=True)
+        report['same payment IDs'] = with_ids.height - kept_ids.height
+    else:
+        kept_ids, without_ids = payments.clear(), payments
+    if without_ids.height:
+        kept_rows = without_ids.unique(subset=columns, keep='first', maintain_order=True)
+        report['identical rows'] = without_ids.height - kept_rows.height
+    else:
+        kept_rows = without_ids
+    payments = pl.concat([kept_ids, kept_rows]).sort('__row').drop('__row')
+
+    if 'School' not in contacts.columns and 'Location Name' in contacts.columns:
+        contacts = contacts.with_columns(pl.col('Location Name').alias('School'))
+    if 'School' in contacts.columns:
+        contacts = contacts.with_columns(pl.col('School').fill_null('Unknown'))
+
+    cleaned = dict(frames, contacts=contacts, payments=payments)
+    return {'frames': cleaned, 'duplicate_report': report}
+
+
+def to_pandas_frames(frames: Dict[str, 'pl.DataFrame']) -> Dict[str, Optional[pd.DataFrame]]:
+    """Pandas copies of the cleaned frames, named like the engine attributes"""
+    converted = {}
+    for kind in ['contacts', 'invoices', 'payments', 'fee_items']:
+        frame = frames.get(kind)
+        converted[f"{kind}_df"] = None if frame is None else frame.to_pandas()
+    return converted
+
+
+def from_pandas_frames(contacts_df: pd.DataFrame, invoices_df: pd.DataFrame,
+                       payments_df: pd.DataFrame) -> Dict[str, 'pl.DataFrame']:
+    """Polars copies of frames already cleaned by the pandas engine"""
+    require_polars()
+
+    def convert(frame):
+        # Categoricals become plain strings so joins and sorting match pandas
+        frame = frame.astype({col: object for col in frame.columns
+                              if isinstance(frame[col].dtype, pd.CategoricalDtype)})
+        return pl.from_pandas(frame)
+
+    return {'contacts': convert(contacts_df), 'invoices': convert(invoices_df),
+            'payments': convert(payments_df)}
+
+
+def _categorize(item_names: 'pl.Expr') -> 'pl.Expr':
+    names = item_names.cast(pl.Utf8).str.to_lowercase()
+    return (pl.when(names.str.contains('initial academic fee', literal=True))
+            .then(pl.lit('Initial Fee'))
+            .when(names.str.contains('term', literal=True) |
+                  names.str.contains('monthly fee', literal=True))
+            .then(pl.lit('Term / Monthly Fee'))
+            .otherwise(pl.lit(None, dtype=pl.Utf8)))
+
+
+def proportional_summary(frames: Dict[str, 'pl.DataFrame'], month=None, year=None,
+                         fiscal_year=None, fiscal_year_start: int = 4,
+                         decimals: int = 2, periods: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    Income summary with payments split across invoice lines by Item Total
+
+    Same rules as the pandas engine with ProportionalAllocation: payments
+    whose invoice or customer is unknown, invoices totalling zero and
+    other items are skipped; opening balances are kept even when the
+    customer is unknown. Besides the month, year and fiscal year filters,
+    payments can be limited to a list of YYYYMM periods.
+
+    Returns:
+        pandas DataFrame with Grade, Section, School, Period and the measures
+    """
+    require_polars()
+    contacts, invoices, payments = frames['contacts'], frames['invoices'], frames['payments']
+
+    mask = period_mask(payments['Period'].to_numpy(), month, year, fiscal_year, fiscal_year_start)
+    if periods is not None:
+        mask &= np.isin(payments['Period'].to_numpy(), periods)
+    payments = payments.filter(pl.Series(mask))
+
+    # First contact row per Contact ID
+    people = (contacts.filter(pl.col('Contact ID').is_not_null())
+              .unique(subset='Contact ID', keep='first', maintain_order=True)
+              .select(['Contact ID'] + [pl.col(c).cast(pl.Utf8) for c in ['Grade', 'Section', 'School']]))
+
+    # Invoice lines with their invoice total and the customer of the first line
+    lines = (invoices.filter(pl.col('Invoice Number').is_not_null())
+             .with_columns(
+                 pl.col('Item Total').fill_nan(0).fill_null(0).sum().over('Invoice Number')
+                 .alias('__invoice_total'),
+                 pl.col('Customer ID').first().over('Invoice Number').alias('__customer'),
+                 _categorize(pl.col('Item Name')).alias('__fee_type'))
+             .select(['Invoice Number', 'Item Total', '__invoice_total', '__customer', '__fee_type']))
+    headers = lines.unique(subset='Invoice Number', keep='first', maintain_order=True).select(
+        ['Invoice Number', '__invoice_total', '__customer'])
+
+    is_opening = pl.col('Invoice Number') == OPENING_BALANCE
+    dims = ['Grade', 'Section', 'School', 'Period']
+
+    opening = (payments.filter(is_opening)
+               .join(people, left_on='CustomerID', right_on='Contact ID', how='left')
+               .select(dims + [pl.col('Amount').cast(pl.Float64).alias('Opening Balance'),
+                               pl.lit(0.0).alias('Initial Fee'),
+                               pl.lit(0.0).alias('Term / Monthly Fee')]))
+
+    allocated = pl.col('Amount') * (pl.col('Item Total') / pl.col('__invoice_total'))
+    fees = (payments.filter(~is_opening | pl.col('Invoice Number').is_null())
+            .select(['Invoice Number', 'Amount', 'Period'])
+            .join(headers, on='Invoice Number', how='inner')
+            .join(people, left_on='__customer', right_on='Contact ID', how='inner')
+            .filter(pl.col('__invoice_total') != 0)
+            .join(lines.select(['Invoice Number', 'Item Total', '__fee_type']),
+                  on='Invoice Number', how='inner')
+            .filter(pl.col('__fee_type').is_not_null())
+            .select(dims + [
+                pl.lit(0.0).alias('Opening Balance'),
+                pl.when(pl.col('__fee_type') == 'Initial Fee').then(allocated).otherwise(0.0)
+                .alias('Initial Fee'),
+                pl.when(pl.col('__fee_type') == 'Term / Monthly Fee').then(allocated).otherwise(0.0)
+                .alias('Term / Monthly Fee')]))
+
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    summary = (pl.concat([opening, fees], how='vertical_relaxed')
+               .group_by(dims)
+               .agg([pl.col(m).sum() for m in measures])
+               .with_columns([pl.col(m).round(decimals) for m in measures])
+               .sort(['School', 'Grade', 'Section', 'Period'], nulls_last=True))
+
+    return _to_template(summary.to_pandas())
+
+
+def _to_template(summary: pd.DataFrame) -> pd.DataFrame:
+    """Categorical dimensions and integer periods, as built by the pandas engine"""
+    for column in ['Grade', 'Section', 'School']:
+        summary[column] = pd.Categorical(summary[column])
+    summary['Period'] = summary['Period'].astype(np.int32)
+    return summary[['Grade', 'Section', 'School', 'Period', 'Opening Balance', 'Initial Fee',
+                    'Term / Monthly Fee']]
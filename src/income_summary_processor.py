@@ -9,13 +9,20 @@ import numpy as np
 from datetime import datetime
 from pathlib import Path
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Optional
 import warnings
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.income_summary_engine import IncomeSummaryEngine
+from src.income_summary_periods import DEFAULT_FISCAL_YEAR_START
 
 # Suppress pandas warnings
 warnings.filterwarnings('ignore', category=pd.errors.PerformanceWarning)
 
 # Configure logging
+Path('logs').mkdir(exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -27,88 +34,34 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class IncomeSummaryProcessor:
+class IncomeSummaryProcessor(IncomeSummaryEngine):
     """Main processor for generating income summaries from ZOHO Books data"""
     
-    def __init__(self, base_path: Path = None):
+    def __init__(self, base_path: Path = None, fiscal_year_start: int = DEFAULT_FISCAL_YEAR_START):
         """
         Initialize the processor with base path
         
+        Every invoice line is credited the full amount applied to its invoice
+        (the 'full' allocation strategy of the shared engine).
+        
         Args:
             base_path: Base directory path, defaults to current directory
+            fiscal_year_start: First month of the academic/fiscal year
         """
-        self.base_path = base_path or Path.cwd()
-        self.data_path = self.base_path / 'data'
-        
-        # Initialize dataframes
-        self.contacts_df = None
-        self.invoices_df = None
-        self.payments_df = None
-        self.fee_items_df = None
+        super().__init__(base_path, strategy='full', fiscal_year_start=fiscal_year_start)
         
         # Summary data
         self.summary_data = []
         
-    def load_data(self) -> bool:
-        """
-        Load all required CSV files
-        
-        Returns:
-            bool: True if all files loaded successfully
-        """
-        try:
-            logger.info("Loading data files...")
-            
-            # Load student contacts
-            contacts_path = self.data_path / 'input' / 'student_contacts.csv'
-            self.contacts_df = pd.read_csv(contacts_path, encoding='utf-8-sig')
-            logger.info(f"Loaded {len(self.contacts_df)} student contacts")
-            
-            # Load invoices
-            invoices_path = self.data_path / 'input' / 'student_invoices.csv'
-            self.invoices_df = pd.read_csv(invoices_path, encoding='utf-8-sig')
-            logger.info(f"Loaded {len(self.invoices_df)} invoice records")
-            
-            # Load payments
-            payments_path = self.data_path / 'input' / 'student_payment.csv'
-            self.payments_df = pd.read_csv(payments_path, encoding='utf-8-sig')
-            logger.info(f"Loaded {len(self.payments_df)} payment records")
-            
-            # Load fee items reference
-            fee_items_path = self.data_path / 'reference' / 'fee_items.csv'
-            self.fee_items_df = pd.read_csv(fee_items_path, encoding='utf-8-sig')
-            logger.info(f"Loaded {len(self.fee_items_df)} fee items")
-            
-            # Convert date columns
-            self.payments_df['Date'] = pd.to_datetime(self.payments_df['Date'])
-            self.invoices_df['Invoice Date'] = pd.to_datetime(self.invoices_df['Invoice Date'])
-            
-            # Optimize data types
-            self._optimize_dtypes()
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error loading data: {str(e)}")
-            return False
-    
-    def _optimize_dtypes(self):
-        """Optimize data types for memory efficiency"""
-        # Convert categorical columns
-        if 'School' in self.contacts_df.columns:
-            self.contacts_df['School'] = self.contacts_df['School'].astype('category')
-        if 'Grade' in self.contacts_df.columns:
-            self.contacts_df['Grade'] = self.contacts_df['Grade'].astype('category')
-        if 'Section' in self.contacts_df.columns:
-            self.contacts_df['Section'] = self.contacts_df['Section'].astype('category')
-            
-    def process_opening_balances(self, month: Optional[str] = None, year: Optional[int] = None) -> pd.DataFrame:
+    def process_opening_balances(self, month: Optional[str] = None, year: Optional[int] = None,
+                                 fiscal_year: Optional[int] = None) -> pd.DataFrame:
         """
         Process opening balance payments
         
         Args:
             month: Optional month filter
             year: Optional year filter
+            fiscal_year: Optional fiscal year filter
             
         Returns:
             DataFrame with opening balance summary
@@ -120,19 +73,8 @@ class IncomeSummaryProcessor:
             self.payments_df['Invoice Number'] == 'Customer opening balance'
         ].copy()
         
-        # Add month and year columns
-        opening_balance_payments['Month'] = opening_balance_payments['Date'].dt.month_name()
-        opening_balance_payments['Year'] = opening_balance_payments['Date'].dt.year
-        
         # Apply filters if provided
-        if month:
-            opening_balance_payments = opening_balance_payments[
-                opening_balance_payments['Month'] == month
-            ]
-        if year:
-            opening_balance_payments = opening_balance_payments[
-                opening_balance_payments['Year'] == year
-            ]
+        opening_balance_payments = self._filter_with_month(opening_balance_payments, month, year, fiscal_year)
         
         # Merge with customer data to get grade, section, school
         opening_balance_summary = opening_balance_payments.merge(
@@ -146,13 +88,15 @@ class IncomeSummaryProcessor:
         
         return opening_balance_summary
     
-    def process_fee_payments(self, month: Optional[str] = None, year: Optional[int] = None) -> pd.DataFrame:
+    def process_fee_payments(self, month: Optional[str] = None, year: Optional[int] = None,
+                             fiscal_year: Optional[int] = None) -> pd.DataFrame:
         """
         Process regular fee payments (Initial and Term/Monthly fees)
         
         Args:
             month: Optional month filter
             year: Optional year filter
+            fiscal_year: Optional fiscal year filter
             
         Returns:
             DataFrame with fee payment details
@@ -164,15 +108,8 @@ class IncomeSummaryProcessor:
             self.payments_df['Invoice Number'] != 'Customer opening balance'
         ].copy()
         
-        # Add month and year columns
-        fee_payments['Month'] = fee_payments['Date'].dt.month_name()
-        fee_payments['Year'] = fee_payments['Date'].dt.year
-        
         # Apply filters if provided
-        if month:
-            fee_payments = fee_payments[fee_payments['Month'] == month]
-        if year:
-            fee_payments = fee_payments[fee_payments['Year'] == year]
+        fee_payments = self._filter_with_month(fee_payments, month, year, fiscal_year)
         
         # Merge with invoice data to get fee details
         fee_payment_details = fee_payments.merge(
@@ -182,7 +119,7 @@ class IncomeSummaryProcessor:
         )
         
         # Categorize fees
-        fee_payment_details['Fee Type'] = fee_payment_details['Item Name'].apply(self._categorize_fee)
+        fee_payment_details['Fee Type'] = self._categorize_fees(fee_payment_details['Item Name'])
         
         # Merge with customer data
         fee_payment_summary = fee_payment_details.merge(
@@ -196,6 +133,26 @@ class IncomeSummaryProcessor:
         
         return fee_payment_summary
     
+    def _filter_with_month(self, payments: pd.DataFrame, month: Optional[str] = None,
+                           year: Optional[int] = None, fiscal_year: Optional[int] = None) -> pd.DataFrame:
+        """
+        Filter payments on their integer period and add Month/Year columns
+        
+        Args:
+            payments: Payment rows
+            month: Optional month filter
+            year: Optional year filter
+            fiscal_year: Optional fiscal year filter
+            
+        Returns:
+            Filtered DataFrame
+        """
+        payments = self._filter_period(payments, month, year, fiscal_year).copy()
+        payments['Month'] = payments['Date'].dt.month_name()
+        payments['Year'] = payments['Date'].dt.year
+        
+        return payments
+    
     def _categorize_fee(self, item_name: str) -> str:
         """
         Categorize fee based on item name
@@ -218,112 +175,27 @@ class IncomeSummaryProcessor:
         else:
             return 'Other'
     
-    def generate_summary(self, month: Optional[str] = None, year: Optional[int] = None) -> pd.DataFrame:
+    def _categorize_fees(self, item_names: pd.Series) -> pd.Series:
         """
-        Generate the income summary report
+        Vectorized version of _categorize_fee
         
         Args:
-            month: Optional month filter
-            year: Optional year filter
+            item_names: Names of the fee items
             
         Returns:
-            DataFrame matching the template structure
-        """
-        logger.info(f"Generating summary for {month or 'all months'} {year or 'all years'}")
-        
-        # Process different payment types
-        opening_balances = self.process_opening_balances(month, year)
-        fee_payments = self.process_fee_payments(month, year)
-        
-        # Initialize summary structure
-        summary_dict = {}
-        
-        # Process opening balances
-        for _, payment in opening_balances.iterrows():
-            key = (
-                payment.get('Grade', 'Unknown'),
-                payment.get('Section', 'Unknown'),
-                payment.get('School', 'Unknown'),
-                payment.get('Month', 'Unknown')
-            )
-            
-            if key not in summary_dict:
-                summary_dict[key] = {
-                    'Opening Balance': 0,
-                    'Initial Fee': 0,
-                    'Term / Monthly Fee': 0
-                }
-            
-            summary_dict[key]['Opening Balance'] += payment.get('Amount', 0)
-        
-        # Process fee payments
-        for _, payment in fee_payments.iterrows():
-            key = (
-                payment.get('Grade', 'Unknown'),
-                payment.get('Section', 'Unknown'), 
-                payment.get('School', 'Unknown'),
-                payment.get('Month', 'Unknown')
-            )
-            
-            if key not in summary_dict:
-                summary_dict[key] = {
-                    'Opening Balance': 0,
-                    'Initial Fee': 0,
-                    'Term / Monthly Fee': 0
-                }
-            
-            fee_type = payment.get('Fee Type', 'Other')
-            amount = payment.get('Amount Applied to Invoice', 0)
-            
-            if fee_type == 'Initial Fee':
-                summary_dict[key]['Initial Fee'] += amount
-            elif fee_type == 'Term/Monthly Fee':
-                summary_dict[key]['Term / Monthly Fee'] += amount
-        
-        # Convert to DataFrame
-        summary_rows = []
-        for (grade, section, school, month), amounts in summary_dict.items():
-            summary_rows.append({
-                'Grade': grade,
-                'Section': section,
-                'School': school,
-                'Opening Balance': amounts['Opening Balance'],
-                'Initial Fee': amounts['Initial Fee'],
-                'Month': month,
-                'Term / Monthly Fee': amounts['Term / Monthly Fee']
-            })
-        
-        summary_df = pd.DataFrame(summary_rows)
-        
-        # Sort by School, Grade, Section, Month
-        summary_df = summary_df.sort_values(['School', 'Grade', 'Section', 'Month'])
-        
-        logger.info(f"Generated summary with {len(summary_df)} rows")
-        
-        return summary_df
-    
-    def save_summary(self, summary_df: pd.DataFrame, filename: str = None):
-        """
-        Save summary to CSV file
-        
-        Args:
-            summary_df: Summary DataFrame
-            filename: Output filename (optional)
+            Series of fee categories
         """
-        if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"income_summary_{timestamp}.csv"
-        
-        output_path = self.data_path / 'output' / filename
-        
-        # Ensure output directory exists
-        output_path.parent.mkdir(exist_ok=True)
-        
-        # Save to CSV
-        summary_df.to_csv(output_path, index=False, encoding='utf-8-sig')
-        logger.info(f"Summary saved to {output_path}")
-        
-        return output_path
+        names = item_names.astype(str).str.lower()
+        is_initial = names.str.contains('initial academic fee', regex=False)
+        is_term = (names.str.contains('term', regex=False) |
+                   names.str.contains('monthly fee', regex=False))
+        
+        categories = np.select(
+            [item_names.isna().to_numpy(), is_initial.to_numpy(), is_term.to_numpy()],
+            ['Unknown', 'Initial Fee', 'Term/Monthly Fee'],
+            default='Other'
+        )
+        return pd.Series(categories, index=item_names.index)
 
 
 def main():
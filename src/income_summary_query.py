@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Lazy queries over the income summary pipeline
+Compose filters, groupings and measures, then collect:
+
+    Summary(processor).filter(school='Excel Central School', months=['June', 'July'])
+                      .by('School', 'Grade').collect()
+
+Nothing runs until collect(). The plan is optimized first: period filters
+become an index lookup or a scan mask on payments, contact filters are
+pushed below the invoice-line expansion, only the requested dimensions
+are joined, and queries answerable from a cached summary skip the
+payments altogether. Besides these, any dimension the engine can group
+on (see summary_by) can be used in by(). With backend='polars' the
+payments are allocated and grouped by income_summary_polars instead.
+"""
+
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.income_summary_aggregation import aggregate_by_codes
+from src.income_summary_dimensions import dimension_source
+from src.income_summary_engine import BACKENDS, OPENING_BALANCE, SUMMARY_MEASURES, IncomeSummaryEngine
+from src import income_summary_polars as polars_backend
+from src.income_summary_periods import month_number, period_labels, period_mask
+
+logger = logging.getLogger(__name__)
+
+# Contact columns that can be filtered on, and the dimensions of a cached summary
+CONTACT_DIMENSIONS = ['School', 'Grade', 'Section']
+DIMENSIONS = CONTACT_DIMENSIONS + ['Month']
+
+# Use the period index when the filter keeps less than this share of payments
+INDEX_SELECTIVITY = 0.25
+
+
+def _as_set(values) -> Optional[frozenset]:
+    if values is None:
+        return None
+    if isinstance(values, (str, int, np.integer)):
+        values = [values]
+    return frozenset(values)
+
+
+class Summary:
+    """
+    Lazy, immutable income summary query
+
+    Each method returns a new query, so partial queries can be reused.
+    """
+
+    def __init__(self, dataset: IncomeSummaryEngine, backend: str = 'pandas'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}. Choose from {', '.join(BACKENDS)}")
+        if backend == 'polars':
+            polars_backend.require_polars()
+            if dataset.strategy.name != 'proportional':
+                raise ValueError("The polars backend only supports proportional allocation")
+        self.dataset = dataset
+        self.backend = backend
+        self._contact_filters: Dict[str, frozenset] = {}
+        self._period_filters: Dict[str, object] = {}
+        self._months: Optional[frozenset] = None
+        self._by: List[str] = []
+        self._measures: List[str] = list(SUMMARY_MEASURES)
+
+    def _copy(self) -> 'Summary':
+        query = Summary.__new__(Summary)
+        query.__dict__.update(self.__dict__)
+        query._contact_filters = dict(self._contact_filters)
+        query._period_filters = dict(self._period_filters)
+        query._by = list(self._by)
+        query._measures = list(self._measures)
+        return query
+
+    def filter(self, school=None, grade=None, section=None, months=None,
+               month: Optional[Union[str, int]] = None, year: Optional[int] = None,
+               fiscal_year: Optional[int] = None) -> 'Summary':
+        """
+        Restrict the query; repeated calls combine with AND
+
+        Args:
+            school, grade, section: A value or a list of values
+            months: Month names, month numbers (1-12) or YYYYMM periods
+            month, year, fiscal_year: As for generate_summary
+        """
+        query = self._copy()
+        for column, values in zip(CONTACT_DIMENSIONS, [school, grade, section]):
+            values = _as_set(values)
+            if values is not None:
+                current = query._contact_filters.get(column)
+                query._contact_filters[column] = values if current is None else current & values
+
+        for name, value in [('month', month), ('year', year), ('fiscal_year', fiscal_year)]:
+            if value is not None:
+                if query._period_filters.get(name, value) != value:
+                    # Contradictory filters select nothing
+                    query._months = frozenset()
+                query._period_filters[name] = value
+
+        if months is not None:
+            values = _as_set(months)
+            query._months = values if query._months is None else query._months & values
+        return query
+
+    def by(self, *dimensions: str) -> 'Summary':
+        """
+        Group by School, Grade, Section and Month, or any contact or payment
+        column, Year, Fiscal Year or Fee Type
+        """
+        dataset = self.dataset
+        for dim in dimensions:
+            if dim not in DIMENSIONS:
+                dimension_source(dim, dataset.contacts_df.columns, dataset.payments_df.columns)
+        query = self._copy()
+        query._by = list(dimensions)
+        return query
+
+    def select(self, *measures: str) -> 'Summary':
+        """Keep only some of the summary measures"""
+        unknown = [m for m in measures if m not in SUMMARY_MEASURES]
+        if unknown:
+            raise ValueError(f"Unknown measures: {', '.join(unknown)}")
+        query = self._copy()
+        query._measures = list(measures)
+        return query
+
+    def plan(self) -> 'QueryPlan':
+        """Optimized plan for the query"""
+        return QueryPlan(self)
+
+    def explain(self) -> str:
+        """Human-readable optimized plan"""
+        return self.plan().explain()
+
+    def collect(self) -> pd.DataFrame:
+        """Execute the query"""
+        return self.plan().execute()
+
+
+class QueryPlan:
+    """
+    Optimized plan for a Summary query
+
+    Access paths, in order of preference:
+      cache        - slice an already generated summary for the same period filters
+      polars       - allocate and group the selected periods with Polars (backend='polars')
+      period-index - read only the payment rows of the selected periods
+      scan         - mask over all payments
+
+    Polars only groups on the summary dimensions and current contacts, so
+    other groupings and contact histories use the pandas paths.
+    """
+
+    def __init__(self, query: Summary):
+        self.query = query
+        self.dataset = dataset = query.dataset
+        self.measures = query._measures
+        self.by = query._by
+        self.contact_filters = {col: values for col, values in query._contact_filters.items()
+                                if col in dataset.contacts_df.columns}
+
+        # Dimensions actually needed: grouping plus filtered contact columns
+        self.join_columns = [col for col in self.by if col != 'Month'] + [
+            col for col in CONTACT_DIMENSIONS if col in self.contact_filters and col not in self.by]
+
+        self.cache_key = None
+        if query._months is None and set(self.by) <= set(DIMENSIONS):
+            key = dataset._summary_key(query._period_filters.get('month'),
+                                       query._period_filters.get('year'),
+                                       query._period_filters.get('fiscal_year'))
+            if key in dataset.summary_cache:
+                self.cache_key = key
+
+        if self.cache_key is not None:
+            self.access_path = 'cache'
+            self.periods = None
+        else:
+            self.periods = self._selected_periods()
+            index = dataset.period_index
+            selected = index.count(self.periods)
+            self.selectivity = selected / max(len(dataset.payments_df), 1)
+            if (query.backend == 'polars' and set(self.by) <= set(DIMENSIONS)
+                    and dataset.contact_history is None):
+                self.access_path = 'polars'
+            else:
+                self.access_path = 'period-index' if self.selectivity < INDEX_SELECTIVITY else 'scan'
+
+    def _selected_periods(self) -> np.ndarray:
+        """Periods present in the payments that pass the period filters"""
+        dataset, query = self.dataset, self.query
+        periods = dataset.period_index.periods
+        filters = query._period_filters
+        keep = period_mask(periods, filters.get('month'), filters.get('year'),
+                           filters.get('fiscal_year'), dataset.fiscal_year_start)
+
+        if query._months is not None:
+            numbers, exact = set(), set()
+            for value in query._months:
+                if isinstance(value, (int, np.integer)) and value > 12:
+                    exact.add(int(value))
+                else:
+                    numbers.add(month_number(value))
+            keep &= np.isin(periods % 100, list(numbers)) | np.isin(periods, list(exact))
+
+        return periods[keep]
+
+    def explain(self) -> str:
+        """Plan as indented text, outermost step first"""
+        by = ', '.join(self.by) or '(total)'
+        lines = [f"Aggregate by {by} -> {', '.join(self.measures)}"]
+        filters = ' AND '.join(f"{col} IN ({', '.join(sorted(map(str, values)))})"
+                               for col, values in self.contact_filters.items())
+
+        if self.access_path == 'cache':
+            lines.append(f"  Slice cached summary {self.cache_key[3:]}" +
+                         (f" WHERE {filters}" if filters else ""))
+            return '\n'.join(lines)
+
+        if self.access_path == 'polars':
+            if filters:
+                lines.append(f"  Filter summary rows: {filters}")
+            lines.append(f"  Polars proportional summary: {len(self.periods)} periods, "
+                         f"{self.selectivity:.0%} of payments")
+            return '\n'.join(lines)
+
+        as_of = self.dataset.contact_history is not None
+        if self.join_columns:
+            lines.append(f"  Join dimensions [{', '.join(self.join_columns)}]" +
+                         (" (contacts as of payment date)" if as_of else ""))
+        if filters and as_of:
+            lines.append(f"  Filter rows by contact: {filters}")
+        lines.append(f"  Allocate invoice lines ({self.dataset.strategy.name})")
+        if filters and not as_of:
+            lines.append(f"  Filter payments by contact (pushed down): {filters}")
+        path = ('Index lookup on Period' if self.access_path == 'period-index'
+                else 'Scan payments with Period mask')
+        lines.append(f"  {path}: {len(self.periods)} periods, "
+                     f"{self.selectivity:.0%} of payments")
+        return '\n'.join(lines)
+
+    def execute(self) -> pd.DataFrame:
+        """Run the plan"""
+        logger.info(f"Executing query plan via {self.access_path}")
+        if self.access_path == 'cache':
+            # Rebuilt through generate_summary should it have been evicted since planning
+            rows = self.dataset.generate_summary(**self.query._period_filters)
+            return self._aggregate(self._apply_contact_filters(rows), from_summary=True)
+
+        dataset = self.dataset
+        if self.access_path == 'polars':
+            rows = polars_backend.proportional_summary(
+                dataset.polars_frames, fiscal_year_start=dataset.fiscal_year_start,
+                decimals=dataset.strategy.decimals, periods=self.periods)
+            return self._aggregate(self._apply_contact_filters(rows), from_summary=False)
+
+        payments = dataset.payments_df
+        if self.access_path == 'period-index':
+            positions = dataset.period_index.rows(self.periods)
+        else:
+            positions = np.flatnonzero(np.isin(payments['Period'].to_numpy(), self.periods))
+        # With a contact history the current contacts cannot decide which payments pass
+        if self.contact_filters and dataset.contact_history is None:
+            positions = positions[self._contact_mask(payments, positions)]
+
+        rows = dataset._summary_rows(payments=payments.iloc[positions])
+        for column, values in dataset._dimension_columns(rows, self.join_columns).items():
+            rows[column] = values
+        if self.contact_filters:
+            rows = self._apply_contact_filters(rows)
+        return self._aggregate(rows, from_summary=False)
+
+    def _contact_mask(self, payments: pd.DataFrame, positions: np.ndarray) -> np.ndarray:
+        """Payments whose contact passes the contact filters, before any line expansion"""
+        dataset = self.dataset
+        contacts = dataset.contacts_df
+        allowed = np.ones(len(contacts), dtype=bool)
+        for column, values in self.contact_filters.items():
+            allowed &= contacts[column].isin(values).to_numpy()
+
+        selected = payments.iloc[positions]
+        is_opening = (selected['Invoice Number'] == OPENING_BALANCE).to_numpy()
+        contact_rows = np.full(len(selected), -1)
+        contact_rows[is_opening] = dataset.contact_index.lookup(selected['CustomerID'][is_opening])
+
+        invoice_pos = dataset.invoice_index.lookup(selected['Invoice Number'][~is_opening])
+        regular_rows = np.full(len(invoice_pos), -1)
+        has_invoice = invoice_pos >= 0
+        regular_rows[has_invoice] = dataset.contact_index.lookup(
+            pd.Series(dataset.invoice_index.customers[invoice_pos[has_invoice]]))
+        contact_rows[~is_opening] = regular_rows
+
+        return (contact_rows >= 0) & allowed[np.maximum(contact_rows, 0)]
+
+    def _apply_contact_filters(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Rows whose contact columns pass the contact filters"""
+        mask = np.ones(len(rows), dtype=bool)
+        for column, values in self.contact_filters.items():
+            mask &= rows[column].isin(values).to_numpy()
+        return rows[mask]
+
+    def _aggregate(self, rows: pd.DataFrame, from_summary: bool) -> pd.DataFrame:
+        """Group the rows by the requested dimensions, rounded as generate_summary rounds"""
+        measures = self.measures
+        decimals = self.dataset.strategy.decimals
+        if not self.by:
+            result = pd.DataFrame([rows[measures].sum().to_numpy()], columns=measures)
+            return result.round(decimals) if decimals is not None else result
+
+        dimensions = [dim for dim in self.by if dim != 'Month']
+        if 'Month' in self.by:
+            # Group on the period itself and label it afterwards
+            dimensions.append('Month' if from_summary else 'Period')
+
+        result = aggregate_by_codes(rows, dimensions=dimensions, measures=measures)
+        if decimals is not None:
+            result[measures] = result[measures].round(decimals)
+        if 'Period' in result.columns:
+            result['Period'] = result['Period'].astype(np.int32)
+            result = result.sort_values(['Period'], kind='stable', ignore_index=True)
+            result['Month'] = period_labels(result['Period'])
+            result = result.drop(columns='Period')
+        result = result.sort_values(self.by, kind='stable', ignore_index=True)
+        return result[self.by + measures]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Receivables and ageing for income summaries
+Outstanding balance per student from invoice totals, amounts applied to
+them and contact opening balances, bucketed by the age of each invoice
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Days since Invoice Date: 0-30, 31-60, 61-90 and over 90
+AGEING_BUCKETS = ['0-30 Days', '31-60 Days', '61-90 Days', '90+ Days']
+AGEING_EDGES = [31, 61, 91]
+
+RECEIVABLES_MEASURES = ['Opening Balance', 'Invoiced', 'Paid'] + AGEING_BUCKETS + ['Outstanding']
+RECEIVABLES_COLUMNS = ['Contact ID', 'Display Name', 'School', 'Grade', 'Section'] + RECEIVABLES_MEASURES
+
+
+def ageing_codes(invoice_dates: np.ndarray, as_of: pd.Timestamp) -> np.ndarray:
+    """
+    Ageing bucket of each invoice (position in AGEING_BUCKETS)
+
+    Invoices without a date are placed in the oldest bucket.
+    """
+    dates = pd.DatetimeIndex(invoice_dates)
+    days = (as_of - dates).days.to_numpy(dtype=np.float64, na_value=np.inf)
+    return np.digitize(days, AGEING_EDGES)
+
+
+def receivables_by_contact(invoice_contacts: np.ndarray, invoice_totals: np.ndarray,
+                           invoice_paid: np.ndarray, invoice_buckets: np.ndarray,
+                           opening_balances: np.ndarray, opening_paid: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Receivables measures per contact row, each a single bincount
+
+    Args:
+        invoice_contacts: Contact row of each invoice's customer (-1 skips the invoice)
+        invoice_totals: Invoice total
+        invoice_paid: Amount applied to each invoice
+        invoice_buckets: Ageing bucket of each invoice
+        opening_balances: Opening Balance of each contact row
+        opening_paid: Opening balance payments of each contact row
+
+    Returns:
+        Dict of RECEIVABLES_MEASURES, one value per contact row
+    """
+    n_contacts = len(opening_balances)
+    known = invoice_contacts >= 0
+    contacts, buckets = invoice_contacts[known], invoice_buckets[known]
+    outstanding = invoice_totals[known] - invoice_paid[known]
+
+    measures = {
+        'Opening Balance': opening_balances - opening_paid,
+        'Invoiced': np.bincount(contacts, weights=invoice_totals[known], minlength=n_contacts),
+        'Paid': np.bincount(contacts, weights=invoice_paid[known], minlength=n_contacts),
+    }
+    n_buckets = len(AGEING_BUCKETS)
+    aged = np.bincount(contacts * n_buckets + buckets, weights=outstanding,
+                       minlength=n_contacts * n_buckets).reshape(n_contacts, n_buckets)
+    for code, bucket in enumerate(AGEING_BUCKETS):
+        measures[bucket] = aged[:, code]
+    measures['Outstanding'] = measures['Opening Balance'] + aged.sum(axis=1)
+    return {name: values.astype(np.float64) for name, values in measures.items()}
+
+
+def receivables_frame(contacts: pd.DataFrame, contact_rows: np.ndarray,
+                      measures: Dict[str, np.ndarray], decimals: int = 2) -> pd.DataFrame:
+    """
+    One row per student with a balance, an invoice or an opening balance
+
+    Args:
+        contacts: Contacts with Contact ID, a name, School, Grade and Section
+        contact_rows: Rows of contacts to report (first row per Contact ID)
+        measures: Output of receivables_by_contact
+        decimals: Rounding of the amounts
+
+    Returns:
+        DataFrame with RECEIVABLES_COLUMNS
+    """
+    name_column = 'Display Name' if 'Display Name' in contacts.columns else 'Contact Name'
+    report = pd.DataFrame({
+        'Contact ID': contacts['Contact ID'].to_numpy()[contact_rows],
+        'Display Name': contacts[name_column].to_numpy()[contact_rows],
+    })
+    for column in ['School', 'Grade', 'Section']:
+        report[column] = contacts[column].iloc[contact_rows].to_numpy()
+    for name in RECEIVABLES_MEASURES:
+        report[name] = np.round(measures[name][contact_rows], decimals)
+
+    active = (report[['Opening Balance', 'Invoiced', 'Outstanding']] != 0).any(axis=1)
+    report = report[active.to_numpy()]
+    return report.sort_values(['School', 'Grade', 'Section', 'Display Name'],
+                              ignore_index=True)[RECEIVABLES_COLUMNS]
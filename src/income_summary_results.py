@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Result caches for income summaries
+An in-process LRU for generated summaries, with an optional on-disk tier
+so repeated filter combinations survive restarts and are shared by workers
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Hashable, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when summary construction changes so stale files on disk are ignored
+SUMMARY_CACHE_VERSION = 1
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache"""
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        """Whether key is cached, without counting a hit or refreshing its recency"""
+        with self._lock:
+            return key in self._items
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SummaryCache:
+    """
+    Two-tier cache of summary DataFrames
+
+    The memory tier is a bounded LRU. The disk tier stores Feather files
+    under cache_dir and is only used for keys whose first element is a data
+    fingerprint, since other keys are not stable across processes.
+    """
+
+    def __init__(self, max_size: int = 32, cache_dir: Optional[Path] = None):
+        self.memory = LRUCache(max_size)
+        self.cache_dir = Path(cache_dir) if cache_dir and feather is not None else None
+
+    def _path(self, key: tuple) -> Path:
+        digest = hashlib.sha1(f"v{SUMMARY_CACHE_VERSION}|{key!r}".encode()).hexdigest()
+        return self.cache_dir / f"{digest}.summary.arrow"
+
+    def _persistent(self, key: Hashable) -> bool:
+        return self.cache_dir is not None and isinstance(key, tuple) and key[0] is not None
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether key is cached in memory or on disk, without reading or counting it"""
+        return key in self.memory or (self._persistent(key) and self._path(key).exists())
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        """Cached frame for key, from memory or else from disk"""
+        frame = self.memory.get(key)
+        if frame is not None or not self._persistent(key):
+            return frame
+
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            frame = feather.read_feather(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable summary cache {path.name}: {str(e)}")
+            return None
+        self.memory.put(key, frame)
+        return frame
+
+    def put(self, key: Hashable, frame: pd.DataFrame):
+        """Store frame in memory and, for fingerprinted keys, on disk"""
+        self.memory.put(key, frame)
+        if not self._persistent(key):
+            return
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+            feather.write_feather(frame.reset_index(drop=True), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write summary cache: {str(e)}")
+
+    def clear_memory(self):
+        """Forget in-memory results (the disk tier is keyed by fingerprint)"""
+        self.memory.clear()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Student search for income summaries
+A trigram index over contact names, admission numbers and phone numbers,
+so a student can be found by any part of them without scanning every contact
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Contact columns searched, where present
+SEARCH_COLUMNS = ['Display Name', 'Contact Name', 'CF.Admission No / Reference code',
+                  'CF.Enrollment Code', 'Phone', 'MobilePhone', "CF.Father's Name",
+                  "CF.Father's Mobile Number", "CF.Mother's Name", "CF.Mother's Mobile Number"]
+
+# Contact columns shown for each match, where present
+STUDENT_COLUMNS = ['Contact ID', 'Display Name', 'School', 'Grade', 'Section',
+                   'CF.Admission No / Reference code', "CF.Father's Mobile Number"]
+
+# Columns of a student's invoice lines and payments, where present
+INVOICE_ACTIVITY_COLUMNS = ['Invoice Date', 'Invoice Number', 'Invoice Status', 'Item Name',
+                            'Item Total', 'Balance']
+PAYMENT_ACTIVITY_COLUMNS = ['Date', 'Payment Number', 'Mode', 'Invoice Number', 'Amount',
+                            'Amount Applied to Invoice']
+
+# Separates the fields of a contact; never part of a normalized query
+SEPARATOR = '|'
+
+
+def normalize_text(values: pd.Series) -> pd.Series:
+    """
+    Lower-case letters and digits only, so '98765 43210' and '+91-9876543210'
+    or 'Riya S.' and 'riya s' compare equal as substrings
+
+    Whole-number floats (phone numbers read as numbers) lose their '.0'.
+    """
+    text = values.astype(object).where(values.notna(), '').astype(str)
+    if pd.api.types.is_float_dtype(values.dtype):
+        text = text.str.replace(r'\.0$', '', regex=True)
+    return text.str.lower().str.replace(r'[\W_]+', '', regex=True)
+
+
+def trigrams(data: bytes) -> np.ndarray:
+    """24-bit code of every three consecutive bytes"""
+    codes = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    return (codes[:-2] << 16) | (codes[1:-1] << 8) | codes[2:]
+
+
+class StudentSearchIndex:
+    """
+    Inverted index from byte trigrams to contact rows in a CSR layout
+
+    Rows containing trigram keys[i] are rows[offsets[i]:offsets[i + 1]].
+    A query is answered by intersecting the posting lists of its trigrams
+    and confirming the few candidates with a substring match.
+    """
+
+    def __init__(self, contacts: pd.DataFrame, contact_rows: np.ndarray,
+                 columns: Optional[List[str]] = None):
+        """
+        Args:
+            contacts: Contacts to search
+            contact_rows: Rows of contacts to index (e.g. first row per Contact ID)
+            columns: Columns to search, defaults to SEARCH_COLUMNS
+        """
+        columns = [col for col in (columns or SEARCH_COLUMNS) if col in contacts.columns]
+        self.contact_rows = np.asarray(contact_rows, dtype=np.int64)
+        subset = contacts.iloc[self.contact_rows]
+        texts = pd.Series('', index=subset.index, dtype=str)
+        for position, col in enumerate(columns):
+            field = normalize_text(subset[col])
+            texts = field if position == 0 else texts + SEPARATOR + field
+        self.texts = texts.astype(str).reset_index(drop=True)
+        names = subset['Display Name'] if 'Display Name' in subset.columns else texts
+        self.names = normalize_text(names).astype(str).reset_index(drop=True)
+
+        # Every trigram of every row, skipping those across fields or rows
+        encoded = [text.encode('utf-8') + SEPARATOR.encode() for text in self.texts.to_numpy()]
+        data = b''.join(encoded)
+        n_rows = len(encoded)
+        lengths = [len(text) for text in encoded]
+        position_rows = np.repeat(np.arange(n_rows), lengths)[:max(len(data) - 2, 0)]
+        codes = trigrams(data)
+        separator = ord(SEPARATOR)
+        within = ~(((codes >> 16) == separator) | (((codes >> 8) & 0xFF) == separator) |
+                   ((codes & 0xFF) == separator))
+
+        # Distinct (trigram, row) pairs, sorted by trigram and then row
+        n_keys = max(n_rows, 1)
+        pairs = np.sort(codes[within] * n_keys + position_rows[within])
+        pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])] if len(pairs) else pairs
+        pair_codes, self.rows = pairs // n_keys, pairs % n_keys
+        starts = np.flatnonzero(np.concatenate([[True], pair_codes[1:] != pair_codes[:-1]])
+                                if len(pairs) else np.zeros(0, dtype=bool))
+        self.keys = pair_codes[starts]
+        self.offsets = np.concatenate([starts, [len(pairs)]]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _postings(self, code: int) -> np.ndarray:
+        position = np.searchsorted(self.keys, code)
+        if position == len(self.keys) or self.keys[position] != code:
+            return np.zeros(0, dtype=np.int64)
+        return self.rows[self.offsets[position]:self.offsets[position + 1]]
+
+    def search(self, query: str, limit: Optional[int] = 20) -> np.ndarray:
+        """
+        Contact rows whose searched columns contain the query
+
+        Matches whose Display Name starts with the query come first, then
+        the rest, each by name.
+
+        Args:
+            query: Part of a name, admission number or phone number
+            limit: Maximum number of matches (None for all)
+
+        Returns:
+            Rows of the contacts the index was built from
+        """
+        needle = normalize_text(pd.Series([query])).iloc[0]
+        if not needle:
+            return np.zeros(0, dtype=np.int64)
+
+        encoded = needle.encode('utf-8')
+        if len(encoded) < 3:
+            candidates = np.arange(len(self))
+        else:
+            # Smallest posting lists first, so the intersection shrinks fast
+            postings = sorted((self._postings(code) for code in np.unique(trigrams(encoded))), key=len)
+            candidates = postings[0]
+            for rows in postings[1:]:
+                if len(candidates) == 0:
+                    break
+                candidates = np.intersect1d(candidates, rows, assume_unique=True)
+
+        # Trigrams can all match without the query appearing in one piece
+        found = self.texts.take(candidates).str.contains(needle, regex=False)
+        matches = candidates[found.to_numpy(dtype=bool)]
+        names = self.names.take(matches)
+        order = np.lexsort((names.to_numpy(dtype=object),
+                            ~names.str.startswith(needle).to_numpy(dtype=bool)))
+        return self.contact_rows[matches[order][:limit]]
+
+
+def student_matches(contacts: pd.DataFrame, rows: np.ndarray) -> pd.DataFrame:
+    """STUDENT_COLUMNS of the matched contact rows"""
+    columns = [col for col in STUDENT_COLUMNS if col in contacts.columns]
+    return contacts.iloc[rows][columns].reset_index(drop=True)
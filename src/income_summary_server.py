@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Income Summary HTTP Service
+Keeps the loaded and indexed data warm in memory and serves summaries as
+JSON, CSV or Parquet, reloading the inputs in the background when they change
+"""
+
+import argparse
+import io
+import json
+import logging
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.income_summary_cache import fingerprint_inputs
+from src.income_summary_processor_v2 import IncomeSummaryProcessorV2
+from src.income_summary_results import LRUCache
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Query parameters accepted by /summary and how they are parsed
+FILTER_PARAMS = {'school': str, 'month': str, 'year': int, 'fiscal_year': int}
+
+
+class ReportService:
+    """
+    Warm processor plus rendered-response cache shared by all request threads
+
+    Requests read the current processor; a background thread watches the
+    input files and swaps in a freshly loaded processor when they change,
+    so requests never wait for a reload.
+    """
+
+    def __init__(self, base_path: Path = None, contacts=None, invoices=None, payments=None,
+                 cache_size: int = 128, reload_interval: float = 5.0,
+                 cache_dir: Optional[Path] = None):
+        self.base_path = Path(base_path or Path.cwd())
+        input_path = self.base_path / 'data' / 'input'
+        self.sources = {
+            'contacts': contacts or input_path / 'student_contacts.csv',
+            'invoices': invoices or input_path / 'student_invoices.csv',
+            'payments': payments or input_path / 'student_payment.csv',
+        }
+        self.cache_dir = cache_dir
+        self.reload_interval = reload_interval
+        self.results = LRUCache(cache_size)
+
+        self.processor = None
+        self.load_error = None
+        self.fingerprint = None
+        self.generation = 0
+        self._swap_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def _fingerprint(self) -> str:
+        """Fingerprint of the current input files"""
+        return fingerprint_inputs(*self.sources.values())
+
+    def load(self) -> bool:
+        """Load the inputs into a new processor and make it current"""
+        fingerprint = self._fingerprint()
+        processor = IncomeSummaryProcessorV2(self.base_path, cache_dir=self.cache_dir)
+        if not processor.load_data(**self.sources):
+            self.load_error = processor.load_error
+            return False
+
+        # Build the indexes before the processor serves requests
+        processor.invoice_index
+        processor.contact_index
+
+        with self._swap_lock:
+            self.processor = processor
+            self.fingerprint = fingerprint
+            self.generation += 1
+            self.results.clear()
+        logger.info(f"Serving data generation {self.generation}")
+        return True
+
+    def start_watcher(self):
+        """Poll the input files and reload in the background when they change"""
+        if self.reload_interval <= 0 or self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop.wait(self.reload_interval):
+                try:
+                    if self._fingerprint() != self.fingerprint:
+                        logger.info("Input files changed; reloading")
+                        self.load()
+                except Exception as e:
+                    logger.warning(f"Background reload failed: {str(e)}")
+
+        self._watcher = threading.Thread(target=watch, name='summary-reload', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """Stop the background watcher"""
+        self._stop.set()
+
+    def _current(self):
+        """Processor and data generation, read together"""
+        with self._swap_lock:
+            processor, generation = self.processor, self.generation
+        if processor is None:
+            raise RuntimeError("Data not loaded")
+        return processor, generation
+
+    def summary(self, school: Optional[str] = None, month: Optional[str] = None,
+                year: Optional[int] = None, fiscal_year: Optional[int] = None) -> pd.DataFrame:
+        """Summary for the filters (memoized by the processor)"""
+        processor, _ = self._current()
+        return processor.generate_summary(month=month, year=year, fiscal_year=fiscal_year,
+                                          school=school)
+
+    def body(self, fmt: str = 'json', school: Optional[str] = None, month: Optional[str] = None,
+             year: Optional[int] = None, fiscal_year: Optional[int] = None) -> bytes:
+        """Serialized summary, cached so repeated requests skip rendering too"""
+        processor, generation = self._current()
+        key = (generation, fmt, school, month, year, fiscal_year)
+        body = self.results.get(key)
+        if body is None:
+            summary = processor.generate_summary(month=month, year=year, fiscal_year=fiscal_year,
+                                                 school=school)
+            body = render(summary, fmt)
+            self.results.put(key, body)
+        return body
+
+    def status(self) -> Dict:
+        """Health information for /health"""
+        processor = self.processor
+        return {
+            'loaded': processor is not None,
+            'generation': self.generation,
+            'payments': 0 if processor is None else len(processor.payments_df),
+            'cached_results': len(self.results),
+            'cache_hits': self.results.hits,
+            'cache_misses': self.results.misses,
+        }
+
+
+def render(summary: pd.DataFrame, fmt: str) -> bytes:
+    """Serialize a summary as JSON, CSV or Parquet"""
+    if fmt == 'json':
+        records = summary.astype({'Grade': object, 'Section': object, 'School': object,
+                                  'Month': str}).to_dict(orient='records')
+        return json.dumps(records).encode()
+    if fmt == 'csv':
+        return summary.to_csv(index=False).encode('utf-8')
+    if fmt == 'parquet':
+        buffer = io.BytesIO()
+        summary.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def parse_filters(query: str) -> Tuple[Dict, str]:
+    """Filters and output format from a /summary query string"""
+    params = {key: values[-1] for key, values in parse_qs(query).items() if values[-1]}
+    fmt = params.pop('format', 'json').lower()
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"format must be one of {', '.join(CONTENT_TYPES)}")
+
+    filters = {}
+    for name, parse in FILTER_PARAMS.items():
+        if name in params:
+            try:
+                filters[name] = parse(params[name])
+            except ValueError:
+                raise ValueError(f"Invalid value for {name}: {params[name]}")
+    if 'month' in filters:
+        filters['month'] = filters['month'].capitalize()
+    return filters, fmt
+
+
+class SummaryRequestHandler(BaseHTTPRequestHandler):
+    """Routes /summary and /health to the shared ReportService"""
+
+    service: ReportService = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == '/health':
+                self._send(200, json.dumps(self.service.status()).encode(), 'application/json')
+            elif url.path == '/summary':
+                filters, fmt = parse_filters(url.query)
+                self._send(200, self.service.body(fmt, **filters), CONTENT_TYPES[fmt])
+            else:
+                self._send_error(404, f"Unknown path: {url.path}")
+        except ValueError as e:
+            self._send_error(400, str(e))
+        except ImportError as e:
+            # Parquet output needs pyarrow
+            self._send_error(501, str(e))
+        except Exception as e:
+            logger.error(f"Error serving {self.path}: {str(e)}")
+            self._send_error(500, str(e))
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        self._send(status, json.dumps({'error': message}).encode(), 'application/json')
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def make_server(service: ReportService, host: str = '127.0.0.1', port: int = 8000) -> ThreadingHTTPServer:
+    """HTTP server that handles each request in its own thread"""
+    handler = type('BoundSummaryRequestHandler', (SummaryRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args(argv=None):
+    """Parse server options"""
+    parser = argparse.ArgumentParser(description="Excel Group - Income Summary HTTP service")
+    help_text = "CSV file, glob pattern or directory of exports (may be repeated)"
+    parser.add_argument('--contacts', action='append', help=help_text)
+    parser.add_argument('--invoices', action='append', help=help_text)
+    parser.add_argument('--payments', action='append', help=help_text)
+    parser.add_argument('--base-path', type=Path, default=Path.cwd(),
+                        help="Directory containing data/input")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--cache-size', type=int, default=128,
+                        help="Number of summaries kept in the result cache")
+    parser.add_argument('--reload-interval', type=float, default=5.0,
+                        help="Seconds between input change checks (0 disables reloading)")
+    parser.add_argument('--cache-dir', type=Path,
+                        help="Directory for the memory-mapped cache of cleaned inputs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    service = ReportService(args.base_path, contacts=args.contacts, invoices=args.invoices,
+                            payments=args.payments, cache_size=args.cache_size,
+                            reload_interval=args.reload_interval, cache_dir=args.cache_dir)
+    if not service.load():
+        print("Failed to load data files")
+        return 1
+    service.start_watcher()
+
+    server = make_server(service, args.host, args.port)
+    print(f"Serving income summaries on http://{args.host}:{server.server_port}/summary")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Synthetic ZOHO Books exports for tests and benchmarks
+Generates contacts, invoices and payments with the same columns as the real
+exports, at any scale, without touching student data
+"""
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from typing import Dict
+
+SCHOOLS = ['Excel Global School', 'Excel Central School', 'Excel Pathway School']
+SCHOOL_CODES = {'Excel Global School': 'G', 'Excel Central School': 'C', 'Excel Pathway School': 'P'}
+GRADES = ['Pre-KG', 'LKG', 'UKG'] + [f"Grade {i:02d}" for i in range(1, 13)]
+SECTIONS = ['A', 'B', 'C', 'D', 'Blue', 'Green']
+MODES = ['Cash', 'UPI', 'Bank Transfer', 'Cheque']
+DEPOSIT_ACCOUNTS = ['Undeposited Funds', 'Petty Cash', 'HDFC Bank', 'Federal Bank']
+
+# (item suffix, month offset from the start of the academic year, share of annual fee)
+FEE_SCHEDULE = [
+    ('Initial Academic Fee', 0, 0.40),
+    ('Term I Fee (June)', 2, 0.22),
+    ('Term II Fee (Sept)', 5, 0.20),
+    ('Term III Fee (Jan)', 9, 0.18),
+]
+OTHER_ITEM = 'Transport Fee'
+
+
+def _fee_item_name(school: str, grade: str, suffix: str, fiscal_year: int) -> str:
+    """Fee item name in the style of fee_items.csv"""
+    short_grade = grade.replace('Grade ', '')
+    return (f"E{SCHOOL_CODES[school]}S {short_grade} - {suffix} - "
+            f"{fiscal_year}-{fiscal_year + 1}")
+
+
+def make_fee_items(fiscal_year: int = 2025) -> pd.DataFrame:
+    """Fee items reference with a rate per school, grade and item"""
+    rows = []
+    for school in SCHOOLS:
+        for grade_index, grade in enumerate(GRADES):
+            annual_fee = 40000 + 2500 * grade_index + 5000 * SCHOOLS.index(school)
+            for suffix, _, share in FEE_SCHEDULE:
+                category = 'Initial Fee' if 'Initial' in suffix else 'Term Fee'
+                rows.append({
+                    'Item Name': _fee_item_name(school, grade, suffix, fiscal_year),
+                    'SKU': f"{fiscal_year % 100}{SCHOOL_CODES[school]}-{grade_index:02d}-{suffix[:7]}",
+                    'Description': suffix,
+                    'Rate': f"INR {round(annual_fee * share, -2):.2f}",
+                    'School': school,
+                    'Grade': grade,
+                    'CF.Fee Category': category
+                })
+    fee_items = pd.DataFrame(rows)
+    fee_items.insert(0, 'No', np.arange(1, len(fee_items) + 1))
+    return fee_items
+
+
+def make_synthetic_data(n_students: int = 200, fiscal_year: int = 2025, years: int = 1,
+                        seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Generate a consistent set of contacts, invoices, payments and fee items
+
+    Args:
+        n_students: Number of student contacts
+        fiscal_year: First academic year (April - March)
+        years: Number of consecutive academic years to invoice
+        seed: Random seed
+
+    Returns:
+        Dict with contacts_df, invoices_df, payments_df and fee_items_df
+    """
+    rng = np.random.default_rng(seed)
+    fee_items = pd.concat([make_fee_items(fiscal_year + y) for y in range(years)],
+                          ignore_index=True)
+    rates = fee_items.set_index('Item Name')['Rate'].str.replace('INR', '').astype(float)
+
+    # Contacts
+    contact_ids = (2570219000000100000 + np.arange(n_students) * 7).astype(str)
+    schools = rng.choice(SCHOOLS, n_students, p=[0.3, 0.5, 0.2])
+    grades = rng.choice(GRADES, n_students)
+    sections = rng.choice(SECTIONS, n_students)
+    names = np.char.add('Student ', np.arange(n_students).astype(str))
+    opening_balance = np.where(rng.random(n_students) < 0.4,
+                               rng.integers(10, 400, n_students) * 100.0, 0.0)
+    contacts = pd.DataFrame({
+        'Created Time': f"{fiscal_year}-03-15 09:00:00",
+        'Last Modified Time': f"{fiscal_year}-03-20 09:00:00",
+        'Display Name': names,
+        'Company Name': schools,
+        'Phone': (9000000000 + rng.integers(0, 99999999, n_students)).astype(str),
+        'Status': 'Active',
+        'Opening Balance': opening_balance,
+        'Location Name': schools,
+        'Contact ID': contact_ids,
+        'Contact Name': names,
+        'Contact Type': 'customer',
+        'School': schools,
+        'Grade': grades,
+        'Section': sections,
+        'CF.Admission No / Reference code': np.char.add('ADM', np.arange(10000, 10000 + n_students).astype(str)),
+        'CF.Gender': rng.choice(['Male', 'Female'], n_students),
+        "CF.Father's Name": np.char.add('Parent ', np.arange(n_students).astype(str)),
+        "CF.Father's Mobile Number": (8000000000 + rng.integers(0, 99999999, n_students)).astype(str),
+    })
+
+    # Invoices: one per student per fee instalment, plus transport lines
+    invoice_rows, line_rows = [], []
+    schedule = [(y, suffix, offset) for y in range(years) for suffix, offset, _ in FEE_SCHEDULE]
+    students = np.arange(n_students)
+    for number, (y, suffix, offset) in enumerate(schedule):
+        start = pd.Timestamp(year=fiscal_year + y, month=4, day=1) + pd.DateOffset(months=offset)
+        invoice_dates = start + pd.to_timedelta(rng.integers(0, 10, n_students), unit='D')
+        invoice_numbers = np.char.add(
+            np.char.add('INV-', np.array([SCHOOL_CODES[s] for s in schools])),
+            np.char.add('-', np.char.zfill((number * n_students + students + 1).astype(str), 6))
+        )
+        item_names = np.array([_fee_item_name(schools[i], grades[i], suffix, fiscal_year + y)
+                               for i in students])
+        frame = pd.DataFrame({
+            'Invoice Date': invoice_dates,
+            'Invoice Number': invoice_numbers,
+            'Customer ID': contact_ids,
+            'Customer Name': names,
+            'Location Name': schools,
+        })
+        invoice_rows.append(frame)
+        line_rows.append(frame.assign(**{'Item Name': item_names,
+                                         'Item Total': rates.reindex(item_names).to_numpy()}))
+        has_transport = rng.random(n_students) < 0.25
+        line_rows.append(frame[has_transport].assign(**{'Item Name': OTHER_ITEM,
+                                                        'Item Total': 3000.0}))
+
+    invoices = pd.concat(line_rows, ignore_index=True).sort_values(
+        ['Invoice Date', 'Invoice Number'], kind='stable', ignore_index=True)
+    totals = invoices.groupby('Invoice Number')['Item Total'].transform('sum')
+    invoices.insert(1, 'Invoice ID', (1000000000000 + invoices.groupby(
+        'Invoice Number', sort=False).ngroup()).astype(str))
+    invoices.insert(3, 'Invoice Status', 'Paid')
+    invoices['Total'] = totals
+    invoices['Balance'] = 0.0
+
+    # Payments: most invoices paid in one or two instalments, some left unpaid
+    headers = pd.concat(invoice_rows, ignore_index=True)
+    headers['Invoice Total'] = headers['Invoice Number'].map(
+        invoices.groupby('Invoice Number')['Item Total'].sum())
+    headers = headers[rng.random(len(headers)) < 0.9].reset_index(drop=True)
+    instalments = rng.integers(1, 3, len(headers))
+    payments = headers.loc[headers.index.repeat(instalments)].reset_index(drop=True)
+    payments['Instalments'] = np.repeat(instalments, instalments)
+    payments['Amount'] = (payments['Invoice Total'] / payments['Instalments']).round(2)
+    payments['Date'] = payments['Invoice Date'] + pd.to_timedelta(
+        rng.integers(0, 45, len(payments)), unit='D')
+
+    # Opening balances cleared early in the first academic year
+    owing = np.flatnonzero(opening_balance > 0)
+    opening = pd.DataFrame({
+        'Invoice Number': 'Customer opening balance',
+        'Customer ID': contact_ids[owing],
+        'Customer Name': names[owing],
+        'Location Name': schools[owing],
+        'Amount': opening_balance[owing],
+        'Invoice Date': pd.Timestamp(year=fiscal_year, month=3, day=31),
+        'Date': pd.Timestamp(year=fiscal_year, month=4, day=1) + pd.to_timedelta(
+            rng.integers(0, 90, len(owing)), unit='D'),
+    })
+
+    payments = pd.concat([payments, opening], ignore_index=True)
+    payments = payments.sort_values('Date', kind='stable', ignore_index=True)
+    n_payments = len(payments)
+    payments = pd.DataFrame({
+        'Payment Number': np.arange(1, n_payments + 1).astype(str),
+        'CustomerPayment ID': (2570219000001000000 + np.arange(n_payments) * 3).astype(str),
+        'Mode': rng.choice(MODES, n_payments, p=[0.7, 0.2, 0.05, 0.05]),
+        'CustomerID': payments['Customer ID'].to_numpy(),
+        'Amount': payments['Amount'].to_numpy(),
+        'Customer Name': payments['Customer Name'].to_numpy(),
+        'Payment Type': 'Invoice Payment',
+        'Location Name': payments['Location Name'].to_numpy(),
+        'Date': payments['Date'].dt.normalize().to_numpy(),
+        'Created Time': (payments['Date'] + pd.to_timedelta(
+            rng.integers(0, 7 * 24 * 3600, n_payments), unit='s')).to_numpy(),
+        'Deposit To': rng.choice(DEPOSIT_ACCOUNTS, n_payments),
+        'InvoicePayment ID': (2570219000002000000 + np.arange(n_payments) * 3).astype(str),
+        'Amount Applied to Invoice': payments['Amount'].to_numpy(),
+        'Invoice Number': payments['Invoice Number'].to_numpy(),
+        'Invoice Date': payments['Invoice Date'].to_numpy(),
+    })
+
+    return {
+        'contacts_df': contacts,
+        'invoices_df': invoices,
+        'payments_df': payments,
+        'fee_items_df': fee_items,
+    }
+
+
+def write_synthetic_data(base_path: Path, **kwargs) -> Path:
+    """Write synthetic exports to base_path/data in the standard layout"""
+    data = make_synthetic_data(**kwargs)
+    input_path = Path(base_path) / 'data' / 'input'
+    reference_path = Path(base_path) / 'data' / 'reference'
+    input_path.mkdir(parents=True, exist_ok=True)
+    reference_path.mkdir(parents=True, exist_ok=True)
+
+    data['contacts_df'].to_csv(input_path / 'student_contacts.csv', index=False)
+    data['invoices_df'].to_csv(input_path / 'student_invoices.csv', index=False)
+    data['payments_df'].to_csv(input_path / 'student_payment.csv', index=False)
+    data['fee_items_df'].to_csv(reference_path / 'fee_items.csv', index=False)
+    return Path(base_path) / 'data'
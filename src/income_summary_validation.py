@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Validation and reconciliation for income summaries
+Classifies payments that cannot be attributed to an invoice line or a
+student, and reconciles the summary against the raw payments per school
+and month
+"""
+
+import logging
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.income_summary_periods import period_labels
+
+logger = logging.getLogger(__name__)
+
+# Issue types, in the order they are checked
+INVOICE_NOT_FOUND = 'Invoice not found'
+CUSTOMER_NOT_FOUND = 'Customer not found'
+ZERO_INVOICE_TOTAL = 'Invoice total is zero'
+OPENING_CUSTOMER_NOT_FOUND = 'Opening balance customer not found'
+ISSUE_TYPES = [INVOICE_NOT_FOUND, CUSTOMER_NOT_FOUND, ZERO_INVOICE_TOTAL,
+               OPENING_CUSTOMER_NOT_FOUND]
+
+# Payment columns kept in the exported issue rows
+ISSUE_COLUMNS = ['Date', 'Payment Number', 'CustomerID', 'Customer Name', 'Invoice Number',
+                 'Amount', 'Amount Applied to Invoice', 'InvoicePayment ID', 'CustomerPayment ID']
+
+RECONCILIATION_MEASURES = ['Payments', 'Summarized', 'Dropped', 'Other Items', 'Difference']
+
+
+def classify_payments(invoice_pos: np.ndarray, contact_rows: np.ndarray,
+                      invoice_totals: np.ndarray) -> np.ndarray:
+    """
+    Issue of each regular payment from its index lookups (None when valid)
+
+    Args:
+        invoice_pos: Invoice position per payment (-1 when unknown)
+        contact_rows: Contact row of the invoice customer (-1 when unknown)
+        invoice_totals: Sum of Item Total per invoice
+    """
+    has_invoice = invoice_pos >= 0
+    zero_total = has_invoice & (invoice_totals[np.maximum(invoice_pos, 0)] == 0)
+    return np.select([~has_invoice, contact_rows < 0, zero_total],
+                     [INVOICE_NOT_FOUND, CUSTOMER_NOT_FOUND, ZERO_INVOICE_TOTAL], default=None)
+
+
+def issue_rows(payments: pd.DataFrame, issues: np.ndarray, dropped: np.ndarray) -> pd.DataFrame:
+    """
+    Payments with an issue, for review or export
+
+    Args:
+        payments: Payment rows the issues refer to
+        issues: Issue per row (None when valid)
+        dropped: Whether the row was left out of the summary
+    """
+    has_issue = pd.notna(issues)
+    columns = [col for col in ISSUE_COLUMNS if col in payments.columns]
+    rows = payments.loc[has_issue, columns].copy()
+    rows.insert(0, 'Issue', issues[has_issue])
+    rows['Dropped'] = np.asarray(dropped, dtype=bool)[has_issue]
+    rows['Payment Row'] = payments.index.to_numpy()[has_issue]
+    return rows
+
+
+def log_issues(issues: pd.DataFrame):
+    """One warning per issue type, with a few example invoice numbers or IDs"""
+    for issue, rows in issues.groupby('Issue', sort=False):
+        column = 'Invoice Number' if issue == INVOICE_NOT_FOUND else 'CustomerID'
+        examples = ', '.join(rows[column].astype(str).unique()[:10])
+        action = 'dropped' if rows['Dropped'].all() else 'kept'
+        logger.warning(f"{issue} for {len(rows)} payments ({action}): {examples}")
+
+
+def totals_by_school_month(schools: pd.Series, periods: np.ndarray,
+                           measures: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Sum measures per school and month with one bincount each
+
+    Schools are taken by their categorical codes and months by their offset
+    from the earliest month, so the key needs neither sorting nor hashing.
+    Missing schools are reported as 'Unknown'.
+    """
+    schools = schools.astype('category')
+    school_codes = schools.cat.codes.to_numpy(dtype=np.int64) + 1
+    periods = np.asarray(periods, dtype=np.int64)
+    months = (periods // 100) * 12 + periods % 100
+    first = months.min() if len(months) else 0
+    span = (months.max() - first + 1) if len(months) else 1
+
+    keys = school_codes * span + (months - first)
+    n_keys = (len(schools.cat.categories) + 1) * span
+    observed = np.flatnonzero(np.bincount(keys, minlength=n_keys))
+
+    names = np.concatenate([['Unknown'], schools.cat.categories.astype(object)])
+    observed_months = observed % span + first
+    result = pd.DataFrame({
+        'School': names[observed // span],
+        'Period': np.where(observed_months > 0,
+                           (observed_months - 1) // 12 * 100 + (observed_months - 1) % 12 + 1, 0),
+    })
+    for name, values in measures.items():
+        result[name] = np.bincount(keys, weights=values, minlength=n_keys)[observed].astype(np.float64)
+    # A school named 'Unknown' and missing schools are one group
+    if 'Unknown' in schools.cat.categories:
+        result = result.groupby(['School', 'Period'], as_index=False, sort=False).sum()
+    return result
+
+
+def reconcile(payments: pd.DataFrame, summary: pd.DataFrame, measures: List[str],
+              decimals: int = 2) -> pd.DataFrame:
+    """
+    Compare the summary with the raw payments per school and month
+
+    Payments = Summarized + Dropped + Other Items + Difference, so a
+    non-zero Difference points at amounts the summary gained or lost
+    without a recorded reason.
+
+    Args:
+        payments: One row per payment with School, Period, Payments,
+            Dropped and Other Items
+        summary: Summary rows with School, Period and the measures
+        measures: Summary measures that add up to the summarized amount
+        decimals: Rounding of the result
+
+    Returns:
+        DataFrame with School, Month, Period and RECONCILIATION_MEASURES
+    """
+    raw = totals_by_school_month(
+        payments['School'], payments['Period'].to_numpy(),
+        {name: payments[name].to_numpy(dtype=np.float64)
+         for name in ['Payments', 'Dropped', 'Other Items']})
+    summarized = totals_by_school_month(
+        summary['School'], summary['Period'].to_numpy(),
+        {'Summarized': summary[measures].sum(axis=1, min_count=1).fillna(0).to_numpy()})
+
+    result = raw.merge(summarized, on=['School', 'Period'], how='outer').fillna(
+        {name: 0.0 for name in ['Payments', 'Dropped', 'Other Items', 'Summarized']})
+    result['Difference'] = (result['Payments'] - result['Summarized'] -
+                            result['Dropped'] - result['Other Items'])
+    result[RECONCILIATION_MEASURES] = result[RECONCILIATION_MEASURES].round(decimals)
+
+    result = result.sort_values(['School', 'Period'], ignore_index=True)
+    result['Month'] = period_labels(result['Period']).astype(object)
+    return result[['School', 'Month', 'Period'] + RECONCILIATION_MEASURES]
+
+
+def summarize_validation(validation: Dict[str, pd.DataFrame]) -> Dict:
+    """Headline numbers for a validation result"""
+    issues, reconciliation = validation['issues'], validation['reconciliation']
+    return {
+        'issues': issues['Issue'].value_counts().to_dict(),
+        'dropped_amount': float(reconciliation['Dropped'].sum()),
+        'other_items_amount': float(reconciliation['Other Items'].sum()),
+        'unexplained_difference': float(reconciliation['Difference'].abs().sum()),
+    }
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Partitioned Parquet warehouse for income summary inputs
+Cleaned exports are stored as Hive-partitioned Parquet datasets
+(school=/year=/month=) so a report for one school or month reads only
+its partitions instead of every CSV byte
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional
+    pa = None
+    ds = None
+    pq = None
+
+from src.income_summary_periods import (
+    DEFAULT_FISCAL_YEAR_START, fiscal_year_range, month_number
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so old warehouses are rejected
+WAREHOUSE_VERSION = 1
+
+# Partition columns of each dataset; payments by payment month, invoices by invoice month
+PARTITIONS = {
+    'contacts': ['school'],
+    'invoices': ['school', 'year', 'month'],
+    'payments': ['school', 'year', 'month'],
+}
+PARTITION_TYPES = {'school': 'string', 'year': 'int32', 'month': 'int32'}
+
+# Position of each row in the export, so reads restore export order
+ROW_COLUMN = '__row'
+
+MANIFEST = 'manifest.json'
+
+
+def require_pyarrow():
+    """Raise a helpful error when pyarrow is not installed"""
+    if pa is None:
+        raise ImportError("The Parquet warehouse needs pyarrow: pip install pyarrow")
+
+
+def _partitioning(kind: str) -> 'ds.Partitioning':
+    fields = [pa.field(name, PARTITION_TYPES[name]) for name in PARTITIONS[kind]]
+    return ds.partitioning(pa.schema(fields), flavor='hive')
+
+
+def _year_month(dates: pd.Series) -> Dict[str, np.ndarray]:
+    periods = (dates.dt.year * 100 + dates.dt.month).fillna(0).to_numpy(dtype=np.int32)
+    return {'year': periods // 100, 'month': periods % 100}
+
+
+def write_warehouse(warehouse_dir: Path, frames: Dict[str, Optional[pd.DataFrame]],
+                    schools: Dict[str, np.ndarray], metadata: Optional[Dict] = None) -> Path:
+    """
+    Write cleaned inputs as partitioned Parquet datasets
+
+    Each dataset is written next to the old one, the old one is renamed
+    aside, the new one renamed into place and only then is the old one
+    deleted. A reader never sees a half-written dataset; a directory cannot
+    be exchanged in one rename, so only for the instant between the two
+    renames is the dataset missing. The manifest is written last.
+
+    Args:
+        warehouse_dir: Root directory of the warehouse
+        frames: Cleaned 'contacts', 'invoices', 'payments' and optional 'fee_items'
+        schools: School partition of every contact, invoice line and payment row
+        metadata: Extra values stored in the manifest (e.g. the source fingerprint)
+
+    Returns:
+        Path of the manifest
+    """
+    require_pyarrow()
+    warehouse_dir = Path(warehouse_dir)
+    warehouse_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = {}
+    for kind, partition_cols in PARTITIONS.items():
+        frame = frames[kind].reset_index(drop=True)
+        partitions = {'school': np.asarray(schools[kind], dtype=object)}
+        if 'year' in partition_cols:
+            date_column = 'Date' if kind == 'payments' else 'Invoice Date'
+            partitions.update(_year_month(frame[date_column]))
+        frame = frame.assign(**{ROW_COLUMN: np.arange(len(frame))}, **partitions)
+
+        tmp_dir = warehouse_dir / f"{kind}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        ds.write_dataset(pa.Table.from_pandas(frame, preserve_index=False), tmp_dir,
+                         format='parquet', partitioning=_partitioning(kind),
+                         existing_data_behavior='overwrite_or_ignore')
+        target, old_dir = warehouse_dir / kind, warehouse_dir / f"{kind}.{os.getpid()}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if target.exists():
+            os.replace(target, old_dir)
+        os.replace(tmp_dir, target)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        rows[kind] = len(frame)
+
+    fee_items = frames.get('fee_items')
+    if fee_items is not None:
+        fee_items_path = warehouse_dir / 'fee_items.parquet'
+        tmp_fee_items = fee_items_path.with_suffix(f'.{os.getpid()}.tmp')
+        pq.write_table(pa.Table.from_pandas(fee_items, preserve_index=False), tmp_fee_items)
+        os.replace(tmp_fee_items, fee_items_path)
+
+    manifest = {
+        'version': WAREHOUSE_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'rows': rows,
+        'fee_items': fee_items is not None,
+        'metadata': metadata or {},
+    }
+    manifest_path = warehouse_dir / MANIFEST
+    tmp_manifest = manifest_path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp_manifest.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_manifest, manifest_path)
+    logger.info(f"Wrote {rows['payments']} payments, {rows['invoices']} invoice lines and "
+                f"{rows['contacts']} contacts to {warehouse_dir}")
+    return manifest_path
+
+
+def read_manifest(warehouse_dir: Path) -> Dict:
+    """Manifest of a warehouse written by write_warehouse"""
+    manifest_path = Path(warehouse_dir) / MANIFEST
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"No warehouse found in {warehouse_dir}; ingest the exports first")
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get('version') != WAREHOUSE_VERSION:
+        raise ValueError(f"Warehouse in {warehouse_dir} was written by another version; "
+                         f"ingest the exports again")
+    return manifest
+
+
+def partition_filter(kind: str, school: Optional[str] = None,
+                     month: Optional[Union[str, int]] = None, year: Optional[int] = None,
+                     fiscal_year: Optional[int] = None,
+                     fiscal_year_start: int = DEFAULT_FISCAL_YEAR_START) -> Optional['ds.Expression']:
+    """
+    Partition expression selecting the filters (None selects everything)
+
+    Period filters apply to datasets partitioned by month and mirror
+    period_mask, so pruning never drops a row the summary would keep.
+    """
+    partition_cols = PARTITIONS[kind]
+    conditions = []
+    if school:
+        conditions.append(ds.field('school') == school)
+    if 'year' in partition_cols:
+        period = ds.field('year') * 100 + ds.field('month')
+        if year:
+            conditions.append(ds.field('year') == int(year))
+        if fiscal_year:
+            first, last = fiscal_year_range(int(fiscal_year), fiscal_year_start)
+            conditions.append((period >= first) & (period <= last))
+        if month:
+            conditions.append(ds.field('month') == month_number(month))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_dataset(warehouse_dir: Path, kind: str, filter: Optional['ds.Expression'] = None) -> pd.DataFrame:
+    """
+    Read the partitions of one dataset that match a filter, in export order
+
+    Partitions that cannot match are skipped without being opened, the
+    remaining predicates are pushed down to the Parquet row groups, and
+    the matching fragments are scanned on parallel threads.
+    """
+    require_pyarrow()
+    dataset = ds.dataset(Path(warehouse_dir) / kind, format='parquet',
+                         partitioning=_partitioning(kind))
+    columns = [name for name in dataset.schema.names if name not in PARTITIONS[kind]]
+    frame = dataset.to_table(columns=columns, filter=filter, use_threads=True).to_pandas()
+    frame = frame.sort_values(ROW_COLUMN, kind='stable', ignore_index=True)
+    return frame.drop(columns=ROW_COLUMN)
+
+
+def read_warehouse(warehouse_dir: Path, school: Optional[str] = None,
+                   month: Optional[Union[str, int]] = None, year: Optional[int] = None,
+                   fiscal_year: Optional[int] = None,
+                   fiscal_year_start: int = DEFAULT_FISCAL_YEAR_START) -> Dict:
+    """
+    Read the inputs needed for a report from the warehouse
+
+    Contacts are pruned by school. Invoices are pruned by school and, with
+    period filters, limited to those raised in the selected months plus
+    the earlier ones the selected payments settle.
+
+    Returns:
+        Dict with the frames (named like the engine attributes), the
+        manifest and a fingerprint of the warehouse and filters
+    """
+    manifest = read_manifest(warehouse_dir)
+    filters = dict(school=school, month=month, year=year, fiscal_year=fiscal_year,
+                   fiscal_year_start=fiscal_year_start)
+
+    payments = read_dataset(warehouse_dir, 'payments', partition_filter('payments', **filters))
+    invoice_filter = partition_filter('invoices', school=school)
+    if any([month, year, fiscal_year]):
+        numbers = pa.array(payments['Invoice Number'].dropna().unique(), type=pa.string())
+        selected = (partition_filter('invoices', month=month, year=year, fiscal_year=fiscal_year,
+                                     fiscal_year_start=fiscal_year_start) |
+                    ds.field('Invoice Number').isin(numbers))
+        invoice_filter = selected if invoice_filter is None else invoice_filter & selected
+    invoices = read_dataset(warehouse_dir, 'invoices', invoice_filter)
+    contacts = read_dataset(warehouse_dir, 'contacts', partition_filter('contacts', school=school))
+
+    fee_items = None
+    if manifest.get('fee_items'):
+        fee_items = pd.read_parquet(Path(warehouse_dir) / 'fee_items.parquet')
+
+    digest = hashlib.sha1(f"warehouse v{WAREHOUSE_VERSION}".encode())
+    digest.update(json.dumps([manifest['created'], manifest['metadata'], filters],
+                             sort_keys=True, default=str).encode())
+    logger.info(f"Read {len(payments)} payments, {len(invoices)} invoice lines and "
+                f"{len(contacts)} contacts from {warehouse_dir}")
+    return {
+        'frames': {'contacts_df': contacts, 'invoices_df': invoices, 'payments_df': payments,
+                   'fee_items_df': fee_items},
+        'manifest': manifest,
+        'fingerprint': digest.hexdigest(),
+    }
@@ -8,6 +8,22 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.income_summary_processor import IncomeSummaryProcessor
+from src.income_summary_processor_v2 import IncomeSummaryProcessorV2
+from src.income_summary_aggregation import aggregate_by_codes
+from src.income_summary_allocation import get_strategy
+from src.income_summary_cache import fingerprint_inputs
+from src.income_summary_audit import GRADE_MISMATCH, NOT_IN_MASTER, OVER_BILLED, UNDER_BILLED
+from src.income_summary_engine import categorize_fee_items
+from src.income_summary_kernels import _proportional_totals_loop, proportional_totals
+from src.income_summary_periods import period_codes, period_labels, period_mask
+from src.income_summary_loader import (
+    DTYPE_SPEC, OVERLAP_KEYS, PAYMENT_ID_COLUMNS, combine_frames, drop_overlapping_ids, expand_sources,
+    read_csv_sources, read_input
+)
+from src.income_summary_polars import POLARS_AVAILABLE
+from src.income_summary_query import Summary
+from src.income_summary_server import ReportService, make_server
+from src.income_summary_synthetic import make_synthetic_data, write_synthetic_data
 import pandas as pd
 
 def test_data_loading():
@@ -79,6 +95,1021 @@ def test_summary_generation():
     
     return True
 
+def _loop_summary(opening_balances, fee_payments):
+    """Reference implementation: the original row-by-row summary loop"""
+    summary_dict = {}
+    
+    for _, payment in opening_balances.iterrows():
+        key = (payment.get('Grade', 'Unknown'), payment.get('Section', 'Unknown'),
+               payment.get('School', 'Unknown'), payment.get('Period', 0))
+        summary_dict.setdefault(key, {'Opening Balance': 0, 'Initial Fee': 0, 'Term / Monthly Fee': 0})
+        summary_dict[key]['Opening Balance'] += payment.get('Amount', 0)
+    
+    for _, payment in fee_payments.iterrows():
+        key = (payment.get('Grade', 'Unknown'), payment.get('Section', 'Unknown'),
+               payment.get('School', 'Unknown'), payment.get('Period', 0))
+        summary_dict.setdefault(key, {'Opening Balance': 0, 'Initial Fee': 0, 'Term / Monthly Fee': 0})
+        amount = payment.get('Amount Applied to Invoice', 0)
+        if payment.get('Fee Type') == 'Initial Fee':
+            summary_dict[key]['Initial Fee'] += amount
+        elif payment.get('Fee Type') == 'Term/Monthly Fee':
+            summary_dict[key]['Term / Monthly Fee'] += amount
+    
+    rows = [{'Grade': grade, 'Section': section, 'School': school, 'Period': period, **amounts}
+            for (grade, section, school, period), amounts in summary_dict.items()]
+    return pd.DataFrame(rows)
+
+def _synthetic_processor():
+    """Processor loaded with synthetic data, including unmatched payments"""
+    processor = IncomeSummaryProcessor(base_path=Path(__file__).parent.parent)
+    data = make_synthetic_data(n_students=150, seed=1)
+    
+    # A payment for an unknown invoice and one for an unknown customer
+    extra = data['payments_df'].iloc[[5, 6]].copy()
+    extra['Invoice Number'] = ['INV-X-999999', 'Customer opening balance']
+    extra['CustomerID'] = ['0', '0']
+    data['payments_df'] = pd.concat([data['payments_df'], extra], ignore_index=True)
+    
+    for name, frame in data.items():
+        setattr(processor, name, frame)
+    processor._clean_data()
+    return processor
+
+def test_vectorized_summary_matches_loop():
+    """Test that the vectorized v1 summary matches the original loop"""
+    print("\nTesting vectorized summary against the row-by-row loop...")
+    processor = _synthetic_processor()
+    
+    for filters in [{}, {'month': 'June', 'year': 2025}, {'fiscal_year': 2025}]:
+        summary = processor.generate_summary(**filters)
+        expected = _loop_summary(processor.process_opening_balances(**filters),
+                                 processor.process_fee_payments(**filters))
+        
+        assert len(summary) == len(expected)
+        for column in ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']:
+            assert abs(summary[column].sum() - expected[column].sum()) < 0.01
+        
+        # Compare row by row on the summary key
+        key = ['Grade', 'Section', 'School', 'Month']
+        expected['Month'] = pd.to_datetime(expected['Period'].astype(str), format='%Y%m').dt.month_name()
+        merged = summary.astype({k: object for k in key}).merge(
+            expected.astype({k: object for k in key}), on=key, suffixes=('', ' (loop)'))
+        assert len(merged) == len(summary)
+        for column in ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']:
+            assert (merged[column] - merged[f'{column} (loop)']).abs().max() < 1e-6
+    
+    print("✓ Vectorized summary matches the loop")
+    return True
+
+def test_aggregate_by_codes():
+    """Test that code-based aggregation matches a pandas groupby, with NaN keys and unused categories"""
+    print("\nTesting aggregation on categorical codes...")
+    frame = pd.DataFrame({
+        'Grade': pd.Categorical(['Grade 1', 'Grade 2', None, 'Grade 1', None, 'Grade 2', 'Grade 1'],
+                                categories=['Grade 1', 'Grade 2', 'Grade 9']),
+        'School': ['A', 'B', 'A', None, 'A', 'B', None],
+        'Period': [202406, 202406, 202506, 202406, 202506, 202406, 202406],
+        'Amount': [1.5, 2.0, 3.25, 4.0, 5.0, 6.0, 0.5],
+        'Payment Row': [0, 1, 2, 3, 2, 4, 3]
+    })
+    dimensions = ['Grade', 'School', 'Period']
+    
+    def records(df):
+        values = df[dimensions + ['Amount', 'Payments']].astype(object)
+        return sorted(tuple('<NA>' if pd.isna(v) else v for v in row)
+                      for row in values.itertuples(index=False))
+    
+    result = aggregate_by_codes(frame, dimensions, ['Amount'], distinct={'Payments': 'Payment Row'})
+    expected = (frame.groupby(dimensions, dropna=False, observed=True)
+                .agg(Amount=('Amount', 'sum'), Payments=('Payment Row', 'nunique'))
+                .reset_index())
+    assert records(result) == records(expected)
+    assert 'Grade 9' not in set(result['Grade'].dropna())
+    
+    # Fixed category order, unknown values first and unused categories left out
+    ordered = aggregate_by_codes(frame, ['School'], ['Amount'], categories={'School': ['B', 'A', 'C']})
+    assert [v if pd.notna(v) else None for v in ordered['School']] == [None, 'B', 'A']
+    assert list(ordered['Amount']) == [4.5, 8.0, 9.75]
+    
+    print(f"✓ {len(result)} groups match pandas groupby")
+    return True
+
+def test_integer_periods():
+    """Test that YYYYMM periods keep years apart, sort chronologically and filter by fiscal year"""
+    print("\nTesting integer year-month periods...")
+    dates = pd.Series(pd.to_datetime(['2025-06-10', '2024-06-03', '2026-01-15', '2025-12-31', None]))
+    periods = period_codes(dates)
+    assert list(periods) == [202506, 202406, 202601, 202512, 0]
+    
+    # June 2024 and June 2025 get their own labels, in calendar order across the year boundary
+    labels = period_labels(periods)
+    assert list(labels.cat.categories) == ['June 2024', 'June 2025', 'December 2025', 'January 2026']
+    assert list(labels.iloc[:4]) == ['June 2025', 'June 2024', 'January 2026', 'December 2025']
+    assert pd.isna(labels.iloc[4])
+    
+    # Fiscal years: April-March by default, or from any starting month
+    assert list(period_mask(periods, fiscal_year=2025)) == [True, False, True, True, False]
+    assert list(period_mask(periods, fiscal_year=2024)) == [False, True, False, False, False]
+    assert list(period_mask(periods, fiscal_year=2025, fiscal_year_start=1)) == [True, False, False, True, False]
+    assert list(period_mask(periods, fiscal_year=2025, fiscal_year_start=7)) == [False, False, True, True, False]
+    assert list(period_mask(periods, month='June', fiscal_year=2025)) == [True, False, False, False, False]
+    
+    # The same month of two years stays on separate summary rows
+    processor = _synthetic_processor()
+    payments = processor.payments_df
+    june = payments[(payments['Date'].dt.month == 6).to_numpy()].copy()
+    june['Date'] = june['Date'] - pd.DateOffset(years=1)
+    june['InvoicePayment ID'] = june['InvoicePayment ID'] + '-2024'
+    processor.payments_df = pd.concat([payments, june], ignore_index=True)
+    processor._clean_data()
+    
+    summary = processor.generate_summary()
+    months = list(summary['Month'].cat.categories)
+    assert 'June 2024' in months and 'June 2025' in months
+    assert months.index('June 2024') < months.index('June 2025') < months.index('January 2026')
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    by_month = summary.groupby('Month', observed=True)[measures].sum().sum(axis=1)
+    assert abs(by_month['June 2024'] - by_month['June 2025']) < 0.01
+    assert abs(processor.generate_summary(month='June', year=2024)[measures].sum().sum() -
+               by_month['June 2024']) < 0.01
+    
+    print(f"✓ {len(months)} months from {months[0]} to {months[-1]}")
+    return True
+
+def test_duplicate_payments():
+    """Test that payments are deduplicated on their payment IDs, keeping the latest export"""
+    print("\nTesting payment deduplication on hashed IDs...")
+    processor = IncomeSummaryProcessor(base_path=Path(__file__).parent.parent)
+    payments = make_synthetic_data(n_students=20, seed=4)['payments_df'].head(6).reset_index(drop=True)
+    
+    # Rows 0 and 1 exported again with a later Created Time and Amount
+    again = payments.iloc[[0, 1]].copy()
+    again['Created Time'] = again['Created Time'] + pd.Timedelta(days=1)
+    again['Amount'] = again['Amount'] + 1
+    
+    # Rows without payment IDs: two identical ones and one that differs
+    no_ids = payments.iloc[[2, 2, 3]].copy()
+    no_ids['InvoicePayment ID'] = None
+    no_ids.iloc[2, no_ids.columns.get_loc('Amount')] += 1
+    
+    processor.payments_df = pd.concat([payments, again, no_ids], ignore_index=True)
+    processor._drop_duplicate_payments()
+    kept = processor.payments_df
+    
+    assert processor.duplicate_report == {'same payment IDs': 2, 'identical rows': 1}
+    assert len(kept) == 6 + 2 + 3 - 3
+    assert list(kept.index[:6]) == [2, 3, 4, 5, 6, 7]
+    for row in [0, 1]:
+        latest = kept[kept['InvoicePayment ID'] == payments.loc[row, 'InvoicePayment ID']]
+        assert len(latest) == 1
+        assert latest['Created Time'].iloc[0] == again.loc[row, 'Created Time']
+        assert latest['Amount'].iloc[0] == payments.loc[row, 'Amount'] + 1
+    assert kept['InvoicePayment ID'].isna().sum() == 2
+    
+    print(f"✓ Kept {len(kept)} of {len(kept) + 3} payment rows")
+    return True
+
+def test_overlapping_exports():
+    """Test loading exports through globs and directories, with later files winning on shared IDs"""
+    print("\nTesting overlapping exports from globs and directories...")
+    import tempfile
+    
+    payments = make_synthetic_data(n_students=20, seed=5)['payments_df'].head(8).reset_index(drop=True)
+    first = payments.iloc[:5]
+    second = payments.iloc[3:].copy()
+    second['Amount'] = second['Amount'] + 100
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / 'payments'
+        folder.mkdir()
+        first.to_csv(folder / 'payments_2025_06.csv', index=False)
+        second.to_csv(folder / 'payments_2025_07.csv', index=False)
+        (folder / 'notes.txt').write_text('not an export')
+        
+        by_glob = expand_sources(str(folder / 'payments_*.csv'))
+        assert [p.name for p in by_glob] == ['payments_2025_06.csv', 'payments_2025_07.csv']
+        assert expand_sources(folder) == by_glob
+        try:
+            expand_sources(str(folder / 'receipts_*.csv'))
+            assert False, "Expected FileNotFoundError"
+        except FileNotFoundError:
+            pass
+        
+        for source in [str(folder / 'payments_*.csv'), folder]:
+            loaded = read_csv_sources(source, id_columns=PAYMENT_ID_COLUMNS, dtype=DTYPE_SPEC)
+            assert len(loaded) == len(payments)
+            amounts = loaded.set_index('InvoicePayment ID')['Amount']
+            expected = pd.concat([first.iloc[:3], second]).set_index('InvoicePayment ID')['Amount']
+            assert (amounts.loc[expected.index] == expected).all()
+    
+    # On its own: the latest export wins, rows without IDs are always kept
+    frame = pd.DataFrame({'Contact ID': ['1', '2', '1', None, None], 'Name': ['a', 'b', 'c', 'd', 'd']})
+    kept = drop_overlapping_ids(frame, ['Contact ID'], pd.Series([0, 0, 1, 0, 1]).to_numpy())
+    assert list(kept['Name']) == ['b', 'c', 'd', 'd']
+    
+    print(f"✓ {len(payments)} payments from two overlapping exports")
+    return True
+
+def test_allocation_strategies():
+    """Test that proportional and exact-paise allocation credit each payment once"""
+    print("\nTesting allocation strategies...")
+    processor = _synthetic_processor()
+    
+    totals = {}
+    for strategy in ['proportional', 'exact']:
+        processor.strategy = get_strategy(strategy)
+        rows = processor._summary_rows()
+        rows = rows[rows['Fee Type'] != 'Opening Balance']
+        credited = rows.groupby('Payment Row')[['Initial Fee', 'Term / Monthly Fee']].sum().sum(axis=1)
+        totals[strategy] = credited
+        
+        if strategy == 'exact':
+            # Whole paise per line
+            paise = (rows[['Initial Fee', 'Term / Monthly Fee']] * 100).to_numpy()
+            assert (abs(paise - paise.round()) < 1e-6).all()
+    
+    # Rounding moves less than a paisa per fee line
+    lines = rows.groupby('Payment Row').size()
+    assert ((totals['proportional'] - totals['exact']).abs() <= lines * 0.01 + 1e-6).all()
+    
+    # A payment repeated on every line of its invoice is split exactly once
+    exact = get_strategy('exact')
+    split = exact.allocate(pd.Series([10.0, 10.0, 100.0, 100.0, 100.0, 0.05]).to_numpy(),
+                           pd.Series([1.0, 1.0, 1.0, 1.0, 1.0, 3.0]).to_numpy(),
+                           pd.Series([2.0, 2.0, 3.0, 3.0, 3.0, 3.0]).to_numpy(),
+                           pd.Series([0, 0, 1, 1, 1, 2]).to_numpy())
+    assert list(split[:2]) == [5.0, 5.0]
+    assert sorted(split[2:5]) == [33.33, 33.33, 33.34]
+    assert split[5] == 0.05
+    
+    # Every line of every synthetic invoice: each payment's paise add up exactly
+    invoices = processor.invoice_index
+    positions = pd.Series(range(len(invoices)))
+    positions = positions[invoices.totals[positions] > 0].to_numpy()
+    amounts = pd.Series(invoices.totals[positions]).sample(frac=1, random_state=3).to_numpy() * 0.37
+    entries, lines = invoices.expand(positions)
+    assert (pd.Series(entries).value_counts() >= 2).any()
+    split = exact.allocate(amounts[entries], invoices.item_totals[lines],
+                           invoices.totals[positions[entries]], entries)
+    credited = (pd.Series(split * 100).groupby(entries).sum()).round().astype('int64')
+    expected = pd.Series(amounts * 100).round().astype('int64')
+    assert (credited.to_numpy() == expected.to_numpy()).all()
+    
+    print("✓ Allocation strategies are consistent")
+    return True
+
+def test_report_service():
+    """Test the HTTP service serves cached summaries and reloads changed inputs"""
+    print("\nTesting report service...")
+    import json
+    import tempfile
+    import threading
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        write_synthetic_data(Path(tmp), n_students=100, seed=2)
+        service = ReportService(Path(tmp), reload_interval=0)
+        assert service.load()
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        
+        try:
+            expected = service.processor.generate_summary(month='June', year=2025)
+            for _ in range(2):
+                with urlopen(url + '/summary?month=june&year=2025') as response:
+                    rows = json.loads(response.read())
+            assert len(rows) == len(expected)
+            assert abs(sum(r['Initial Fee'] for r in rows) - expected['Initial Fee'].sum()) < 0.01
+            assert service.results.hits >= 1
+            
+            with urlopen(url + '/summary?school=Excel+Central+School&format=csv') as response:
+                csv_rows = pd.read_csv(response)
+            assert set(csv_rows['School']) == {'Excel Central School'}
+            
+            try:
+                urlopen(url + '/summary?format=xml')
+                assert False, "Expected a 400 response"
+            except HTTPError as e:
+                assert e.code == 400
+            
+            # A reload swaps in a new generation and empties the result cache
+            assert service.load()
+            assert service.generation == 2 and len(service.results) == 0
+        finally:
+            server.shutdown()
+            server.server_close()
+    
+    print("✓ Report service works")
+    return True
+
+def test_load_frames_matches_load_data():
+    """Test that separately parsed exports load the same data as load_data"""
+    print("\nTesting loading from pre-parsed exports...")
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = write_synthetic_data(Path(tmp), n_students=80, seed=3) / 'input'
+        
+        # Two overlapping payment exports
+        payments = pd.read_csv(input_path / 'student_payment.csv', dtype=str)
+        payments.iloc[:len(payments) * 2 // 3].to_csv(input_path / 'payments_a.csv', index=False)
+        payments.iloc[len(payments) // 3:].to_csv(input_path / 'payments_b.csv', index=False)
+        payment_files = [input_path / 'payments_a.csv', input_path / 'payments_b.csv']
+        
+        loaded = IncomeSummaryProcessorV2(Path(tmp))
+        assert loaded.load_data(payments=payment_files)
+        
+        # Parse each export on its own, as the web app does on upload
+        parsed = IncomeSummaryProcessorV2(Path(tmp))
+        parsed.load_frames(
+            contacts_df=read_input('contacts', input_path / 'student_contacts.csv'),
+            invoices_df=read_input('invoices', input_path / 'student_invoices.csv'),
+            payments_df=combine_frames([read_input('payments', f) for f in payment_files],
+                                       OVERLAP_KEYS['payments'])
+        )
+        
+        assert len(parsed.payments_df) == len(loaded.payments_df) == len(payments)
+        pd.testing.assert_frame_equal(parsed.generate_summary(), loaded.generate_summary())
+    
+    print("✓ Pre-parsed exports match load_data")
+    return True
+
+def test_input_cache():
+    """Test that cleaned inputs round-trip through the memory-mapped cache and follow source changes"""
+    print("\nTesting memory-mapped input cache...")
+    import os
+    import tempfile
+    import src.income_summary_engine as engine_module
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = write_synthetic_data(Path(tmp), n_students=80, seed=6) / 'input'
+        cache_dir = Path(tmp) / 'cache'
+        
+        uncached = IncomeSummaryProcessorV2(Path(tmp))
+        assert uncached.load_data()
+        expected = uncached.generate_summary()
+        
+        # The first load writes the cache, later ones open it without parsing a CSV
+        assert IncomeSummaryProcessorV2(Path(tmp), cache_dir=cache_dir).load_data()
+        assert len(list(cache_dir.glob('*.arrow'))) == 4
+        read_input = engine_module.read_input
+        engine_module.read_input = None
+        try:
+            cached = IncomeSummaryProcessorV2(Path(tmp), cache_dir=cache_dir)
+            assert cached.load_data()
+        finally:
+            engine_module.read_input = read_input
+        assert cached.duplicate_report == uncached.duplicate_report
+        
+        # Entries written by other cleaning code are not reused
+        stale = IncomeSummaryProcessorV2(Path(tmp), cache_dir=cache_dir)
+        stale.cache.version = 'other cleaning'
+        assert not stale.load_cached(cached.data_fingerprint)
+        pd.testing.assert_frame_equal(cached.generate_summary(), expected, check_categorical=False)
+        
+        # A changed source file gives a new fingerprint, so the cache is not used
+        sources = [input_path / name for name in
+                   ['student_contacts.csv', 'student_invoices.csv', 'student_payment.csv']]
+        before = fingerprint_inputs(*sources)
+        assert fingerprint_inputs(*sources) == before
+        payments = pd.read_csv(sources[2], dtype=str)
+        payments.iloc[:-5].to_csv(sources[2], index=False)
+        stat = sources[2].stat()
+        os.utime(sources[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert fingerprint_inputs(*sources) != before
+        
+        assert cached.load_data()
+        assert len(cached.payments_df) < len(uncached.payments_df)
+        assert len(list(cache_dir.glob('*.json'))) == 2
+        
+        # Only the most recently used fingerprints are kept
+        cached.cache.max_entries = 2
+        payments.iloc[:-9].to_csv(sources[2], index=False)
+        assert cached.load_data()
+        manifests = sorted(path.stem for path in cache_dir.glob('*.json'))
+        assert len(manifests) == 2 and cached.data_fingerprint in manifests
+        assert before not in manifests
+        assert len(list(cache_dir.glob('*.arrow'))) == 2 * 4
+    
+    print("✓ Cached inputs give the same summary")
+    return True
+
+def test_summary_cache():
+    """Test that summaries are memoized in memory and on disk"""
+    print("\nTesting summary cache...")
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        write_synthetic_data(Path(tmp), n_students=80, seed=4)
+        cache_dir = Path(tmp) / 'cache'
+        
+        processor = IncomeSummaryProcessorV2(Path(tmp), cache_dir=cache_dir)
+        assert processor.load_data()
+        first = processor.generate_summary(fiscal_year=2025)
+        first['Initial Fee'] = 0.0  # callers get a copy of the cached summary
+        again = processor.generate_summary(fiscal_year=2025)
+        assert processor.summary_cache.memory.hits == 1
+        assert again['Initial Fee'].sum() > 0
+        
+        # School filter and rollups are derived from the cached summary
+        school = processor.generate_summary(fiscal_year=2025, school='Excel Central School')
+        assert set(school['School']) == {'Excel Central School'}
+        rollup = processor.summary_rollup('School', fiscal_year=2025)
+        expected = again.groupby('School', observed=True)['Initial Fee'].sum()
+        assert (rollup['Initial Fee'] - expected).abs().max() < 1e-6
+        
+        # Loading unchanged files keeps the data and its cached summaries
+        assert processor.load_data()
+        processor.generate_summary(fiscal_year=2025)
+        assert processor.summary_cache.memory.hits >= 3
+        
+        # A new processor on the same files reads the summary from disk
+        restarted = IncomeSummaryProcessorV2(Path(tmp), cache_dir=cache_dir)
+        assert restarted.load_data()
+        restarted._build_summary = None  # must not be recomputed
+        pd.testing.assert_frame_equal(restarted.generate_summary(fiscal_year=2025), again)
+        
+        # A different strategy is a different result
+        restarted.strategy = get_strategy('full')
+        restarted.__dict__.pop('_build_summary')
+        full = restarted.generate_summary(fiscal_year=2025)
+        assert full['Term / Monthly Fee'].sum() >= again['Term / Monthly Fee'].sum()
+    
+    print("✓ Summary cache works")
+    return True
+
+def test_summary_cube():
+    """Test that every grouping set of the rollup cube matches a groupby"""
+    print("\nTesting rollup cube...")
+    from itertools import combinations
+    processor = _synthetic_processor()
+    processor.strategy = get_strategy('proportional')
+    
+    summary = processor.generate_summary(fiscal_year=2025)
+    cube = processor.summary_cube(fiscal_year=2025)
+    dimensions = ['School', 'Grade', 'Section', 'Month']
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    assert cube['Grouping'].nunique() == 2 ** len(dimensions)
+    
+    for size in range(len(dimensions) + 1):
+        for by in combinations(dimensions, size):
+            rollup = processor.summary_rollup(list(by), fiscal_year=2025)
+            if by:
+                expected = summary.groupby(list(by), observed=True, dropna=False)[measures].sum()
+                assert len(rollup) == len(expected)
+                assert (rollup[measures].sum() - expected.sum()).abs().max() < 0.01
+            else:
+                assert (rollup.iloc[0] - summary[measures].sum()).abs().max() < 0.01
+    
+    # Rollups keep months in chronological order
+    months = processor.summary_rollup('Month', fiscal_year=2025).index
+    assert list(months) == list(summary['Month'].cat.categories)
+    
+    print("✓ Rollup cube matches groupby")
+    return True
+
+def test_query_plan():
+    """Test that lazy queries match the summary on every access path"""
+    print("\nTesting lazy query plans...")
+    processor = _synthetic_processor()
+    processor.strategy = get_strategy('proportional')
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    summary = processor._build_summary()
+    
+    def expected(rows, by):
+        return rows.groupby(by, observed=True)[measures].sum().reset_index()
+    
+    # Selective period filter: index lookup, with the school filter pushed down
+    query = Summary(processor).filter(school='Excel Central School', months=['June', 2025_07])
+    result = query.by('School', 'Grade').collect()
+    assert Summary(processor).filter(months=[2025_07]).plan().access_path == 'period-index'
+    rows = summary[(summary['School'] == 'Excel Central School') & summary['Month'].isin(['June', 'July'])]
+    reference = expected(rows, ['School', 'Grade'])
+    assert len(result) == len(reference)
+    assert abs(result[measures].to_numpy() - reference[measures].to_numpy()).max() < 1e-6
+    
+    # Broad filter: full scan, grouped by month in calendar order
+    query = Summary(processor).filter(grade=['LKG', 'UKG']).by('Month')
+    assert query.plan().access_path == 'scan'
+    result = query.collect()
+    reference = expected(summary[summary['Grade'].isin(['LKG', 'UKG'])], ['Month'])
+    assert list(result['Month']) == list(reference['Month'])
+    assert abs(result[measures].to_numpy() - reference[measures].to_numpy()).max() < 1e-6
+    
+    # Every access path rounds like generate_summary, also with amounts in odd paise
+    odd = _synthetic_processor()
+    odd.strategy = get_strategy('proportional')
+    odd.payments_df['Amount'] = odd.payments_df['Amount'] * 1.000371
+    by_grade = Summary(odd).filter(fiscal_year=2025).by('Grade')
+    assert by_grade.plan().access_path == 'scan'
+    scanned = by_grade.collect()
+    paise = scanned[measures].to_numpy() * 100
+    assert (abs(paise - paise.round()) < 1e-6).all()
+    rows = odd.generate_summary(fiscal_year=2025)
+    assert by_grade.plan().access_path == 'cache'
+    assert (abs(by_grade.collect()[measures] - scanned[measures]) <= 0.01 * len(rows)).all().all()
+    
+    # Filters matching a generated summary are answered from the cache
+    cached = processor.generate_summary(fiscal_year=2025)
+    query = Summary(processor).filter(fiscal_year=2025, section='A').by('Grade').select('Initial Fee')
+    hits = processor.summary_cache.memory.hits
+    assert query.plan().access_path == 'cache'
+    assert processor.summary_cache.memory.hits == hits  # planning only peeks at the cache
+    result = query.collect()
+    reference = cached[cached['Section'] == 'A'].groupby('Grade', observed=True)['Initial Fee'].sum()
+    assert list(result.columns) == ['Grade', 'Initial Fee']
+    assert abs(result['Initial Fee'].sum() - reference.sum()) < 1e-6
+    
+    print("✓ Lazy queries match the summary")
+    return True
+
+def test_polars_backend():
+    """Test that the polars backend produces the same summaries as pandas"""
+    print("\nTesting the polars backend...")
+    if not POLARS_AVAILABLE:
+        print("- polars not installed; skipped")
+        return True
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = write_synthetic_data(Path(tmp), n_students=120, seed=5) / 'input'
+        
+        # Overlapping payment exports with a repeated row and an unknown invoice
+        payments = pd.read_csv(input_path / 'student_payment.csv', dtype=str)
+        extra = payments.iloc[[3, 4]].copy()
+        extra['Invoice Number'] = ['INV-X-999999', 'Customer opening balance']
+        extra['CustomerID'] = ['0', '0']
+        payments = pd.concat([payments, extra], ignore_index=True)
+        payments.iloc[:len(payments) * 2 // 3].to_csv(input_path / 'payments_a.csv', index=False)
+        payments.iloc[len(payments) // 3:].to_csv(input_path / 'payments_b.csv', index=False)
+        payment_files = [input_path / 'payments_a.csv', input_path / 'payments_b.csv']
+        
+        processors = {}
+        for backend in ['pandas', 'polars']:
+            processors[backend] = IncomeSummaryProcessorV2(Path(tmp), backend=backend)
+            assert processors[backend].load_data(payments=payment_files)
+        
+        pandas_proc, polars_proc = processors['pandas'], processors['polars']
+        assert len(polars_proc.payments_df) == len(pandas_proc.payments_df)
+        
+        # Polars builds the summaries without the pandas payment match or invoice index
+        def pandas_match(payments):
+            raise AssertionError("polars summary used the pandas payment match")
+        polars_proc._match_payments = pandas_match
+        for filters in [{}, {'month': 'July', 'year': 2025}, {'fiscal_year': 2025}]:
+            pd.testing.assert_frame_equal(polars_proc.generate_summary(**filters),
+                                          pandas_proc.generate_summary(**filters))
+        assert polars_proc._invoice_index is None
+        del polars_proc._match_payments
+        
+        # Validation is traced on demand for the polars summary, with the same result
+        for part, frame in polars_proc.validate(fiscal_year=2025).items():
+            pd.testing.assert_frame_equal(frame, pandas_proc.validate(fiscal_year=2025)[part])
+
+        # Queries on the polars backend run through the Polars summary
+        query = Summary(polars_proc, backend='polars').filter(
+            school='Excel Central School', months=['June', 'July']).by('Grade', 'Month')
+        assert query.plan().access_path == 'polars'
+        polars_rows = query.collect()
+        pandas_rows = Summary(pandas_proc).filter(
+            school='Excel Central School', months=['June', 'July']).by('Grade', 'Month').collect()
+        pd.testing.assert_frame_equal(polars_rows, pandas_rows, check_categorical=False, atol=0.05)
+
+        # Frames cleaned by pandas are converted on first use
+        polars_proc.load_frames(pandas_proc.contacts_df.copy(), pandas_proc.invoices_df.copy(),
+                                pandas_proc.payments_df.copy())
+        pd.testing.assert_frame_equal(polars_proc.generate_summary(),
+                                      pandas_proc.generate_summary())
+    
+    try:
+        IncomeSummaryProcessorV2(Path(__file__).parent.parent, strategy='full', backend='polars')
+        assert False, "polars backend accepted the full strategy"
+    except ValueError:
+        pass
+    
+    print("✓ Polars summaries match pandas")
+    return True
+
+def test_allocation_kernel():
+    """Test that the fused allocation kernel matches the line-by-line results"""
+    print("\nTesting the fused allocation kernel...")
+    processor = _synthetic_processor()
+    processor.strategy = get_strategy('proportional')
+    
+    # Kernel against the plain Python loop on the same arrays
+    invoices = processor.invoice_index
+    match = processor._match_payments(processor.payments_df)
+    regular, invoice_pos = match['regular'], match['invoice_pos']
+    groups = regular['Period'].rank(method='dense').to_numpy(dtype=int) - 1
+    args = (invoices.offsets, invoices.item_totals, invoices.fee_codes, invoices.totals,
+            regular['Amount'].to_numpy(dtype=float), invoice_pos, groups, groups.max() + 1, 2)
+    totals, lines = proportional_totals(*args, use_numba=False)
+    loop_totals, loop_lines = _proportional_totals_loop(*args)
+    assert (totals == loop_totals).all() and (lines == loop_lines).all()
+    
+    # Fused summaries equal expanding every payment into its lines
+    for filters in [{}, {'month': 'July', 'year': 2025}, {'month': 'July', 'year': 1990}]:
+        fused = processor._build_summary(**filters)
+        processor.strategy.fused_kernel = None
+        expanded = processor._build_summary(**filters)
+        del processor.strategy.fused_kernel
+        pd.testing.assert_frame_equal(fused, expanded)
+    
+    print("✓ Fused kernel matches line-by-line allocation")
+    return True
+
+def test_validation():
+    """Test payment issues and the reconciliation of summary totals"""
+    print("\nTesting validation and reconciliation...")
+    processor = _synthetic_processor()
+    processor.strategy = get_strategy('proportional')
+    
+    summary = processor.generate_summary(fiscal_year=2025)
+    processor._build_summary = None  # validation comes with the cached summary
+    validation = processor.validate(fiscal_year=2025)
+    del processor._build_summary
+    issues, reconciliation = validation['issues'], validation['reconciliation']
+    
+    unknown_invoice = issues[issues['Invoice Number'] == 'INV-X-999999']
+    assert list(unknown_invoice['Issue']) == ['Invoice not found']
+    assert unknown_invoice['Dropped'].all()
+    unknown_opening = issues[issues['Issue'] == 'Opening balance customer not found']
+    assert len(unknown_opening) == 1 and not unknown_opening['Dropped'].any()
+    
+    # Every rupee paid is summarized, dropped or paid for other items
+    payments = processor._filter_period(processor.payments_df, fiscal_year=2025)
+    assert abs(reconciliation['Payments'].sum() - payments['Amount'].sum()) < 0.01
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    assert abs(reconciliation['Summarized'].sum() - summary[measures].sum().sum()) < 0.01
+    assert reconciliation['Dropped'].sum() >= unknown_invoice['Amount'].sum()
+    assert reconciliation['Other Items'].sum() > 0
+    assert reconciliation['Difference'].abs().max() <= 0.02
+    
+    print(f"✓ {len(issues)} payment issues found; totals reconcile")
+    return True
+
+def test_warehouse():
+    """Test that pruned warehouse reads give the same summaries as the CSV exports"""
+    print("\nTesting the partitioned Parquet warehouse...")
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        write_synthetic_data(Path(tmp), n_students=200, seed=5)
+        loaded = IncomeSummaryProcessorV2(Path(tmp))
+        assert loaded.load_data()
+        loaded.ingest_warehouse()
+        
+        full = IncomeSummaryProcessorV2(Path(tmp))
+        assert full.load_warehouse(), full.load_error
+        pd.testing.assert_frame_equal(full.generate_summary(), loaded.generate_summary())
+        
+        school = loaded.contacts_df['School'].cat.categories[0]
+        filters = {'month': 'June', 'year': 2025}
+        narrow = IncomeSummaryProcessorV2(Path(tmp))
+        assert narrow.load_warehouse(school=school, **filters), narrow.load_error
+        expected = loaded.generate_summary(school=school, **filters)
+        pd.testing.assert_frame_equal(narrow.generate_summary(**filters), expected,
+                                      check_categorical=False)
+        
+        # Only the school's June payments were read
+        assert len(narrow.payments_df) < len(loaded.payments_df) / 4
+        assert (narrow.payments_df['Period'] == 202506).all()
+        
+        # Rewriting swaps the datasets in and leaves no staged or old copies behind
+        loaded.ingest_warehouse()
+        warehouse_dir = next(path.parent for path in Path(tmp).rglob('manifest.json'))
+        assert not [path for path in warehouse_dir.iterdir() if path.suffix in ('.tmp', '.old')]
+        again = IncomeSummaryProcessorV2(Path(tmp))
+        assert again.load_warehouse(), again.load_error
+        pd.testing.assert_frame_equal(again.generate_summary(), loaded.generate_summary())
+    
+    print(f"✓ Warehouse read {len(narrow.payments_df)} of {len(loaded.payments_df)} payments "
+          f"for one school and month")
+    return True
+
+def test_receivables():
+    """Test receivables and ageing against a per-invoice calculation"""
+    print("\nTesting receivables and ageing...")
+    processor = _synthetic_processor()
+    as_of = pd.Timestamp('2025-10-15')
+    report = processor.generate_receivables(as_of=as_of)
+    buckets = ['0-30 Days', '31-60 Days', '61-90 Days', '90+ Days']
+    
+    # Reference: merge invoices with the payments applied to them by the as-of date
+    payments = processor.payments_df[processor.payments_df['Date'] <= as_of]
+    invoices = processor.invoices_df[processor.invoices_df['Invoice Date'] <= as_of]
+    billed = invoices.groupby('Invoice Number').agg(
+        Total=('Item Total', 'sum'), Date=('Invoice Date', 'first'), Customer=('Customer ID', 'first'))
+    billed['Paid'] = payments.groupby('Invoice Number')['Amount Applied to Invoice'].sum()
+    billed['Outstanding'] = billed['Total'] - billed['Paid'].fillna(0)
+    billed['Bucket'] = pd.cut((as_of - billed['Date']).dt.days, [-1e9, 30, 60, 90, 1e9],
+                              labels=buckets)
+    billed = billed[billed['Customer'].isin(processor.contacts_df['Contact ID'])]
+    expected = billed.pivot_table(index='Customer', columns='Bucket', values='Outstanding',
+                                  aggfunc='sum', observed=False).fillna(0)
+    
+    by_student = report.set_index('Contact ID')
+    assert abs(by_student['Invoiced'].sum() - billed['Total'].sum()) < 0.01
+    for bucket in buckets:
+        assert abs(by_student[bucket].sum() - expected[bucket].sum()) < 0.01, bucket
+    student = expected.index[0]
+    assert abs(by_student.loc[student, buckets].sum() - expected.loc[student].sum()) < 0.01
+    
+    # Outstanding adds the unpaid opening balance to the aged invoices
+    assert ((report['Outstanding'] - report['Opening Balance'] - report[buckets].sum(axis=1))
+            .abs() < 0.02).all()
+    school = report['School'].iloc[0]
+    assert (processor.generate_receivables(as_of=as_of, school=school)['School'] == school).all()
+    
+    print(f"✓ Receivables for {len(report)} students, "
+          f"₹{report['Outstanding'].sum():,.2f} outstanding")
+    return True
+
+def test_collection_rates():
+    """Test fees billed against fees collected per summary cell"""
+    print("\nTesting billed vs collected...")
+    processor = _synthetic_processor()
+    processor.strategy = get_strategy('proportional')
+    
+    summary = processor.generate_summary(fiscal_year=2025)
+    processor._build_summary = None  # built in the same pass as the summary
+    report = processor.generate_collection_rates(fiscal_year=2025)
+    del processor._build_summary
+    
+    # Collected matches the summary's fee columns
+    fees = ['Initial Fee', 'Term / Monthly Fee']
+    collected = report.groupby('Fee Type', observed=True)['Collected'].sum()
+    for fee in fees:
+        assert abs(collected[fee] - summary[fee].sum()) < 0.05, fee
+    
+    # Billed matches a groupby over the fee lines invoiced in the academic year
+    invoices = processor.invoices_df.merge(
+        processor.contacts_df[['Contact ID', 'School', 'Grade', 'Section']],
+        left_on='Customer ID', right_on='Contact ID')
+    invoices['Fee Type'] = categorize_fee_items(invoices['Item Name'])
+    in_year = invoices['Invoice Date'].between('2025-04-01', '2026-03-31')
+    billed = invoices[in_year & invoices['Fee Type'].notna()]
+    assert abs(report['Billed'].sum() - billed['Item Total'].sum()) < 0.01
+    cell = billed.groupby(['School', 'Grade', 'Section', 'Fee Type'])['Item Total'].sum()
+    school, grade, section, fee = cell.index[0]
+    row = report[(report['School'] == school) & (report['Grade'] == grade) &
+                 (report['Section'] == section) & (report['Fee Type'] == fee)]
+    assert abs(row['Billed'].sum() - cell.iloc[0]) < 0.01
+    
+    has_bills = report['Billed'] != 0
+    rates = report.loc[has_bills, 'Collected'] / report.loc[has_bills, 'Billed'] * 100
+    assert ((report.loc[has_bills, 'Collection Rate (%)'] - rates).abs() < 0.01).all()
+    assert report.loc[~has_bills, 'Collection Rate (%)'].isna().all()
+    
+    print(f"✓ {len(report)} cells, {collected.sum() / report['Billed'].sum():.1%} collected")
+    return True
+
+def test_summary_lineage():
+    """Test drilling down from summary cells to their payments"""
+    print("\nTesting summary lineage...")
+    processor = _synthetic_processor()
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    
+    for strategy in ['proportional', 'exact']:
+        processor.strategy = get_strategy(strategy)
+        summary = processor.generate_summary(fiscal_year=2025)
+        key = processor._summary_key(None, None, 2025)
+        assert processor.summary_cache.get(key + ('lineage',)) is None  # traced on first use
+        processor._build_summary = None  # the summary itself is not rebuilt
+        lineage = processor.summary_lineage(fiscal_year=2025)
+        del processor._build_summary
+        assert processor.summary_cache.get(key + ('lineage',)) is not None
+    
+        # The contributions of every cell add up to the cell
+        assert len(lineage) == len(summary)
+        entries = lineage.to_frame()
+        for measure in measures:
+            rows = entries[entries['Measure'] == measure]
+            totals = rows.groupby('Cell')['Allocated'].sum().reindex(summary.index, fill_value=0)
+            assert ((totals - summary[measure]).abs() < 0.05).all(), (strategy, measure)
+    
+    # The summary is rebuilt when it was evicted but its lineage was not
+    processor.summary_cache.memory._items.pop(key)
+    assert len(processor.summary_lineage(fiscal_year=2025, school=summary['School'].iloc[0])) == \
+        (summary['School'] == summary['School'].iloc[0]).sum()
+    
+    # Cells follow the rows of the school-filtered summary
+    school = summary['School'].iloc[0]
+    school_summary = processor.generate_summary(fiscal_year=2025, school=school)
+    cell = int(school_summary['Initial Fee'].to_numpy().argmax())
+    details = processor.drill_down(cell, 'Initial Fee', fiscal_year=2025, school=school)
+    assert abs(details['Allocated'].sum() - school_summary.loc[cell, 'Initial Fee']) < 0.05
+    assert (details['Measure'] == 'Initial Fee').all()
+    
+    # The students are those of the cell, and the receipts those of its month
+    row = school_summary.loc[cell]
+    students = processor.contacts_df[processor.contacts_df['Contact ID'].isin(details['Contact ID'])]
+    for column in ['School', 'Grade', 'Section']:
+        assert (students[column] == row[column]).all(), column
+    assert (details['Date'].dt.month_name() == row['Month'].split()[0]).all()
+    
+    print(f"✓ Row {cell} of {school} traced to {len(details)} payments from "
+          f"{details['Contact ID'].nunique()} students")
+    return True
+
+def test_student_search():
+    """Test finding students by name, admission number and phone, and their activity"""
+    print("\nTesting student search...")
+    processor = _synthetic_processor()
+    contacts = processor.contacts_df
+    student = contacts.iloc[42]
+    
+    # Any part of a name, admission number or phone number finds the student
+    for query in [student['Display Name'], student['Display Name'].lower() + ' ',
+                  student['CF.Admission No / Reference code'][-4:], student['Phone'][2:8]]:
+        matches = processor.search_students(query, limit=None)
+        assert student['Contact ID'] in set(matches['Contact ID']), query
+    
+    # Every match contains the query, and exact names rank first
+    matches = processor.search_students('Student 4', limit=None)
+    expected = contacts[contacts['Display Name'].str.contains('Student 4', regex=False)]
+    assert set(matches['Contact ID']) == set(expected['Contact ID'])
+    assert matches['Display Name'].iloc[0] == 'Student 4'
+    assert processor.search_students('no such student').empty
+    
+    # The activity of a student adds up
+    activity = processor.student_activity(student['Contact ID'])
+    payments = processor.payments_df
+    assert set(payments.loc[payments['CustomerID'] == student['Contact ID'], 'Payment Number']) \
+        <= set(activity['payments']['Payment Number'])
+    summary_rows = processor._summary_rows()
+    own = summary_rows[summary_rows['Contact Row'] == 42]
+    expected = own[['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']].sum().sum()
+    assert abs(activity['allocations']['Allocated'].sum() - expected) < 0.05
+    
+    print(f"✓ Found {student['Display Name']} with {len(activity['payments'])} payments "
+          f"and {len(activity['invoices'])} invoice lines")
+    return True
+
+def test_contact_history():
+    """Test attributing payments to the grade a student had on the payment date"""
+    print("\nTesting contact history...")
+    processor = _synthetic_processor()
+    processor.strategy = get_strategy('proportional')
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    before = processor.generate_summary(fiscal_year=2025)
+    
+    # Twenty students were in 'Grade 99' until the export of 1 August
+    contacts = processor.contacts_df
+    moved = contacts.index[:20]
+    earlier = contacts.astype({'Grade': object})
+    earlier.loc[moved, 'Grade'] = 'Grade 99'
+    earlier['Last Modified Time'] = '2025-01-01 09:00:00'
+    contacts['Last Modified Time'] = contacts['Last Modified Time'].astype(object)
+    contacts.loc[moved, 'Last Modified Time'] = '2025-08-01 00:00:00'
+    assert processor.load_history_frames([earlier]) is None
+    versions = processor.contact_history.versions
+    assert len(versions) == len(contacts) + len(moved)
+    
+    # Payments move between grades, but no amount is gained or lost
+    after = processor.generate_summary(fiscal_year=2025)
+    assert (after['Grade'] == 'Grade 99').any()
+    assert abs(after[measures].sum().sum() - before[measures].sum().sum()) < 0.01
+    
+    # Same grades as an as-of merge on the payment date
+    rows = processor._summary_rows(fiscal_year=2025)
+    rows = rows[rows['Contact Row'] >= 0].reset_index(drop=True)
+    payments = pd.DataFrame({
+        'Date': processor.payments_df['Date'].to_numpy()[rows['Payment Row']],
+        'Contact ID': contacts['Contact ID'].to_numpy()[rows['Contact Row']],
+        'Row': range(len(rows)),
+    })
+    expected = pd.merge_asof(payments.sort_values('Date'),
+                             versions[['Contact ID', 'Valid From', 'Grade']].sort_values('Valid From'),
+                             left_on='Date', right_on='Valid From', by='Contact ID').sort_values('Row')
+    attributed = processor._contact_attributes(rows['Contact Row'].to_numpy(), payments['Date'].to_numpy())
+    assert (pd.Series(attributed['Grade']).astype(object).to_numpy() ==
+            expected['Grade'].astype(object).to_numpy()).all()
+    moved_payments = payments['Contact ID'].isin(contacts.loc[moved, 'Contact ID'])
+    old_grade = pd.Series(attributed['Grade']).astype(object) == 'Grade 99'
+    assert (old_grade == (moved_payments & (payments['Date'] < '2025-08-01'))).all()
+    
+    print(f"✓ {old_grade.sum()} payments attributed to the grade of the earlier export")
+    return True
+
+def test_as_of_summary():
+    """Test summaries of only the payments entered by a cutoff"""
+    print("\nTesting as-of summaries...")
+    processor = _synthetic_processor()
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    created = pd.to_datetime(processor.payments_df['Created Time'])
+    
+    # The same as a summary of the payments entered by the end of 5 August
+    as_of = processor.generate_summary(fiscal_year=2025, as_of='2025-08-05')
+    expected = _synthetic_processor()
+    expected.payments_df = expected.payments_df[created < '2025-08-06'].reset_index(drop=True)
+    expected._reset_indexes()
+    expected = expected.generate_summary(fiscal_year=2025)
+    assert len(as_of) == len(expected)
+    assert (as_of[measures] - expected[measures]).abs().max().max() < 1e-6
+    
+    # Cached apart from the full summary, and traced to early payments only
+    full = processor.generate_summary(fiscal_year=2025)
+    assert full[measures].sum().sum() > as_of[measures].sum().sum()
+    details = processor.drill_down(fiscal_year=2025, as_of='2025-08-05')
+    assert (created[details['Payment Row']] < '2025-08-06').all()
+    assert processor.generate_summary(fiscal_year=2025, as_of='2020-01-01').empty
+    
+    print(f"✓ {len(as_of)} rows as of 5 August against {len(full)} now")
+    return True
+
+def test_cashbook():
+    """Test the daily cashbook against the receipts in the range"""
+    print("\nTesting the daily cashbook...")
+    processor = _synthetic_processor()
+    receipts = processor.payments_df.drop_duplicates('CustomerPayment ID')
+    
+    # Each receipt counted once, with its full amount, within the range
+    cashbook = processor.generate_cashbook('2025-07-01', '2025-07-31')
+    dates = pd.to_datetime(receipts['Date'])
+    in_range = receipts[(dates >= '2025-07-01') & (dates <= '2025-07-31')]
+    assert cashbook['Receipts'].sum() == len(in_range)
+    assert abs(cashbook['Amount'].sum() - in_range['Amount'].sum()) < 1e-6
+    assert cashbook['Date'].between('2025-07-01', '2025-07-31').all()
+    
+    # Running totals restart for every school, mode and deposit account
+    accounts = ['School', 'Mode', 'Deposit To']
+    running = cashbook.groupby(accounts, observed=True)['Amount'].cumsum()
+    assert (running - cashbook['Running Total']).abs().max() < 1e-6
+    
+    school = cashbook['School'].iloc[0]
+    assert (processor.generate_cashbook(school=school)['School'] == school).all()
+    assert processor.generate_cashbook('2030-01-01').empty
+    
+    print(f"✓ {len(in_range)} July receipts on {cashbook['Date'].nunique()} days")
+    return True
+
+def test_summary_by():
+    """Test summaries grouped by configurable dimensions"""
+    print("\nTesting configurable group-by dimensions...")
+    processor = _synthetic_processor()
+    measures = ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee']
+    summary = processor.generate_summary(fiscal_year=2025)
+    
+    # The default key as configuration gives the default summary
+    grouped = processor.summary_by(['School', 'Grade', 'Section', 'Month'], fiscal_year=2025)
+    assert len(grouped) == len(summary)
+    assert (grouped['Month'].astype(str).to_numpy() == summary['Month'].astype(str).to_numpy()).all()
+    assert abs(grouped[measures].to_numpy() - summary[measures].to_numpy()).max() < 1e-6
+    
+    # Contact and payment columns, with every payment counted once
+    by_mode = processor.summary_by(['CF.Gender', 'Mode'], ['Total', 'Payments'], fiscal_year=2025)
+    total = summary[measures].to_numpy().sum()
+    assert abs(by_mode['Total'].sum() - total) < 1e-6
+    assert by_mode['Payments'].sum() == processor.summary_by([], ['Payments'], fiscal_year=2025)['Payments'][0]
+    
+    by_fee = processor.summary_by('Fee Type', ['Total'], school='Excel Central School')
+    expected = processor.generate_summary(school='Excel Central School')[measures].to_numpy().sum()
+    assert abs(by_fee['Total'].sum() - expected) < 1e-6
+    
+    try:
+        processor.summary_by(['No Such Column'])
+        assert False, "Unknown dimensions should be rejected"
+    except ValueError:
+        pass
+    
+    print(f"✓ {len(by_mode)} gender and mode rows totalling ₹{by_mode['Total'].sum():,.2f}")
+    return True
+
+def test_billing_audit():
+    """Test the audit of invoice lines against the fee items"""
+    print("\nTesting the billing audit...")
+    processor = _synthetic_processor()
+    invoices, contacts = processor.invoices_df, processor.contacts_df
+    in_master = invoices['Item Name'].isin(processor.fee_items_df['Item Name'])
+    
+    # Synthetic invoices bill the rates, so only the other items are reported
+    report = processor.generate_billing_audit()
+    assert (report['Exception'] == NOT_IN_MASTER).all()
+    assert len(report) == (~in_master).sum()
+    
+    # Over-bill one line and move its student to another grade
+    line = invoices.index[in_master][0]
+    invoices.loc[line, 'Item Total'] += 500
+    customer = invoices.loc[line, 'Customer ID']
+    student = (contacts['Contact ID'] == customer).to_numpy()
+    contacts['Grade'] = contacts['Grade'].astype(object)
+    contacts.loc[student, 'Grade'] = 'Grade 12' if contacts.loc[student, 'Grade'].iloc[0] != 'Grade 12' else 'LKG'
+    processor._reset_indexes()
+    
+    report = processor.generate_billing_audit()
+    over = report[report['Exception'] == OVER_BILLED]
+    assert len(over) == 1 and over['Difference'].iloc[0] == 500
+    mismatched = report[report['Exception'] == GRADE_MISMATCH]
+    assert (mismatched['Customer ID'] == customer).all()
+    assert len(mismatched) == ((invoices['Customer ID'] == customer) & in_master).sum()
+    assert not (report['Exception'] == UNDER_BILLED).any()
+    
+    print(f"✓ {len(report)} exceptions on {len(invoices)} invoice lines")
+    return True
+
 def main():
     """Run all tests"""
     print("=" * 60)
@@ -89,7 +1120,32 @@ def main():
         test_data_loading,
         test_opening_balances,
         test_fee_payments,
-        test_summary_generation
+        test_summary_generation,
+        test_vectorized_summary_matches_loop,
+        test_aggregate_by_codes,
+        test_integer_periods,
+        test_duplicate_payments,
+        test_overlapping_exports,
+        test_allocation_strategies,
+        test_report_service,
+        test_load_frames_matches_load_data,
+        test_input_cache,
+        test_summary_cache,
+        test_summary_cube,
+        test_query_plan,
+        test_polars_backend,
+        test_allocation_kernel,
+        test_validation,
+        test_warehouse,
+        test_receivables,
+        test_collection_rates,
+        test_summary_lineage,
+        test_student_search,
+        test_contact_history,
+        test_as_of_summary,
+        test_cashbook,
+        test_summary_by,
+        test_billing_audit
     ]
     
     for test in tests:
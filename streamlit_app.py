@@ -11,10 +11,15 @@ import calendar
 from pathlib import Path
 import sys
 import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
 
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent))
 
+from src.income_summary_aggregation import slice_grouping_set
+from src.income_summary_cache import fingerprint_inputs
+from src.income_summary_engine import CUBE_DIMENSIONS, SUMMARY_MEASURES
+from src.income_summary_loader import OVERLAP_KEYS, combine_frames, read_input
 from src.income_summary_processor_v2 import IncomeSummaryProcessorV2
 
 # Page configuration
@@ -57,6 +62,111 @@ if 'processor' not in st.session_state:
     st.session_state.processor = None
 if 'summary_generated' not in st.session_state:
     st.session_state.summary_generated = False
+if 'parse_jobs' not in st.session_state:
+    st.session_state.parse_jobs = {}
+if 'load_job' not in st.session_state:
+    st.session_state.load_job = None
+
+
+@st.cache_resource
+def get_parse_pool():
+    """Worker threads shared by all sessions for parsing uploads in the background"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix='upload-parse')
+
+
+@st.cache_resource
+def get_load_pool():
+    """Separate threads for load jobs, which wait on the parse jobs"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload-load')
+
+
+def as_list(uploads):
+    """Uploader value as a list of files"""
+    if uploads is None:
+        return []
+    return uploads if isinstance(uploads, list) else [uploads]
+
+
+def upload_key(kind, upload):
+    """Identify an uploaded file across reruns"""
+    return (kind, getattr(upload, 'file_id', None) or upload.name, upload.size)
+
+
+def parse_upload(kind, content):
+    """Parse one uploaded export, including its date columns"""
+    # Earlier contact exports are read like the current one
+    return read_input('contacts' if kind == 'contact_history' else kind, io.BytesIO(content))
+
+
+def schedule_parsing(uploaded_files):
+    """
+    Start parsing each upload as soon as it arrives, and start loading and
+    indexing as soon as all required inputs are present
+    """
+    pool = get_parse_pool()
+    jobs = st.session_state.parse_jobs
+    current = {}
+    for kind, uploads in uploaded_files.items():
+        for upload in as_list(uploads):
+            key = upload_key(kind, upload)
+            current[key] = jobs.get(key) or pool.submit(parse_upload, kind, upload.getvalue())
+    st.session_state.parse_jobs = current
+
+    if not all(as_list(uploaded_files[kind]) for kind in ['contacts', 'invoices', 'payments']):
+        st.session_state.load_job = None
+        return
+
+    load_key = tuple(sorted(current, key=str))
+    load_job = st.session_state.load_job
+    if load_job is None or load_job[0] != load_key:
+        sources = {kind: as_list(uploaded_files[kind]) for kind in uploaded_files}
+        parse_jobs = {kind: [current[upload_key(kind, upload)] for upload in uploads]
+                      for kind, uploads in sources.items()}
+        st.session_state.load_job = (load_key, get_load_pool().submit(load_uploads, sources, parse_jobs))
+
+
+def load_uploads(sources, parse_jobs):
+    """Build an indexed processor from parsed uploads (runs in a worker thread)"""
+    # Create processor (cleaned uploads are shared across sessions via the cache)
+    processor = IncomeSummaryProcessorV2(cache_dir=Path('data') / 'cache')
+    
+    # Fall back to the bundled fee items reference when none was uploaded
+    default_fee_items = processor.data_path / 'reference' / 'fee_items.csv'
+    if not sources['fee_items'] and default_fee_items.exists():
+        sources['fee_items'] = [default_fee_items]
+        parse_jobs['fee_items'] = [get_parse_pool().submit(read_input, 'fee_items', default_fee_items)]
+    
+    fingerprint = fingerprint_inputs(sources['contacts'], sources['invoices'],
+                                     sources['payments'], sources['fee_items'] or None)
+    if not processor.load_cached(fingerprint):
+        frames = {}
+        for kind, jobs in parse_jobs.items():
+            if jobs and kind != 'contact_history':
+                frames[f"{kind}_df"] = combine_frames([job.result() for job in jobs],
+                                                      OVERLAP_KEYS.get(kind))
+        processor.load_frames(**frames, fingerprint=fingerprint)
+    
+    # Earlier contact exports are kept apart, one version of each contact per export
+    if parse_jobs.get('contact_history'):
+        processor.load_history_frames([job.result() for job in parse_jobs['contact_history']],
+                                      fingerprint=fingerprint_inputs(sources['contact_history']))
+        processor.contact_history
+
+    # Build the indexes so Generate only has to aggregate and search only looks up
+    processor.invoice_index
+    processor.contact_index
+    processor.payment_links
+    processor.student_index
+    processor.receipt_index
+    return processor
+
+
+def loaded_processor():
+    """Processor of the finished load job, if there is one"""
+    load_job = st.session_state.load_job
+    if load_job is None or not load_job[1].done() or load_job[1].exception() is not None:
+        return None
+    return load_job[1].result()
 
 # Header
 st.title("📊 Income Summary Generator")
@@ -74,11 +184,12 @@ with st.sidebar:
     
     ### Required Files:
     - 📁 **student_contacts.csv** - Student information
-    - 📁 **student_invoices.csv** - Invoice records  
-    - 📁 **student_payment.csv** - Payment records
+    - 📁 **student_invoices.csv** - Invoice records (one or more exports)
+    - 📁 **student_payment.csv** - Payment records (one or more exports)
     
     ### Optional:
     - 📁 **fee_items.csv** - Fee reference (uses default if not provided)
+    - 📁 **Earlier contact exports** - Attribute payments to the class a student was in at the time
     """)
     
     st.markdown("---")
@@ -101,17 +212,19 @@ with col1:
     )
     
     uploaded_files['invoices'] = st.file_uploader(
-        "Choose student_invoices.csv file",
+        "Choose student_invoices.csv file(s)",
         type=['csv'],
         key='invoices',
-        help="Upload the invoices CSV file from ZOHO Books"
+        accept_multiple_files=True,
+        help="Upload one or more invoice CSV exports from ZOHO Books (overlapping exports are merged)"
     )
     
     uploaded_files['payments'] = st.file_uploader(
-        "Choose student_payment.csv file",
+        "Choose student_payment.csv file(s)",
         type=['csv'],
         key='payments',
-        help="Upload the payments CSV file from ZOHO Books"
+        accept_multiple_files=True,
+        help="Upload one or more payment CSV exports from ZOHO Books (overlapping exports are merged)"
     )
     
     # Optional fee items file
@@ -122,6 +235,22 @@ with col1:
             key='fee_items',
             help="Upload custom fee items reference file"
         )
+        uploaded_files['contact_history'] = st.file_uploader(
+            "Earlier student_contacts.csv exports (optional)",
+            type=['csv'],
+            key='contact_history',
+            accept_multiple_files=True,
+            help="Previous contact exports; payments are then attributed to the grade and section "
+                 "each student had on the payment date (by Last Modified Time)"
+        )
+
+    # Parse uploads in the background while the report options are chosen
+    schedule_parsing(uploaded_files)
+    if st.session_state.load_job is not None:
+        if st.session_state.load_job[1].done():
+            st.caption("✓ Uploaded data loaded and indexed")
+        else:
+            st.caption("⏳ Parsing uploaded files in the background...")
 
 with col2:
     st.header("⚙️ Report Options")
@@ -145,6 +274,16 @@ with col2:
         help="Choose a specific year or all years"
     )
     
+    # Academic year selection (April - March)
+    fiscal_year_options = ['All Academic Years'] + list(range(current_year - 2, current_year + 1))
+    selected_fiscal_year = st.selectbox(
+        "Select Academic Year",
+        fiscal_year_options,
+        index=0,
+        format_func=lambda y: y if isinstance(y, str) else f"{y}-{(y + 1) % 100:02d}",
+        help="Academic year runs from April to March"
+    )
+    
     # School selection
     school_options = ['All Schools', 'Excel Global School', 'Excel Central School', 'Excel Pathway School']
     selected_school = st.selectbox(
@@ -153,6 +292,120 @@ with col2:
         index=0,
         help="Filter by specific school"
     )
+    
+    # Snapshot of the books as they stood on a date, without later entries
+    as_of_enabled = st.checkbox(
+        "As recorded on a date",
+        help="Only count payments entered (Created Time) by the end of the chosen day, "
+             "e.g. to reproduce the summary from when the books were closed"
+    )
+    selected_as_of = st.date_input("Books closed on", value=datetime.now().date(),
+                                   disabled=not as_of_enabled)
+
+# Student lookup, from the search index built while loading
+search_processor = loaded_processor()
+if search_processor is not None:
+    with st.expander("🔎 Find a Student", expanded=False):
+        query = st.text_input("Name, admission number or phone number",
+                              placeholder="e.g. Riya, 21EGS0052 or 98765")
+        if query:
+            matches = search_processor.search_students(query)
+            if matches.empty:
+                st.info("No students match")
+            else:
+                st.dataframe(matches, use_container_width=True, hide_index=True)
+                contact_id = st.selectbox(
+                    "Show student", matches['Contact ID'],
+                    format_func=lambda cid: matches.loc[matches['Contact ID'] == cid,
+                                                        'Display Name'].iloc[0])
+                activity = search_processor.student_activity(contact_id)
+                invoices_tab, payments_tab, allocations_tab = st.tabs(
+                    [f"Invoices ({activity['invoices']['Invoice Number'].nunique()})",
+                     f"Payments ({len(activity['payments'])})", "Fee Allocation"])
+                with invoices_tab:
+                    st.dataframe(activity['invoices'], use_container_width=True, hide_index=True)
+                with payments_tab:
+                    st.dataframe(activity['payments'], use_container_width=True, hide_index=True)
+                with allocations_tab:
+                    st.caption("Payments split by fee type, as in the summary")
+                    st.dataframe(activity['allocations'], use_container_width=True, hide_index=True)
+    
+    # Daily receipts per school, mode and account, from the date index built while loading
+    with st.expander("📒 Daily Cashbook", expanded=False):
+        today = datetime.now().date()
+        cashbook_range = st.date_input("Receipts dated", value=(today.replace(day=1), today),
+                                       help="Receipts per day with running totals per school, "
+                                            "payment mode and deposit account")
+        if isinstance(cashbook_range, (tuple, list)) and len(cashbook_range) == 2:
+            cashbook = search_processor.generate_cashbook(
+                start=cashbook_range[0], end=cashbook_range[1],
+                school=None if selected_school == 'All Schools' else selected_school)
+            if cashbook.empty:
+                st.info("No receipts in this range")
+            else:
+                col_receipts, col_amount = st.columns(2)
+                col_receipts.metric("Receipts", f"{cashbook['Receipts'].sum():,}")
+                col_amount.metric("Amount", f"₹{cashbook['Amount'].sum():,.2f}")
+                st.dataframe(cashbook, use_container_width=True, hide_index=True)
+                st.download_button(
+                    label="📥 Download Cashbook as CSV",
+                    data=cashbook.to_csv(index=False),
+                    file_name=f"cashbook_{cashbook_range[0]}_{cashbook_range[1]}.csv",
+                    mime="text/csv"
+                )
+    
+    # Totals by any columns, with the report options above as filters
+    with st.expander("🧮 Group by Any Column", expanded=False):
+        dimension_options = (['Month', 'Year', 'Fiscal Year', 'Fee Type'] +
+                             list(search_processor.contacts_df.columns) +
+                             [col for col in search_processor.payments_df.columns
+                              if col not in search_processor.contacts_df.columns])
+        group_by = st.multiselect("Group by", dimension_options, default=['School', 'Month'],
+                                  help="Contact columns (e.g. CF.Gender), payment columns "
+                                       "(e.g. Mode, Deposit To), periods or the fee type")
+        group_measures = st.multiselect(
+            "Measures", ['Opening Balance', 'Initial Fee', 'Term / Monthly Fee', 'Total', 'Payments'],
+            default=['Total', 'Payments'])
+        if group_by and group_measures:
+            grouped = search_processor.summary_by(
+                group_by, group_measures,
+                month=None if selected_month == 'All Months' else selected_month,
+                year=None if selected_year == 'All Years' else int(selected_year),
+                fiscal_year=None if selected_fiscal_year == 'All Academic Years' else int(selected_fiscal_year),
+                school=None if selected_school == 'All Schools' else selected_school,
+                as_of=selected_as_of if as_of_enabled else None)
+            st.dataframe(grouped, use_container_width=True, hide_index=True)
+            st.download_button(
+                label="📥 Download as CSV",
+                data=grouped.to_csv(index=False),
+                file_name=f"summary_by_{'_'.join(group_by)}.csv",
+                mime="text/csv"
+            )
+    
+    # Invoice lines checked against the rates, schools and grades in fee_items.csv
+    with st.expander("🧾 Billing Audit", expanded=False):
+        if search_processor.fee_items_df is None:
+            st.info("Upload fee_items.csv under Advanced Options to audit the invoices")
+        else:
+            audit = search_processor.generate_billing_audit(
+                fiscal_year=None if selected_fiscal_year == 'All Academic Years' else int(selected_fiscal_year),
+                school=None if selected_school == 'All Schools' else selected_school)
+            if audit.empty:
+                st.success("✓ Every invoice line agrees with the fee items")
+            else:
+                counts = audit['Exception'].value_counts(sort=False)
+                for column, (exception, count) in zip(st.columns(len(counts)), counts.items()):
+                    column.metric(exception, f"{count:,}")
+                shown = st.multiselect("Exceptions", list(counts.index),
+                                       default=[name for name, count in counts.items() if count])
+                st.dataframe(audit[audit['Exception'].isin(shown)], use_container_width=True,
+                             hide_index=True)
+                st.download_button(
+                    label="📥 Download Billing Audit as CSV",
+                    data=audit.to_csv(index=False),
+                    file_name="billing_audit.csv",
+                    mime="text/csv"
+                )
 
 # Generate button
 st.markdown("---")
@@ -163,72 +416,60 @@ if st.button("🚀 Generate Income Summary", type="primary", use_container_width
         st.error("❌ Please upload all three required files!")
     else:
         try:
-            # Create processor
-            processor = IncomeSummaryProcessorV2()
-            
             # Show progress
             progress_bar = st.progress(0)
             status_text = st.empty()
             
-            # Load data from uploaded files
-            status_text.text("Loading student contacts...")
+            # Uploads have usually finished parsing in the background by now
+            status_text.text("Loading contacts, invoices and payments...")
             progress_bar.progress(20)
-            processor.contacts_df = pd.read_csv(
-                uploaded_files['contacts'],
-                encoding='utf-8-sig',
-                dtype={'Contact ID': str, 'Customer ID': str}
-            )
-            
-            status_text.text("Loading invoices...")
-            progress_bar.progress(40)
-            processor.invoices_df = pd.read_csv(
-                uploaded_files['invoices'],
-                encoding='utf-8-sig',
-                dtype={'Customer ID': str, 'Invoice Number': str},
-                low_memory=False
-            )
-            
-            status_text.text("Loading payments...")
+            processor = st.session_state.load_job[1].result()
+            st.session_state.processor = processor
             progress_bar.progress(60)
-            processor.payments_df = pd.read_csv(
-                uploaded_files['payments'],
-                encoding='utf-8-sig',
-                dtype={'CustomerID': str, 'Invoice Number': str}
-            )
-            
-            # Load fee items if provided
-            if uploaded_files['fee_items']:
-                processor.fee_items_df = pd.read_csv(
-                    uploaded_files['fee_items'],
-                    encoding='utf-8-sig'
-                )
-            
-            # Convert dates
-            processor.payments_df['Date'] = pd.to_datetime(processor.payments_df['Date'])
-            processor.invoices_df['Invoice Date'] = pd.to_datetime(processor.invoices_df['Invoice Date'])
-            
-            # Clean data
-            processor._clean_data()
             
             # Process filters
             month_filter = None if selected_month == 'All Months' else selected_month
             year_filter = None if selected_year == 'All Years' else int(selected_year)
+            fiscal_year_filter = None if selected_fiscal_year == 'All Academic Years' else int(selected_fiscal_year)
             
             # Generate summary
             status_text.text("Generating summary...")
             progress_bar.progress(80)
             
-            summary_df = processor.generate_summary(month=month_filter, year=year_filter)
-            
-            # Apply school filter
-            if selected_school != 'All Schools' and not summary_df.empty:
-                summary_df = summary_df[summary_df['School'] == selected_school]
+            # Repeated filter combinations are served from the processor's summary cache
+            school_filter = None if selected_school == 'All Schools' else selected_school
+            as_of_filter = selected_as_of if as_of_enabled else None
+            summary_df = processor.generate_summary(month=month_filter, year=year_filter,
+                                                    fiscal_year=fiscal_year_filter,
+                                                    school=school_filter, as_of=as_of_filter)
             
             progress_bar.progress(100)
             status_text.text("✅ Summary generated successfully!")
             
-            # Store in session state
+            # Precomputed rollups (every School x Grade x Section x Month subtotal)
+            # that the analysis tabs slice instead of re-grouping on each rerun
+            st.session_state.summary_cube = processor.summary_cube(
+                month=month_filter, year=year_filter, fiscal_year=fiscal_year_filter,
+                school=school_filter, as_of=as_of_filter)
+            
+            # Payments left out of the summary and the reconciliation, cached with it
+            validation = processor.validate(month=month_filter, year=year_filter,
+                                            fiscal_year=fiscal_year_filter, as_of=as_of_filter)
+            if school_filter:
+                recon = validation['reconciliation']
+                validation['reconciliation'] = recon[recon['School'] == school_filter]
+            st.session_state.validation = validation
+            
+            # Fees billed in each month against the fees collected, built with the summary
+            st.session_state.collection = processor.generate_collection_rates(
+                month=month_filter, year=year_filter, fiscal_year=fiscal_year_filter,
+                school=school_filter, as_of=as_of_filter)
+            
+            # Store in session state, with the filters the row drill-down needs
             st.session_state.summary_df = summary_df
+            st.session_state.filters = dict(month=month_filter, year=year_filter,
+                                            fiscal_year=fiscal_year_filter, school=school_filter,
+                                            as_of=as_of_filter)
             st.session_state.summary_generated = True
             
             # Success message
@@ -244,6 +485,13 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
     st.header("📊 Summary Results")
     
     summary_df = st.session_state.summary_df
+    summary_cube = st.session_state.summary_cube
+    
+    def rollup(*by):
+        """Totals by the given columns, sliced from the precomputed cube"""
+        return slice_grouping_set(summary_cube, CUBE_DIMENSIONS, list(by), SUMMARY_MEASURES)
+    
+    grand_total = rollup().iloc[0]
     
     # Statistics
     col1, col2, col3, col4 = st.columns(4)
@@ -257,19 +505,19 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
     with col2:
         st.metric(
             "Opening Balance",
-            f"₹{summary_df['Opening Balance'].sum():,.2f}"
+            f"₹{grand_total['Opening Balance']:,.2f}"
         )
     
     with col3:
         st.metric(
             "Initial Fee",
-            f"₹{summary_df['Initial Fee'].sum():,.2f}"
+            f"₹{grand_total['Initial Fee']:,.2f}"
         )
     
     with col4:
         st.metric(
             "Term/Monthly Fee",
-            f"₹{summary_df['Term / Monthly Fee'].sum():,.2f}"
+            f"₹{grand_total['Term / Monthly Fee']:,.2f}"
         )
     
     # Display data
@@ -302,20 +550,34 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
             use_container_width=True
         )
     
+    # Students and receipts behind a row, from the lineage recorded with the summary
+    with st.expander("🔍 Drill down into a row", expanded=False):
+        if summary_df.empty:
+            st.info("No rows to drill down into")
+        else:
+            cell = st.selectbox("Summary row", options=range(len(summary_df)),
+                                format_func=lambda i: f"{i}: " + ' / '.join(
+                                    str(value) for value in
+                                    summary_df.loc[i, ['School', 'Grade', 'Section', 'Month']]))
+            measure = st.selectbox("Amount", ['All amounts'] + SUMMARY_MEASURES)
+            details = st.session_state.processor.drill_down(
+                cell, None if measure == 'All amounts' else measure, **st.session_state.filters)
+            st.caption(f"{len(details)} payments from {details['Contact ID'].nunique()} students, "
+                       f"₹{details['Allocated'].sum():,.2f} allocated to this row")
+            st.dataframe(details.drop(columns=['Cell', 'Payment Row']),
+                         use_container_width=True, hide_index=True)
+    
     # Additional analysis
     with st.expander("📈 View Analysis & Charts", expanded=True):
         # Create tabs for different views
-        tab1, tab2, tab3, tab4 = st.tabs(["📊 School Analysis", "📈 Grade Analysis", "📅 Monthly Trends", "🥧 Distribution"])
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 School Analysis", "📈 Grade Analysis", "📅 Monthly Trends",
+                                                "🥧 Distribution", "💰 Billed vs Collected"])
         
         with tab1:
-            # Group by school
-            if len(summary_df['School'].unique()) > 1:
+            # Totals by school
+            school_summary = rollup('School').round(2)
+            if len(school_summary) > 1:
                 st.subheader("Summary by School")
-                school_summary = summary_df.groupby('School').agg({
-                    'Opening Balance': 'sum',
-                    'Initial Fee': 'sum',
-                    'Term / Monthly Fee': 'sum'
-                }).round(2)
                 
                 # Display table
                 col1, col2 = st.columns([1, 2])
@@ -333,13 +595,9 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
                 st.info("📌 Single school selected - no comparison available")
         
         with tab2:
-            # Group by grade
+            # Totals by grade
             st.subheader("Summary by Grade")
-            grade_summary = summary_df.groupby('Grade').agg({
-                'Opening Balance': 'sum',
-                'Initial Fee': 'sum',
-                'Term / Monthly Fee': 'sum'
-            }).round(2)
+            grade_summary = rollup('Grade').round(2)
             
             # Create columns for better layout
             col1, col2 = st.columns([1, 2])
@@ -364,11 +622,7 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
             st.subheader("Monthly Collection Summary")
             
             if 'Month' in summary_df.columns:
-                monthly_summary = summary_df.groupby('Month').agg({
-                    'Opening Balance': 'sum',
-                    'Initial Fee': 'sum',
-                    'Term / Monthly Fee': 'sum'
-                }).round(2)
+                monthly_summary = rollup('Month').round(2)
                 
                 # Add total column
                 monthly_summary['Total Collection'] = monthly_summary.sum(axis=1)
@@ -377,7 +631,7 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
                 st.dataframe(monthly_summary, use_container_width=True)
                 
                 # Show chart only if multiple months
-                if len(summary_df['Month'].unique()) > 1:
+                if len(monthly_summary) > 1:
                     st.line_chart(
                         data=monthly_summary[['Opening Balance', 'Initial Fee', 'Term / Monthly Fee', 'Total Collection']],
                         use_container_width=True,
@@ -398,10 +652,10 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
             st.subheader("Fee Distribution Analysis")
             
             # Summary statistics
-            total_opening = summary_df['Opening Balance'].sum()
-            total_initial = summary_df['Initial Fee'].sum()
-            total_term = summary_df['Term / Monthly Fee'].sum()
-            grand_total = total_opening + total_initial + total_term
+            total_opening = grand_total['Opening Balance']
+            total_initial = grand_total['Initial Fee']
+            total_term = grand_total['Term / Monthly Fee']
+            total_collection = total_opening + total_initial + total_term
             
             # Display metrics
             col1, col2, col3, col4 = st.columns(4)
@@ -412,7 +666,7 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
             with col3:
                 st.metric("Term/Monthly Fee", f"₹{total_term:,.0f}")
             with col4:
-                st.metric("Grand Total", f"₹{grand_total:,.0f}")
+                st.metric("Grand Total", f"₹{total_collection:,.0f}")
             
             # Charts
             col1, col2 = st.columns(2)
@@ -461,11 +715,7 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
                 
                 # Section summary
                 if 'Section' in summary_df.columns:
-                    section_summary = summary_df.groupby('Section').agg({
-                        'Opening Balance': 'sum',
-                        'Initial Fee': 'sum',
-                        'Term / Monthly Fee': 'sum'
-                    })
+                    section_summary = rollup('Section')
                     section_summary['Total'] = section_summary.sum(axis=1)
                     section_summary = section_summary.sort_values('Total', ascending=True).tail(10)
                     
@@ -486,6 +736,63 @@ if st.session_state.summary_generated and 'summary_df' in st.session_state:
                         st.info("No section data available")
                 else:
                     st.info("Section information not available")
+        
+        with tab5:
+            st.subheader("Fees Billed vs Collected")
+            collection = st.session_state.get('collection')
+            
+            if collection is not None and not collection.empty:
+                total_billed = collection['Billed'].sum()
+                total_collected = collection['Collected'].sum()
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Billed", f"₹{total_billed:,.0f}")
+                with col2:
+                    st.metric("Collected", f"₹{total_collected:,.0f}")
+                with col3:
+                    rate = f"{total_collected / total_billed:.1%}" if total_billed else "n/a"
+                    st.metric("Collection Rate", rate)
+                
+                # Month by month, all fee types together
+                monthly = collection.groupby('Month', observed=True)[['Billed', 'Collected']].sum()
+                st.bar_chart(data=monthly, use_container_width=True, height=350)
+                
+                st.caption("Billed: invoice lines dated in the month. Collected: fee payments made "
+                           "in the month. The rate is blank where nothing was billed.")
+                st.dataframe(collection, use_container_width=True, hide_index=True, height=400)
+                st.download_button(
+                    label="📥 Download Billed vs Collected as CSV",
+                    data=collection.to_csv(index=False).encode('utf-8-sig'),
+                    file_name=f"collection_rates_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
+            else:
+                st.info("No invoices or fee collections for the selected filters")
+    
+    # Data quality
+    validation = st.session_state.get('validation')
+    if validation is not None:
+        issues, reconciliation = validation['issues'], validation['reconciliation']
+        with st.expander(f"🔎 Reconciliation ({len(issues)} payment issues)", expanded=False):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Payments", f"₹{reconciliation['Payments'].sum():,.2f}")
+            with col2:
+                st.metric("Left out (issues)", f"₹{reconciliation['Dropped'].sum():,.2f}")
+            with col3:
+                st.metric("Other items", f"₹{reconciliation['Other Items'].sum():,.2f}")
+            
+            st.caption("Payments = Summarized + Dropped + Other Items + Difference, per school and month")
+            st.dataframe(reconciliation.drop(columns='Period'), use_container_width=True, hide_index=True)
+            
+            if not issues.empty:
+                st.write(issues['Issue'].value_counts().rename('Payments'))
+                st.download_button(
+                    label="📥 Download Payment Issues as CSV",
+                    data=issues.to_csv(index=False).encode('utf-8-sig'),
+                    file_name=f"payment_issues_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
 
 # Footer
 st.markdown("---")